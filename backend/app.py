@@ -2,30 +2,40 @@ from dotenv import load_dotenv
 import os
 import json
 import io
+import itertools
+import logging
+import threading
+import time
 import traceback
-import resend
 from datetime import datetime
-from flask import Flask, jsonify, request, send_file, make_response
-from flask_cors import CORS
-from firebase_config import get_database
-import firebase_admin
-from firebase_admin import credentials, firestore
-from firebase_admin import db
-import time
-from flask import Flask, request, jsonify
+from flask import Flask, Response, jsonify, request, send_file, make_response
 from flask_cors import CORS
-import os
-import time
-import logging
-
-import firebase_admin
-from firebase_admin import credentials, db
+from firebase_config import firebase_status, init_firebase
+from indexes import flight_index_updates, flight_summary, lookup_pnr, merge_route_summaries, rebuild_indexes
+from storage import WriteBatch, generate_push_key, get_storage, item_size
+from read_cache import CACHE_VERSIONS, ReadCache, listen_for_invalidations
+from http_cache import conditional_json, etag_matches, not_modified, version_etag
+from outbox import EmailOutbox, resend_client
+from email_templates import EMAIL_TEMPLATES
+from tickets import TicketCache, stream_tickets_zip
+from streaming import stream_format, stream_list
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, RequestMetrics
+from db_trace import DbTracer, db_budget
+from snapshot import FlightSnapshot
+from connections import RouteGraph, parse_after
+from notification_hub import NotificationHub, event_stream, streams_enabled
+from manifests import (MANIFESTS, airport_passengers, flight_writes, is_split, manifest_path, passenger_path,
+                       read_passenger, read_passengers, with_passengers)
+from disruptions import ACTIONS as DISRUPTION_ACTIONS, delayed_departure, format_delay, parse_bound, select_flights
 
 # ensure .env is loaded early
 load_dotenv()
 
 app = Flask(__name__)
 
+# Per-route latency / status / size metrics, served at /metrics
+request_metrics = RequestMetrics(app)
+
 # Configure CORS to allow your specific frontend and enable credentials
 CORS(app, 
      resources={r"/*": {"origins": [
@@ -43,53 +53,199 @@ logging.basicConfig(level=logging.INFO)
 ROOT = "refund_requests"
 
 # --- UPDATED INITIALIZATION ---
-FIREBASE_CRED_PATH = os.environ.get("FIREBASE_CRED_PATH")
-FIREBASE_CRED_JSON = os.environ.get("FIREBASE_CREDENTIALS_JSON")  # For Render deployment
-DATABASE_URL = os.environ.get("FIREBASE_DATABASE_URL")
+# "firebase" (default) or "local" (in-memory tree loaded from LOCAL_DATA_PATH)
+STORAGE_BACKEND = os.environ.get("STORAGE_BACKEND", "firebase").strip().lower()
 
-FIREBASE_INITIALIZED = False
-
-# Try to initialize Firebase from either file path OR JSON environment variable
-try:
-    if not firebase_admin._apps:
-        cred = None
-        
-        # Option 1: Use JSON from environment variable (for Render/production)
-        if FIREBASE_CRED_JSON:
-            import json
-            cred_dict = json.loads(FIREBASE_CRED_JSON)
-            cred = credentials.Certificate(cred_dict)
-            app.logger.info("✅ Firebase initialized from FIREBASE_CREDENTIALS_JSON env var")
-        
-        # Option 2: Use file path (for local development)
-        elif FIREBASE_CRED_PATH and os.path.exists(FIREBASE_CRED_PATH):
-            cred = credentials.Certificate(FIREBASE_CRED_PATH)
-            app.logger.info(f"✅ Firebase initialized from file: {FIREBASE_CRED_PATH}")
-        
-        if cred:
-            firebase_admin.initialize_app(cred, {"databaseURL": DATABASE_URL})
-            FIREBASE_INITIALIZED = True
-        else:
-            app.logger.error("CRITICAL: Firebase Credentials not found!")
-            app.logger.error("Set either FIREBASE_CREDENTIALS_JSON or FIREBASE_CRED_PATH")
-            
-except Exception as e:
-    app.logger.error(f"❌ Failed to initialize Firebase: {e}")
+# Firebase is initialized on first use (see firebase_config.py) rather than
+# at import, so a cold worker starts serving sooner; the warm-up thread
+# started further down usually gets there before the first request does.
 
 # --- UPDATED HELPERS ---
 
 def safe_ref(path: str):
     """Safety wrapper to prevent 'DefaultCredentialsError' crashes"""
-    if not FIREBASE_INITIALIZED:
+    storage = get_storage()
+    if storage.name == "firebase" and not init_firebase():
         app.logger.error("Attempted to access database before Firebase was initialized.")
         raise RuntimeError("Firebase not initialized. Check FIREBASE_CRED_PATH in your .env")
-    return db.reference(path)
+    return storage.reference(path)
 
 def get_database():
     """Update this to use safe_ref so it doesn't bypass initialization checks"""
     return safe_ref("/")
 
+def flight_path(source: str, flight_id: str) -> str:
+    """Database path of an active flight node, for multi-path (batched) writes."""
+    return f"airports/{source}/flights/{flight_id}"
+
+# Hot flight reads go through a TTL + LRU read-through cache (see read_cache.py)
+flight_cache = ReadCache()
+
+def cached_get(path: str):
+    """Read `path` through the flight cache."""
+    return flight_cache.get(path, lambda: live_get(path))
+
+# Timetable for connecting-flight search, refreshed per airport on writes (see connections.py)
+route_graph = RouteGraph()
+
+def commit_flight_write(batch: WriteBatch, *sources):
+    """
+    Commit a batch that changed flights departing from `sources`: bump their
+    cache_versions entry in the same update (other instances listen to it),
+    then drop the local cached reads. Returns the number of update requests.
+    """
+    for src in sources:
+        batch.set(f"{CACHE_VERSIONS}/{src}", generate_push_key())
+    requests_made = batch.commit()
+    for src in sources:
+        flight_cache.invalidate_airport(src)
+        route_graph.mark_stale(src)
+    return requests_made
+
+# Last cache_versions/<SRC> token seen by this process, per airport
+_seen_versions = {}
+
+def airport_version(source: str):
+    """
+    Read the (tiny) cache_versions/<source> token. If it moved since this
+    process last looked, another instance wrote, so drop our cached reads.
+    """
+    version = live_get(f"{CACHE_VERSIONS}/{source}")
+    if _seen_versions.get(source) != version:
+        flight_cache.invalidate_airport(source)
+        _seen_versions[source] = version
+    return version
+
+NOTIFICATION_VERSIONS = "notification_versions"
+
+# Fans committed notifications out to /notifications/<pnr>/stream clients (see notification_hub.py)
+notification_hub = NotificationHub()
+
+def push_notification(batch: WriteBatch, pnr: str, notification: dict) -> str:
+    """
+    Queue a notification push and advance notification_versions/<PNR> to its
+    key; open streams for the PNR get it once the batch commits.
+    """
+    key = batch.push(f"notifications/{pnr}", notification)
+    batch.set(f"{NOTIFICATION_VERSIONS}/{pnr}", key)
+    batch.after_commit(lambda: notification_hub.publish(pnr, key, notification))
+    return key
+
+def notifications_since(pnr: str, since: str = None, limit: int = None) -> dict:
+    """{push_key: notification} for `pnr` newer than the `since` key (all of them without one)."""
+    ref = get_database().child("notifications").child(pnr)
+    if not since and not limit:
+        return ref.get() or {}
+    query = ref.order_by_key()
+    if since:
+        # start_at is inclusive; fetch one extra so the cursor itself can be dropped
+        query = query.start_at(since)
+    if limit:
+        query = query.limit_to_first(limit + 2)
+    data = query.get() or {}
+    return {k: v for k, v in data.items() if not since or k > since}
+
+# Local JSON exports carry no secondary indexes; build them once on load
+if STORAGE_BACKEND == "local":
+    _local_root = get_database()
+    if _local_root.child("pnr_index").get(shallow=True) is None:
+        rebuild_indexes(_local_root)
+
+# Cold start (see snapshot.py): with SNAPSHOT_PATH set, summary reads are served
+# from a local snapshot until the first live read succeeds, whether that is the
+# warm-up's or one made by a request.
+#   FIREBASE_WARMUP              "0" starts the warm-up on the first snapshot-served
+#                                request instead of at import (default on)
+#   FIREBASE_WARMUP_MAX_BACKOFF  cap in seconds on the wait between failed
+#                                warm-up attempts (default 30)
+flight_snapshot = FlightSnapshot()
+live_ready = threading.Event()
+_live_lock = threading.Lock()
+_warmup_thread = None
+
+def mark_live(started: float = None):
+    """Record the first successful live read: end the snapshot and start the background followers once."""
+    with _live_lock:
+        if live_ready.is_set():
+            return
+        live_ready.set()
+    if started is not None:
+        app.logger.info("Live database ready in %.0f ms", (time.perf_counter() - started) * 1000)
+    else:
+        app.logger.info("Live database ready (first live read by a request)")
+
+    # Cross-instance invalidation: follow cache_versions when running on Firebase
+    if get_storage().name == "firebase" and os.environ.get("FLIGHT_CACHE_LISTEN") == "1":
+        try:
+            listen_for_invalidations(safe_ref(CACHE_VERSIONS), flight_cache)
+        except Exception as e:
+            app.logger.warning("Could not start cache invalidation listener: %s", e)
+    # Notifications written by other instances, for streams open here
+    if get_storage().name == "firebase" and os.environ.get("NOTIFICATION_LISTEN") == "1":
+        try:
+            notification_hub.listen(safe_ref(NOTIFICATION_VERSIONS), notifications_since)
+        except Exception as e:
+            app.logger.warning("Could not start notification listener: %s", e)
+    flight_snapshot.start_refresher(get_database)
+
+def live_get(path: str):
+    """Read `path` from the live database; the first success ends the cold-start snapshot."""
+    value = safe_ref(path).get()
+    if not live_ready.is_set():
+        mark_live()
+    return value
+
+def warm_up_live_connection():
+    """Initialize Firebase and make one small read, retrying with backoff until the database answers."""
+    started = time.perf_counter()
+    max_backoff = float(os.environ.get("FIREBASE_WARMUP_MAX_BACKOFF", 30))
+    attempt = 0
+    while not live_ready.is_set():
+        try:
+            safe_ref(CACHE_VERSIONS).get(shallow=True)
+        except Exception as e:
+            attempt += 1
+            delay = min(max_backoff, 2 ** (attempt - 1))
+            app.logger.warning("Live database warm-up failed (attempt %d, retrying in %.0f s): %s", attempt, delay, e)
+            time.sleep(delay)
+            continue
+        mark_live(started)
+
+def ensure_warm_up():
+    """Start the warm-up thread unless it is running or the database is already live."""
+    global _warmup_thread
+    if live_ready.is_set() or (_warmup_thread is not None and _warmup_thread.is_alive()):
+        return
+    with _live_lock:
+        if _warmup_thread is None or not _warmup_thread.is_alive():
+            _warmup_thread = threading.Thread(target=warm_up_live_connection, name="live-warmup", daemon=True)
+            _warmup_thread.start()
+
+def snapshot_read(read):
+    """`read(flight_snapshot)` while the live connection is still warming up, else None."""
+    if live_ready.is_set() or not flight_snapshot.loaded:
+        return None
+    # With FIREBASE_WARMUP=0 the first request served from the snapshot starts the warm-up
+    ensure_warm_up()
+    return read(flight_snapshot)
+
+def mark_snapshot(res: Response) -> Response:
+    res.headers["X-Data-Source"] = "snapshot"
+    res.headers["X-Snapshot-Age"] = str(int(flight_snapshot.age() or 0))
+    return res
+
+if STORAGE_BACKEND == "local":
+    live_ready.set()
+else:
+    flight_snapshot.load()
+    if os.environ.get("FIREBASE_WARMUP", "1") != "0":
+        ensure_warm_up()
+
+# DB_TRACE=header|log: per-request database round trips, checked against @db_budget
+db_tracer = DbTracer(app)
+
 @app.route("/")
+@db_budget(0)
 def home():
     return jsonify({
         "status": "backend running", 
@@ -98,8 +254,6 @@ def home():
     })
 
 # --- 1. Get All Flights (Traverses Airports Node) ---
-from flask import request, jsonify
-import traceback
 
 # List of supported airports for validation
 SUPPORTED_AIRPORTS = [
@@ -108,7 +262,14 @@ SUPPORTED_AIRPORTS = [
     "LHR", "MAA", "ORD", "SFO", "SIN", "SYD", "YYZ"
 ]
 
+# Keys of a /flights item; `fields=` may select any subset of these
+FLIGHT_FIELDS = (
+    "id", "airline", "source", "destination", "dest_city", "departure_time",
+    "arrival_time", "status", "passenger_count", "passengers"
+)
+
 @app.route("/flights", methods=["GET"])
+@db_budget(3)
 def get_flights():
     try:
         # 1. Get and sanitize airport code
@@ -122,18 +283,48 @@ def get_flights():
                 "message": f"Airport {target_airport} not supported or missing"
             }), 200
 
-        root = get_database()
-        
+        # view=full (default) keeps the passenger map, view=summary drops it.
+        # fields=a,b,c projects each item onto the listed keys.
+        view = request.args.get('view', 'full').strip().lower()
+        if view not in ("full", "summary"):
+            return jsonify({"ok": False, "error": "view must be 'summary' or 'full'"}), 400
+        fields = [f.strip() for f in request.args.get('fields', '').split(',') if f.strip()]
+        unknown = [f for f in fields if f not in FLIGHT_FIELDS]
+        if unknown:
+            return jsonify({"ok": False, "error": f"Unknown fields: {', '.join(unknown)}"}), 400
+        needs_passengers = ("passengers" in fields) if fields else view == "full"
+
+        # Cold start: summaries come from the local snapshot until the live connection is up
+        snapshot = None if needs_passengers else snapshot_read(lambda snap: snap.airport(target_airport))
+        if snapshot is not None:
+            flights_node, version = snapshot
+        else:
+            # Conditional GET: cache_versions/<airport> moves on every flight write,
+            # so an unchanged token means the client's copy is still current
+            version = airport_version(target_airport)
+
+        # The same URL answers NDJSON, a streamed array or plain JSON depending on
+        # Accept, so the format is part of the ETag and caches must vary on it
+        fmt = stream_format()
+
+        def respond(res):
+            res.vary.add("Accept")
+            return mark_snapshot(res) if snapshot is not None else res
+
+        etag = version_etag("flights", target_airport, view, ",".join(fields), fmt, version) if version else None
+        if etag_matches(etag):
+            return respond(not_modified(etag))
+
         # 3. Access the specific branch
-        # .get() on a node that doesn't exist returns None
-        flights_node = root.child("airports").child(target_airport).child("flights").get()
+        # Summaries come from route_index (no passenger data on the wire);
+        # fall back to the full flights node if the index has not been built.
+        if snapshot is None:
+            flights_node = None if needs_passengers else merge_route_summaries(cached_get(f"route_index/{target_airport}"))
+        if flights_node is None:
+            # .get() on a node that doesn't exist returns None
+            flights_node = cached_get(f"airports/{target_airport}/flights")
         
         # 4. Handle Empty or Non-Dictionary results
-        if not flights_node:
-            return jsonify({"ok": True, "data": []}), 200
-
-        flights_list = []
-
         # FIX: Ensure flights_node is a dictionary. 
         # If Firebase keys are numeric, it might mistakenly return a List.
         if isinstance(flights_node, list):
@@ -142,25 +333,45 @@ def get_flights():
         elif isinstance(flights_node, dict):
             iterable = flights_node.items()
         else:
-            return jsonify({"ok": True, "data": []}), 200
-
-        for f_id, f_info in iterable:
-            if f_info and isinstance(f_info, dict):
-                # Map all keys to what React AdminDashboard expects
-                flight_obj = {
-                    "id": str(f_id), # The key (e.g., 6E203)
-                    "airline": f_info.get("airline", "Unknown"),
-                    "source": target_airport,
-                    "destination": f_info.get("destination", "N/A"),
-                    "dest_city": f_info.get("dest_city", "N/A"),
-                    "departure_time": f_info.get("dep_time", "N/A"), # Map dep_time -> departure_time
-                    "arrival_time": f_info.get("arrival_time", "N/A"),
-                    "status": f_info.get("status", "Scheduled"),
-                    "passengers": f_info.get("passengers", {})
-                }
-                flights_list.append(flight_obj)
-
-        return jsonify({"ok": True, "data": flights_list}), 200
+            # Nothing stored: an empty list, still in the requested format with ETag / Vary
+            iterable = ()
+
+        # Split flights keep their passengers under manifests/<airport> (see manifests.py):
+        # one more read, and only for views that include passengers
+        manifests = {}
+        if needs_passengers and isinstance(flights_node, dict) and any(is_split(f) for f in flights_node.values()):
+            manifests = airport_passengers(flights_node, cached_get(f"{MANIFESTS}/{target_airport}"))
+
+        def flight_items():
+            for f_id, f_info in iterable:
+                if f_info and isinstance(f_info, dict):
+                    passengers = manifests[f_id] if f_id in manifests else f_info.get("passengers", {})
+                    # Map all keys to what React AdminDashboard expects
+                    flight_obj = {
+                        "id": str(f_id), # The key (e.g., 6E203)
+                        "airline": f_info.get("airline", "Unknown"),
+                        "source": target_airport,
+                        "destination": f_info.get("destination", "N/A"),
+                        "dest_city": f_info.get("dest_city", "N/A"),
+                        "departure_time": f_info.get("dep_time", "N/A"), # Map dep_time -> departure_time
+                        "arrival_time": f_info.get("arrival_time", "N/A"),
+                        "status": f_info.get("status", "Scheduled"),
+                        "passenger_count": f_info.get("passenger_count", len(passengers) if isinstance(passengers, dict) else 0)
+                    }
+                    if needs_passengers:
+                        flight_obj["passengers"] = passengers
+                    if fields:
+                        flight_obj = {k: flight_obj[k] for k in fields}
+                    yield flight_obj
+
+        res = stream_list(flight_items(), {"ok": True}, fmt=fmt)
+        if res is not None:
+            res.headers["Cache-Control"] = "no-cache"
+            if etag:
+                res.set_etag(etag)
+        else:
+            res = conditional_json({"ok": True, "data": list(flight_items())}, 200, etag)
+        return respond(res)
 
     except Exception as e:
         print(f"CRITICAL ERROR in /flights: {e}")
@@ -168,8 +379,9 @@ def get_flights():
         return jsonify({"ok": False, "error": str(e)}), 500
     
 
-# --- 2. Search Flights by Route (Optimized Pathing) ---
+# --- 2. Search Flights by Route (Route Index) ---
 @app.route("/flights/search", methods=["GET"])
+@db_budget(1)
 def search_flights():
     try:
         source = request.args.get('source', '').upper()
@@ -178,70 +390,112 @@ def search_flights():
         if not source or not destination:
             return jsonify({"ok": False, "error": "Source and destination are required"}), 400
 
-        root = get_database()
-        # Direct parent access using the 'source' airport code
-        airport_data = root.child("airports").child(source).get()
-
-        if not airport_data:
-            return jsonify({"ok": True, "data": []}), 200
-
-        filtered_flights = []
-        flights = airport_data.get("flights", {})
-        for f_id, f_info in flights.items():
-            # Matches 'destination' key in your new JSON
-            if f_info.get("destination", "").upper() == destination:
+        # route_index/<source>/<destination> holds passenger-free flight summaries
+        # (read from the local snapshot while the live connection warms up)
+        flights = snapshot_read(lambda snap: snap.route(source, destination))
+        from_snapshot = flights is not None
+        if not from_snapshot:
+            flights = cached_get(f"route_index/{source}/{destination}")
+        if not isinstance(flights, dict) or not flights:
+            res = jsonify({"ok": True, "data": []})
+            return (mark_snapshot(res) if from_snapshot else res), 200
+
+        def flight_items():
+            for f_id, f_info in flights.items():
+                if not isinstance(f_info, dict):
+                    continue
+                f_info.pop("passenger_count", None)
                 f_info["id"] = f_id
                 f_info["source"] = source
                 f_info["departure_time"] = f_info.get("dep_time")
                 if "price" not in f_info:
                     f_info["price"] = "₹4,999"
-                filtered_flights.append(f_info)
-        
-        return jsonify({"ok": True, "data": filtered_flights}), 200
+                yield f_info
+
+        res = stream_list(flight_items(), {"ok": True})
+        if res is None:
+            res = jsonify({"ok": True, "data": list(flight_items())})
+        return (mark_snapshot(res) if from_snapshot else res), 200
     except Exception as e:
         traceback.print_exc()
         return jsonify({"ok": False, "error": str(e)}), 500
 
-# --- 3. Get Booking by PNR (Deep Traverse Search) ---
+# --- 2a. Connecting Flights for Rebooking (1- and 2-stop, see connections.py) ---
+@app.route("/flights/connections", methods=["GET"])
+@db_budget(2)
+def search_connections():
+    try:
+        source = request.args.get('source', '').upper()
+        destination = request.args.get('destination', '').upper()
+
+        if not source or not destination or source == destination:
+            return jsonify({"ok": False, "error": "Different source and destination are required"}), 400
+        try:
+            after = parse_after(request.args.get('after') or request.args.get('date'))
+            max_stops = min(2, max(0, int(request.args.get('max_stops', 2))))
+            min_connection = request.args.get('min_connection')
+            min_connection = max(0, int(min_connection)) if min_connection else None
+            limit = min(50, max(1, int(request.args.get('limit', 10))))
+        except ValueError as e:
+            return jsonify({"ok": False, "error": str(e)}), 400
+
+        # Re-reads only the airports written since the last query (nothing on most requests)
+        route_graph.refresh(get_database())
+        itineraries = route_graph.search(source, destination, after=after, max_stops=max_stops,
+                                         min_connection=min_connection, limit=limit)
+        return jsonify({"ok": True, "data": [route_graph.describe(i) for i in itineraries]}), 200
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify({"ok": False, "error": str(e)}), 500
+
+def booking_from_records(pnr, air_code, f_id, f_data, p_info):
+    """Flatten a flight record and one of its passengers into the booking shape the frontend expects."""
+    return {
+        "pnr": pnr,
+        "passenger_name": p_info.get("name"),
+        "flight_id": f_id,
+        "source": air_code,
+        "destination": f_data.get("destination"),
+        "dest_city": f_data.get("dest_city"),
+        "departure_time": f_data.get("dep_time"),
+        "arrival_time": f_data.get("arrival_time"),
+        "status": p_info.get("status", "Confirmed"),
+        "seat": p_info.get("seat"),
+        "airline": f_data.get("airline"),
+        "booking_date": p_info.get("booking_date")
+    }
+
+# --- 3. Get Booking by PNR (Indexed Lookup) ---
 @app.route("/bookings/<pnr>", methods=["GET"])
+@db_budget(3)
 def get_booking_by_pnr(pnr):
     try:
         pnr = pnr.upper()
         root = get_database()
-        airports = root.child("airports").get()
-
-        if not airports:
-            return jsonify({"ok": False, "error": "Database empty"}), 404
-
-        # Search inside every airport node for the specific PNR
-        for air_code, air_data in airports.items():
-            flights = air_data.get("flights", {})
-            for f_id, f_data in flights.items():
-                passengers = f_data.get("passengers", {})
-                if pnr in passengers:
-                    p_info = passengers[pnr]
-                    return jsonify({
-                        "pnr": pnr,
-                        "passenger_name": p_info.get("name"),
-                        "flight_id": f_id,
-                        "source": air_code,
-                        "destination": f_data.get("destination"),
-                        "dest_city": f_data.get("dest_city"),
-                        "departure_time": f_data.get("dep_time"),
-                        "arrival_time": f_data.get("arrival_time"),
-                        "status": p_info.get("status", "Confirmed"),
-                        "seat": p_info.get("seat"),
-                        "airline": f_data.get("airline"),
-                        "booking_date": p_info.get("booking_date")
-                    }), 200
-
-        return jsonify({"ok": False, "error": "Booking not found"}), 404
+
+        # pnr_index/<PNR> points straight at airports/<src>/flights/<id>
+        entry = lookup_pnr(root, pnr)
+        if not entry:
+            return jsonify({"ok": False, "error": "Booking not found"}), 404
+
+        air_code = entry["airport"]
+        f_id = entry["flight_id"]
+        f_data = root.child("airports").child(air_code).child("flights").child(f_id).get()
+        # Split flights: read just this passenger from manifests/<src>/<id>/<pnr>
+        p_info = read_passenger(root, air_code, f_id, f_data, pnr) if isinstance(f_data, dict) else None
+
+        # Stale index entry (flight removed or passenger moved) -> treat as missing
+        if not isinstance(p_info, dict):
+            return jsonify({"ok": False, "error": "Booking not found"}), 404
+
+        return jsonify(booking_from_records(pnr, air_code, f_id, f_data, p_info)), 200
     except Exception as e:
         traceback.print_exc()
         return jsonify({"ok": False, "error": str(e)}), 500
 
 # --- 4. Add Flight (Hierarchical Entry) ---
 @app.route("/add-flight", methods=["POST"])
+@db_budget(3)
 def add_flight():
     try:
         data = request.get_json(force=True)
@@ -268,8 +522,16 @@ def add_flight():
         # Ensure airline field exists
         data["airline"] = data.get("airline_name") or data.get("airline") or data.get("airline_code")
 
-        # airports -> {source} -> flights -> {flight_id}
-        root.child("airports").child(source).child("flights").child(flight_id).set(data)
+        # airports -> {source} -> flights -> {flight_id}, passengers -> manifests/{source}/{flight_id}
+        # Flight, manifest and index entries go out in one multi-path update
+        previous = root.child("airports").child(source).child("flights").child(flight_id).get()
+        if isinstance(previous, dict):
+            # Only the replaced PNRs are needed (for pnr_index), not the records
+            previous = with_passengers(previous, read_passengers(root, source, flight_id, previous, shallow=True))
+        batch = WriteBatch(root)
+        batch.update(flight_writes(source, flight_id, data))
+        batch.update(flight_index_updates(source, flight_id, previous, data))
+        commit_flight_write(batch, source)
         
         return jsonify({"ok": True, "message": "Flight added to database"}), 201
     except Exception as e:
@@ -277,67 +539,77 @@ def add_flight():
         return jsonify({"ok": False, "error": str(e)}), 500
 
 # --- 5. Cancel Flight & Notify Passengers ---
-import resend
-import os
-from datetime import datetime
-import traceback
-from flask import jsonify, request
+# Resend is imported and configured on the first send (outbox.resend_client)
 
-# Initialize Resend
-resend.api_key = os.getenv("RESEND_API_KEY")
+def build_cancellation_email(passenger_email, passenger_name, flight_id, source, destination, reason):
+    """Builds the Resend params for a high-end, airline-style cancellation email."""
+    event = EMAIL_TEMPLATES["cancellation"].for_event(flight_id=flight_id, source=source, destination=destination, reason=reason)
+    return event.message(passenger_email, passenger_name=passenger_name)
 
 def send_professional_email(passenger_email, passenger_name, flight_id, source, destination, reason):
     """Sends a high-end, airline-style cancellation email."""
-    
-    # Professional HTML Template
-    html_content = f"""
-    <div style="font-family: Arial, sans-serif; max-width: 600px; margin: auto; border: 1px solid #e0e0e0; border-radius: 10px; overflow: hidden;">
-        <div style="background-color: #dc2626; padding: 20px; text-align: center;">
-            <h1 style="color: white; margin: 0; font-size: 24px;">UDAAN SATHI</h1>
-            <p style="color: #fee2e2; margin: 5px 0 0 0;">Important Travel Update</p>
-        </div>
-        <div style="padding: 30px; color: #333; line-height: 1.6;">
-            <h2 style="color: #111;">Flight Cancellation Notice</h2>
-            <p>Dear <strong>{passenger_name}</strong>,</p>
-            <p>We regret to inform you that your upcoming flight <strong>{flight_id}</strong> from <strong>{source}</strong> to <strong>{destination}</strong> has been cancelled due to <strong>{reason}</strong>.</p>
-            
-            <div style="background-color: #f9fafb; border-radius: 8px; padding: 20px; margin: 20px 0; border: 1px border-left: 4px solid #dc2626;">
-                <p style="margin: 0;"><strong>Flight Number:</strong> {flight_id}</p>
-                <p style="margin: 5px 0 0 0;"><strong>Route:</strong> {source} &rarr; {destination}</p>
-            </div>
-
-            <p>Your comfort and safety are our priorities. We have already prepared your options in the <strong>Disruption Control Center</strong>:</p>
-            
-            <div style="text-align: center; margin: 30px 0;">
-                <a href="http://localhost:5173/user/disruption" 
-                   style="background-color: #dc2626; color: white; padding: 14px 25px; text-decoration: none; font-weight: bold; border-radius: 5px; display: inline-block;">
-                   View Refund & Rebooking Options
-                </a>
-            </div>
-
-            <p style="font-size: 14px; color: #666;">
-                If you require immediate assistance, please visit our help desk at the airport or reply to this email.
-            </p>
-        </div>
-        <div style="background-color: #f3f4f6; padding: 20px; text-align: center; font-size: 12px; color: #9ca3af;">
-            &copy; 2025 Udaan Sathi Airlines. All rights reserved.
-        </div>
-    </div>
-    """
-
     try:
-        resend.Emails.send({
-            "from": "Udaan Sathi <onboarding@resend.dev>",
-            "to": passenger_email,
-            "subject": f"URGENT: Your flight {flight_id} has been cancelled",
-            "html": html_content
-        })
+        resend_client().Emails.send(build_cancellation_email(passenger_email, passenger_name, flight_id, source, destination, reason))
         return True
     except Exception as e:
         print(f"Email Error: {e}")
         return False
 
+def _record_email_job(job):
+    """Mirror job progress to email_jobs/<id> so every worker can answer the status endpoint."""
+    safe_ref(f"email_jobs/{job.id}").set(job.to_dict())
+
+# Shared background sender for cancel/delay fan-out (see outbox.py)
+email_outbox = EmailOutbox(on_progress=_record_email_job)
+
+def plan_cancellation(batch: WriteBatch, source, flight_id, flight_data, reason) -> list:
+    """
+    Queue one cancellation into `batch` (archive with the full passenger list,
+    a notification per passenger, removal of the flight, its manifest and its
+    index entries) and return the emails to send once it is committed.
+    `flight_data` must carry its passengers (see with_passengers).
+    """
+    # 1. ARCHIVE: Save to cancelled_flights with full passenger list
+    archive_data = {
+        **flight_data,
+        "status": "CANCELLED",
+        "cancel_reason": reason,
+        "cancelled_at": datetime.utcnow().isoformat()
+    }
+    batch.set(f"cancelled_flights/{flight_id}", archive_data)
+
+    # 2. NOTIFY & EMAIL: Process each passenger
+    passengers = flight_data.get("passengers", {})
+    destination = flight_data.get("destination", "Destination")
+    # Flight-level email body is rendered once; only the name differs per passenger
+    email_event = EMAIL_TEMPLATES["cancellation"].for_event(flight_id=flight_id, source=source, destination=destination, reason=reason)
+    emails = []
+
+    for pnr, p_info in passengers.items():
+        email = p_info.get("email")
+        name = p_info.get("name")
+
+        # Push App Notification
+        notification = {
+            "title": "FLIGHT CANCELLED",
+            "message": f"Flight {flight_id} to {destination} cancelled. Reason: {reason}.",
+            "type": "CANCELLED",
+            "timestamp": datetime.utcnow().isoformat()
+        }
+        push_notification(batch, pnr, notification)
+
+        # Queue Professional Email
+        if email:
+            emails.append(email_event.message(email, passenger_name=name))
+
+    # 3. DELETE: Remove from active airport flights (last, so a partial commit leaves it active)
+    batch.update(flight_index_updates(source, flight_id, flight_data, None))
+    batch.delete(manifest_path(source, flight_id))
+    batch.delete(flight_path(source, flight_id))
+    return emails
+
 @app.route("/cancel-flight", methods=["POST"])
+@db_budget(4)
 def cancel_flight():
     try:
         data = request.get_json()
@@ -351,101 +623,48 @@ def cancel_flight():
 
         if not flight_data:
             return jsonify({"ok": False, "error": "Flight not found in active database"}), 404
+        flight_data = with_passengers(flight_data, read_passengers(root, source, flight_id, flight_data))
 
-        # 1. ARCHIVE: Save to cancelled_flights with full passenger list
-        archive_data = {
-            **flight_data,
-            "status": "CANCELLED",
-            "cancel_reason": reason,
-            "cancelled_at": datetime.utcnow().isoformat()
-        }
-        root.child("cancelled_flights").child(flight_id).set(archive_data)
-
-        # 2. NOTIFY & EMAIL: Process each passenger
-        passengers = flight_data.get("passengers", {})
-        destination = flight_data.get("destination", "Destination")
-        
-        for pnr, p_info in passengers.items():
-            email = p_info.get("email")
-            name = p_info.get("name")
-
-            # Push App Notification
-            notification = {
-                "title": "FLIGHT CANCELLED",
-                "message": f"Flight {flight_id} to {destination} cancelled. Reason: {reason}.",
-                "type": "CANCELLED",
-                "timestamp": datetime.utcnow().isoformat()
-            }
-            root.child("notifications").child(pnr).push(notification)
-
-            # Send Professional Email
-            if email:
-                send_professional_email(email, name, flight_id, source, destination, reason)
+        # Archive, notifications, delete and index cleanup are committed together
+        batch = WriteBatch(root)
+        emails = plan_cancellation(batch, source, flight_id, flight_data, reason)
+        commit_flight_write(batch, source)
 
-        # 3. DELETE: Remove from active airport flights
-        flight_ref.delete()
+        # 4. EMAIL: Fan out in the background, poll /email-jobs/<job_id> for progress
+        job = email_outbox.submit("cancellation", emails, meta={"flight_id": flight_id, "source": source})
 
-        return jsonify({"ok": True, "message": "Flight cancelled, archived, and emails sent."}), 200
+        return jsonify({
+            "ok": True,
+            "message": f"Flight cancelled and archived. {len(emails)} emails queued.",
+            "email_job_id": job.id
+        }), 200
 
     except Exception as e:
         traceback.print_exc()
         return jsonify({"ok": False, "error": str(e)}), 500
 
 # --- 5b. Send Delay Email Notification ---
+def build_delay_email(passenger_email, passenger_name, flight_id, source, destination, new_time, delay_duration):
+    """Builds the Resend params for a professional delay notification email."""
+    event = EMAIL_TEMPLATES["delay"].for_event(flight_id=flight_id, source=source, destination=destination,
+                                               new_time=new_time, delay_duration=delay_duration)
+    return event.message(passenger_email, passenger_name=passenger_name)
+
 def send_delay_email(passenger_email, passenger_name, flight_id, source, destination, new_time, delay_duration):
     """Sends a professional delay notification email via Resend API."""
-    
-    html_content = f"""
-    <div style="font-family: Arial, sans-serif; max-width: 600px; margin: auto; border: 1px solid #e0e0e0; border-radius: 10px; overflow: hidden;">
-        <div style="background-color: #f59e0b; padding: 20px; text-align: center;">
-            <h1 style="color: white; margin: 0; font-size: 24px;">UDAAN SATHI</h1>
-            <p style="color: #fef3c7; margin: 5px 0 0 0;">Flight Delay Notice</p>
-        </div>
-        <div style="padding: 30px; color: #333; line-height: 1.6;">
-            <h2 style="color: #111;">Your Flight Has Been Delayed</h2>
-            <p>Dear <strong>{passenger_name}</strong>,</p>
-            <p>We regret to inform you that your flight <strong>{flight_id}</strong> from <strong>{source}</strong> to <strong>{destination}</strong> has been delayed.</p>
-            
-            <div style="background-color: #fffbeb; border-radius: 8px; padding: 20px; margin: 20px 0; border-left: 4px solid #f59e0b;">
-                <p style="margin: 0;"><strong>Flight Number:</strong> {flight_id}</p>
-                <p style="margin: 5px 0 0 0;"><strong>Route:</strong> {source} &rarr; {destination}</p>
-                <p style="margin: 5px 0 0 0;"><strong>New Departure Time:</strong> {new_time}</p>
-                <p style="margin: 5px 0 0 0;"><strong>Delay:</strong> {delay_duration}</p>
-            </div>
-
-            <p>We sincerely apologize for any inconvenience this may cause. Please check the <strong>Udaan Sathi Dashboard</strong> for the latest updates:</p>
-            
-            <div style="text-align: center; margin: 30px 0;">
-                <a href="http://localhost:5173/user/dashboard" 
-                   style="background-color: #f59e0b; color: white; padding: 14px 25px; text-decoration: none; font-weight: bold; border-radius: 5px; display: inline-block;">
-                   View Flight Status
-                </a>
-            </div>
-
-            <p style="font-size: 14px; color: #666;">
-                If you require immediate assistance, please visit our help desk at the airport or reply to this email.
-            </p>
-        </div>
-        <div style="background-color: #f3f4f6; padding: 20px; text-align: center; font-size: 12px; color: #9ca3af;">
-            &copy; 2025 Udaan Sathi Airlines. All rights reserved.
-        </div>
-    </div>
-    """
-
     try:
-        resend.Emails.send({
-            "from": "Udaan Sathi <onboarding@resend.dev>",
-            "to": passenger_email,
-            "subject": f"NOTICE: Your flight {flight_id} has been delayed",
-            "html": html_content
-        })
+        resend_client().Emails.send(build_delay_email(passenger_email, passenger_name, flight_id, source, destination, new_time, delay_duration))
         return True
     except Exception as e:
         print(f"Delay Email Error: {e}")
         return False
 
 # --- 6. Ticket Download (ReportLab PDF) ---
+# Rendered PDFs are cached by a hash of the booking fields (see tickets.py)
+ticket_cache = TicketCache()
+
 @app.route("/bookings/<pnr>/ticket", methods=["GET"])
+@db_budget(3)
 def download_ticket(pnr):
     try:
         # Reuse internal logic to find the booking
@@ -454,39 +673,206 @@ def download_ticket(pnr):
             return response
         
         booking = response.get_json()
-        buffer = io.BytesIO()
-        from reportlab.pdfgen import canvas
-        
-        p = canvas.Canvas(buffer)
-        p.setFont("Helvetica-Bold", 18)
-        p.drawString(100, 800, "UDAAN SATHI E-TICKET")
-        p.setFont("Helvetica", 12)
-        
-        y = 750
-        for key, value in booking.items():
-            p.drawString(100, y, f"{key.upper()}: {value}")
-            y -= 25
-            
-        p.showPage()
-        p.save()
-        buffer.seek(0)
-        return send_file(buffer, mimetype="application/pdf", as_attachment=True, download_name=f"ticket_{pnr}.pdf")
+        pdf = ticket_cache.get_or_render(booking)
+        return send_file(io.BytesIO(pdf), mimetype="application/pdf", as_attachment=True, download_name=f"ticket_{pnr}.pdf")
     except Exception as e:
         return jsonify({"ok": False, "error": "PDF Generation failed: " + str(e)}), 500
 
+# --- 6a. Bulk Ticket Export (ZIP of every passenger on a flight) ---
+@app.route("/flights/<airport>/<flight_id>/tickets.zip", methods=["GET"])
+@db_budget(2)
+def download_flight_tickets(airport, flight_id):
+    try:
+        airport = airport.upper()
+        root = get_database()
+        f_data = root.child("airports").child(airport).child("flights").child(flight_id).get()
+        if not isinstance(f_data, dict):
+            return jsonify({"ok": False, "error": "Flight not found"}), 404
+
+        passengers = read_passengers(root, airport, flight_id, f_data)
+        bookings = [
+            booking_from_records(pnr, airport, flight_id, f_data, p_info)
+            for pnr, p_info in sorted(passengers.items())
+            if isinstance(p_info, dict)
+        ]
+        if not bookings:
+            return jsonify({"ok": False, "error": "No passengers on this flight"}), 404
+
+        return Response(
+            stream_tickets_zip(bookings, ticket_cache),
+            mimetype="application/zip",
+            headers={"Content-Disposition": f"attachment; filename=tickets_{airport}_{flight_id}.zip"}
+        )
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify({"ok": False, "error": "Ticket export failed: " + str(e)}), 500
+
+# --- 6b. Email Job Status ---
+@app.route("/email-jobs/<job_id>", methods=["GET"])
+@db_budget(1)
+def get_email_job(job_id):
+    try:
+        job = email_outbox.get(job_id)
+        # Jobs started by another worker are only visible through the database mirror
+        data = job.to_dict() if job else safe_ref(f"email_jobs/{job_id}").get()
+        if not data:
+            return jsonify({"ok": False, "error": "Email job not found"}), 404
+        return jsonify({"ok": True, "data": data}), 200
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify({"ok": False, "error": str(e)}), 500
+
+# --- 6c. Cache Statistics (for tuning FLIGHT_CACHE_TTL / TICKET_CACHE_MAX_BYTES) ---
+@app.route("/cache/stats", methods=["GET"])
+@db_budget(0)
+def cache_stats():
+    return jsonify({"ok": True, "data": {
+        "flights": flight_cache.stats(),
+        "tickets": ticket_cache.stats(),
+        "snapshot": dict(flight_snapshot.stats(), live_ready=live_ready.is_set()),
+        "route_graph": route_graph.stats(),
+        "notification_streams": notification_hub.stats(),
+        "firebase": firebase_status(),
+    }}), 200
+
+# --- 6d. Prometheus Metrics (per worker; see metrics.py) ---
+@app.route("/metrics", methods=["GET"])
+@db_budget(0)
+def prometheus_metrics():
+    if not request_metrics.authorized():
+        return jsonify({"ok": False, "error": "Unauthorized"}), 401
+    return Response(request_metrics.render(), content_type=METRICS_CONTENT_TYPE)
+
 # --- 7. Get Notifications for PNR ---
+MAX_NOTIFICATIONS_PAGE = 500
+
 @app.route("/notifications/<pnr>", methods=["GET"])
+@db_budget(2)
 def get_notifications(pnr):
+    """
+    Notifications for a PNR, oldest first. Incremental polling:
+    ?since=<push-key> returns only entries newer than that key and
+    ?limit=N caps the page; `next_cursor` is the key to pass as `since` next.
+    """
     try:
-        root = get_database()
-        data = root.child("notifications").child(pnr.upper()).get()
+        pnr = pnr.upper()
+        since = request.args.get("since", "").strip() or None
+        limit = request.args.get("limit", "").strip()
+        try:
+            limit = min(int(limit), MAX_NOTIFICATIONS_PAGE) if limit else None
+        except ValueError:
+            return jsonify({"ok": False, "error": "limit must be an integer"}), 400
+        if limit is not None and limit < 1:
+            return jsonify({"ok": False, "error": "limit must be positive"}), 400
+
+        # notification_versions/<PNR> is the key of the newest notification
+        version = safe_ref(f"{NOTIFICATION_VERSIONS}/{pnr}").get()
+        etag = version_etag("notifications", pnr, since, limit, version) if version else None
+        if etag_matches(etag):
+            return not_modified(etag)
+
+        # Push keys are time-ordered: nothing newer than the cursor, nothing to read
+        if since and version and version <= since:
+            return conditional_json({"ok": True, "data": [], "next_cursor": since, "has_more": False}, 200, etag)
+
         # Convert dictionary of push-IDs to a clean list for frontend
-        notifs = [{"id": k, **v} for k, v in data.items()] if data else []
-        return jsonify({"ok": True, "data": notifs}), 200
+        items = sorted(notifications_since(pnr, since, limit).items())
+        has_more = bool(limit) and len(items) > limit
+        if limit:
+            items = items[:limit]
+        notifs = [{"id": k, **v} for k, v in items]
+        next_cursor = items[-1][0] if items else since
+        return conditional_json({"ok": True, "data": notifs, "next_cursor": next_cursor, "has_more": has_more}, 200, etag)
     except Exception:
         return jsonify({"ok": True, "data": []}), 200
 
+@app.route("/notifications/<pnr>/stream", methods=["GET"])
+@db_budget(1)
+def stream_notifications(pnr):
+    """
+    Server-Sent Events feed of new notifications for a PNR. Resumes after
+    Last-Event-ID (or ?since=) with one keyed read; without a cursor only
+    notifications written from now on are sent. 404 unless the workers can
+    hold streams (NOTIFICATION_STREAM, see notification_hub.py); clients then
+    poll /notifications/<pnr>.
+    """
+    if not streams_enabled():
+        return jsonify({"ok": False, "error": "Notification streaming is disabled; poll /notifications/<pnr>"}), 404
+    pnr = pnr.upper()
+    since = (request.headers.get("Last-Event-ID") or request.args.get("since", "")).strip() or None
+    # Subscribe before the replay read so nothing committed in between is missed
+    sub = notification_hub.subscribe(pnr, since)
+    if sub is None:
+        return jsonify({"ok": False, "error": "Too many open notification streams"}), 503
+    backlog = {}
+    if since:
+        try:
+            backlog = notifications_since(pnr, since, MAX_NOTIFICATIONS_PAGE)
+        except Exception as e:
+            app.logger.warning("Notification replay for %s failed: %s", pnr, e)
+    res = Response(event_stream(notification_hub, sub, backlog), mimetype="text/event-stream")
+    res.headers["Cache-Control"] = "no-cache"
+    res.headers["X-Accel-Buffering"] = "no"
+    return res
+
+def plan_delay(batch: WriteBatch, source, flight_id, flight_data, passengers, delay_updates) -> list:
+    """
+    Queue one delay into `batch` (the flight's new dep_time / status / delay
+    fields, its index entries and a notification per passenger) and return
+    the emails to send once it is committed, tagged with their PNR.
+    """
+    new_time = delay_updates["dep_time"]
+    delay_duration = delay_updates["delay"]
+    batch.update({f"{flight_path(source, flight_id)}/{k}": v for k, v in delay_updates.items()})
+    batch.update(flight_index_updates(source, flight_id, flight_data, {**flight_data, **delay_updates}))
+    destination = flight_data.get("destination", "Unknown")
+
+    # Flight-level email body is rendered once; only the name differs per passenger
+    email_event = EMAIL_TEMPLATES["delay"].for_event(flight_id=flight_id, source=source, destination=destination,
+                                                     new_time=new_time, delay_duration=delay_duration)
+    emails = []
+    for pnr, p_info in passengers.items():
+        # Push App Notification
+        alert_data = {
+            "title": "FLIGHT DELAYED",
+            "message": f"Flight {flight_id} is delayed to {new_time}. Delay: {delay_duration}",
+            "type": "DELAYED",
+            "created_at": datetime.utcnow().isoformat()
+        }
+        push_notification(batch, pnr, alert_data)
+
+        # Queue Email Notification via Resend (tagged with the PNR it belongs to)
+        email = p_info.get("email")
+        name = p_info.get("name", "Passenger")
+        if email:
+            emails.append({**email_event.message(email, passenger_name=name), "tag": pnr})
+    return emails
+
+def mark_notified_on_complete(root, source, notified_paths: dict):
+    """
+    Email job callback: flag notification_sent on the passenger records whose
+    email went out. A flight cancelled (or a booking dropped) while the emails
+    were sending must stay deleted, and writing the flag under a removed node
+    would bring it back, so each passenger map is re-read (one shallow read
+    per flight) and PNRs that are gone are skipped.
+    """
+    def mark_notified(job):
+        by_parent = {}
+        for pnr in job.sent_tags:
+            if pnr in notified_paths:
+                parent, key = notified_paths[pnr].rsplit("/", 1)
+                by_parent.setdefault(parent, []).append(key)
+        flags = WriteBatch(root)
+        for parent, keys in by_parent.items():
+            present = root.child(parent).get(shallow=True)
+            present = present if isinstance(present, dict) else {}
+            flags.update({f"{parent}/{key}/notification_sent": True for key in keys if key in present})
+        if len(flags):
+            commit_flight_write(flags, source)
+    return mark_notified
+
 @app.route("/delay-flight", methods=["POST"])
+@db_budget(4)
 def delay_flight():
     try:
         data = request.get_json()
@@ -503,80 +889,272 @@ def delay_flight():
         
         if not flight_data:
             return jsonify({"ok": False, "error": "Flight not found"}), 404
-            
-        flight_ref.update({"dep_time": new_time, "status": "Delayed", "delay": delay_duration})
-        destination = flight_data.get("destination", "Unknown")
 
         # 2. Get all passengers for this flight
-        passengers = flight_data.get("passengers", {})
-        
+        passengers = read_passengers(root, source, flight_id, flight_data)
+
+        # 3. Flight fields, index entries and notifications are committed together
+        batch = WriteBatch(root)
+        delay_updates = {"dep_time": new_time, "status": "Delayed", "delay": delay_duration}
+        emails = plan_delay(batch, source, flight_id, flight_data, passengers, delay_updates)
+        commit_flight_write(batch, source)
+
         if not passengers:
             return jsonify({"ok": True, "message": "Flight delayed, but no passengers found to notify"}), 200
 
-        # 3. CREATE NOTIFICATIONS AND SEND EMAILS
-        emails_sent = 0
-        for pnr, p_info in passengers.items():
-            # Push App Notification
-            alert_data = {
-                "title": "FLIGHT DELAYED",
-                "message": f"Flight {flight_id} is delayed to {new_time}. Delay: {delay_duration}",
-                "type": "DELAYED",
-                "created_at": datetime.utcnow().isoformat()
-            }
-            root.child("notifications").child(pnr).push(alert_data)
-            
-            # Send Email Notification via Resend
-            email = p_info.get("email")
-            name = p_info.get("name", "Passenger")
-            if email:
-                if send_delay_email(email, name, flight_id, source, destination, new_time, delay_duration):
-                    emails_sent += 1
-                    # Mark notification as sent in the passenger record
-                    flight_ref.child("passengers").child(pnr).update({"notification_sent": True})
+        # Mark notification as sent in the passenger records, once the emails went out
+        notified_paths = {pnr: passenger_path(source, flight_id, flight_data, pnr) for pnr in passengers}
+        job = email_outbox.submit("delay", emails, meta={"flight_id": flight_id, "source": source},
+                                  on_complete=mark_notified_on_complete(root, source, notified_paths))
 
         return jsonify({
             "ok": True, 
-            "message": f"Flight delayed. {len(passengers)} passengers notified, {emails_sent} emails sent."
+            "message": f"Flight delayed. {len(passengers)} passengers notified, {len(emails)} emails queued.",
+            "email_job_id": job.id
         }), 200
     except Exception as e:
         print(f"Error: {e}")
         traceback.print_exc()
         return jsonify({"ok": False, "error": str(e)}), 500
-    
+
+# --- 5c. Bulk Disruption: cancel or delay many flights at one airport (see disruptions.py) ---
+def run_disruption(root, source, action, flights, passengers, delay_updates, reason):
+    """
+    Commit the disruption a few flights at a time and yield a progress event
+    per multi-path update, then the final summary. Each flight is planned on
+    its own and the batch is committed before adding it would overflow
+    WRITE_BATCH_MAX_PATHS / _BYTES, so a flight's writes never straddle two
+    updates (its node is deleted / updated in the same one as its archive and
+    notifications) unless that one flight alone exceeds the limits. If an
+    update fails the flights already committed are done, the rest are
+    untouched, and re-running the request finishes the job. Emails for the
+    committed flights are queued even when the client goes away mid-stream
+    (GeneratorExit at a progress yield).
+    """
+    started = time.perf_counter()
+    batch = WriteBatch(root)
+    # commit_flight_write adds the cache_versions/<SRC> token to every update
+    token_bytes = item_size(f"{CACHE_VERSIONS}/{source}", generate_push_key())
+    batch_bytes = 0
+    total = len(flights)
+    pending, committed, emails, pending_emails, notified_paths = [], [], [], [], {}
+    updates = 0
+    summary = {"ok": True, "event": "done", "action": action, "source": source}
+    try:
+        for f_id, flight in flights.items():
+            pax = passengers.get(f_id, {})
+            plan = WriteBatch(root, batch.max_paths, batch.max_bytes)
+            if action == "cancel":
+                flight_emails = plan_cancellation(plan, source, f_id, with_passengers(flight, pax), reason)
+            else:
+                flight_emails = plan_delay(plan, source, f_id, flight, pax, delay_updates[f_id])
+                notified_paths.update({pnr: passenger_path(source, f_id, flight, pnr) for pnr in pax})
+            plan_bytes = plan.size()
+            if len(batch) and (len(batch) + len(plan) + 1 > batch.max_paths
+                               or batch_bytes + plan_bytes + token_bytes > batch.max_bytes):
+                updates += commit_flight_write(batch, source)
+                batch_bytes = 0
+                committed.extend(pending)
+                emails.extend(pending_emails)
+                pending, pending_emails = [], []
+                yield {"event": "progress", "committed": len(committed), "total": total, "updates": updates}
+            batch.merge(plan)
+            batch_bytes += plan_bytes
+            pending_emails.extend(flight_emails)
+            pending.append(f_id)
+        if pending:
+            updates += commit_flight_write(batch, source)
+            committed.extend(pending)
+            emails.extend(pending_emails)
+            yield {"event": "progress", "committed": len(committed), "total": total, "updates": updates}
+    except Exception as e:
+        traceback.print_exc()
+        summary.update({"ok": False, "event": "error", "error": str(e)})
+    finally:
+        # Passengers of every committed flight are emailed, even when a later
+        # update failed or the streaming client disconnected
+        kind = "cancellation" if action == "cancel" else "delay"
+        meta = {"source": source, "bulk": True, "flights": len(committed)}
+        on_complete = mark_notified_on_complete(root, source, notified_paths) if action == "delay" else None
+        job = email_outbox.submit(kind, emails, meta=meta, on_complete=on_complete)
+
+    done = set(committed)
+    summary.update({
+        "flights": committed,
+        "not_processed": [f_id for f_id in flights if f_id not in done],
+        "passengers": sum(len(passengers.get(f_id, {})) for f_id in committed),
+        "emails_queued": len(emails),
+        "email_job_id": job.id,
+        "updates": updates,
+        "seconds": round(time.perf_counter() - started, 3),
+    })
+    yield summary
+
+@app.route("/bulk-disruption", methods=["POST"])
+def bulk_disruption():
+    """
+    Cancel or delay every flight at `source` matching the optional departure
+    window and `flight_ids`. Costs one flights read, one manifests/<SRC> read
+    when passengers are split out, and one multi-path update per
+    ~WRITE_BATCH_MAX_PATHS paths; emails go out as a single outbox job.
+
+    "dry_run": true returns the selection without writing. With
+    Accept: application/x-ndjson a progress event is streamed per update.
+    """
+    try:
+        data = request.get_json() or {}
+        source = (data.get("source") or "").upper()
+        action = data.get("action")
+        flight_ids = data.get("flight_ids")
+        reason = data.get("reason", "Operational reasons")
+        if not source or action not in DISRUPTION_ACTIONS:
+            return jsonify({"ok": False, "error": "source and action (cancel or delay) are required"}), 400
+        if flight_ids is not None and not isinstance(flight_ids, list):
+            return jsonify({"ok": False, "error": "flight_ids must be a list"}), 400
+        try:
+            start, end = parse_bound(data.get("from")), parse_bound(data.get("to"))
+        except ValueError as e:
+            return jsonify({"ok": False, "error": str(e)}), 400
+        minutes, new_time = data.get("delay_minutes"), data.get("new_time")
+        if action == "delay" and (minutes is None) == (new_time is None):
+            return jsonify({"ok": False, "error": "A delay needs either delay_minutes or new_time"}), 400
+
+        root = get_database()
+        flights, missing = select_flights(root.child("airports").child(source).child("flights").get(), flight_ids, start, end)
+
+        if data.get("dry_run"):
+            selection = [{"flight_id": f_id, **flight_summary(flight)} for f_id, flight in flights.items()]
+            return jsonify({"ok": True, "dry_run": True, "action": action, "source": source, "data": selection,
+                            "passengers": sum(f["passenger_count"] for f in selection), "missing": missing}), 200
+
+        # Every delay is worked out before anything is written, so a bad dep_time fails the whole request
+        delay_updates = {}
+        if action == "delay":
+            try:
+                minutes = int(minutes) if minutes is not None else None
+            except (TypeError, ValueError):
+                return jsonify({"ok": False, "error": "delay_minutes must be a whole number"}), 400
+            duration = data.get("delay") or (format_delay(minutes) if minutes is not None else "Unknown duration")
+            for f_id, flight in flights.items():
+                try:
+                    departure = delayed_departure(flight, minutes) if minutes is not None else {"dep_time": new_time}
+                except ValueError as e:
+                    return jsonify({"ok": False, "error": f"Flight {f_id}: {e}"}), 400
+                delay_updates[f_id] = {**departure, "status": "Delayed", "delay": duration}
+
+        # One read for the passengers of every selected flight
+        manifests = root.child(MANIFESTS).child(source).get() if any(is_split(f) for f in flights.values()) else None
+        passengers = airport_passengers(flights, manifests)
+
+        events = run_disruption(root, source, action, flights, passengers, delay_updates, reason)
+        if stream_format() == "ndjson":
+            start_event = {"event": "selected", "action": action, "source": source, "total": len(flights), "missing": missing}
+            return stream_list(itertools.chain([start_event], events), fmt="ndjson", chunk_bytes=1)
+
+        summary = list(events)[-1]
+        summary.pop("event")
+        summary["missing"] = missing
+        return jsonify(summary), 200 if summary["ok"] else 500
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify({"ok": False, "error": str(e)}), 500
+
 # --- ADD THESE TO app.py ---
 
+# cancelled_flights are read this many flights at a time (ordered by flight_id)
+REFUND_PAGE_FLIGHTS = int(os.environ.get("REFUND_PAGE_FLIGHTS", 50))
+
+def refund_rows(flight_id, flight_info):
+    """Flatten one archived flight into refund rows for the frontend table."""
+    passengers = flight_info.get('passengers', {}) if isinstance(flight_info, dict) else {}
+    for pax_id, details in (passengers.items() if isinstance(passengers, dict) else []):
+        yield {
+            "id": pax_id,
+            "flight_id": flight_id,
+            "name": details.get('name'),
+            "pnr": details.get('pnr'),
+            "amount": details.get('amount', '5500'), # Default if missing
+            "upi": details.get('upi', 'N/A'),
+            "email": details.get('email')
+        }
+
+def iter_cancelled_flights(after=None, page_size=REFUND_PAGE_FLIGHTS, max_flights=None):
+    """
+    Yield (flight_id, flight_info) from cancelled_flights in key order, reading
+    `page_size` flights per query so memory stays flat however large the
+    archive grows. Starts after the `after` flight_id when given.
+    """
+    ref = safe_ref('cancelled_flights')
+    cursor = after
+    emitted = 0
+    while max_flights is None or emitted < max_flights:
+        want = page_size if max_flights is None else min(page_size, max_flights - emitted)
+        query = ref.order_by_key()
+        if cursor is not None:
+            # start_at is inclusive, so ask for one extra and skip the cursor
+            query = query.start_at(cursor).limit_to_first(want + 1)
+        else:
+            query = query.limit_to_first(want)
+        page = [(k, v) for k, v in (query.get() or {}).items() if k != cursor]
+        for flight_id, flight_info in page[:want]:
+            yield flight_id, flight_info
+            emitted += 1
+        if len(page) < want:
+            return
+        cursor = page[want - 1][0]
+
 @app.route('/api/refunds', methods=['GET'])
 def get_refund_requests():
+    """
+    Refund rows for every passenger of every cancelled flight.
+      default                  -> JSON list of all rows
+      ?limit=N[&after=<id>]    -> {"data", "next_cursor", "has_more"} for N flights after <id>
+      ?format=ndjson           -> one JSON row per line, streamed as the archive is read
+    Accept: application/x-ndjson or application/json; stream=array also stream
+    (see streaming.py).
+    """
     try:
-        # Access the cancelled_flights node
-        ref = db.reference('cancelled_flights')
-        data = ref.get()
-        
-        refund_list = []
-        if data:
-            for flight_id, flight_info in data.items():
-                passengers = flight_info.get('passengers', {})
-                for pax_id, details in passengers.items():
-                    # Flattening data for the frontend table
-                    refund_list.append({
-                        "id": pax_id,
-                        "flight_id": flight_id,
-                        "name": details.get('name'),
-                        "pnr": details.get('pnr'),
-                        "amount": details.get('amount', '5500'), # Default if missing
-                        "upi": details.get('upi', 'N/A'),
-                        "email": details.get('email')
-                    })
+        after = request.args.get('after') or None
+        limit = request.args.get('limit')
+
+        def all_rows():
+            for flight_id, flight_info in iter_cancelled_flights(after):
+                yield from refund_rows(flight_id, flight_info)
+
+        if request.args.get('format') == 'ndjson':
+            return stream_list(all_rows(), fmt="ndjson")
+
+        if limit is not None:
+            limit = max(1, min(int(limit), 500))
+            refund_list = []
+            next_cursor = None
+            flights = list(iter_cancelled_flights(after, page_size=limit, max_flights=limit + 1))
+            for flight_id, flight_info in flights[:limit]:
+                refund_list.extend(refund_rows(flight_id, flight_info))
+                next_cursor = flight_id
+            return jsonify({
+                "ok": True,
+                "data": refund_list,
+                "next_cursor": next_cursor,
+                "has_more": len(flights) > limit
+            }), 200
+
+        streamed = stream_list(all_rows())
+        if streamed is not None:
+            return streamed
         
-        return jsonify(refund_list), 200
+        return jsonify(list(all_rows())), 200
+    except ValueError:
+        return jsonify({"error": "limit must be an integer"}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 @app.route('/api/refunds/<flight_id>/<pax_id>', methods=['DELETE'])
+@db_budget(1)
 def process_refund(flight_id, pax_id):
     try:
         # Remove the specific passenger child
-        ref = db.reference(f'cancelled_flights/{flight_id}/passengers/{pax_id}')
+        ref = safe_ref(f'cancelled_flights/{flight_id}/passengers/{pax_id}')
         ref.delete()
         return jsonify({"message": "Refund processed successfully"}), 200
     except Exception as e:
@@ -584,8 +1162,6 @@ def process_refund(flight_id, pax_id):
 
 # --- New: read refund_requests node so admin can see user-submitted requests (amounts, reason, upi, etc.) ---
 
-from flask import make_response
-
 # ALLOWED ORIGINS for CORS
 ALLOWED_ORIGINS = [
     "http://localhost:5173",
@@ -625,6 +1201,7 @@ def _read_local_refunds():
 # Route 1: List flights with refund requests for an airport (e.g., /api/refunds/DEL)
 @app.route("/api/refunds/<airport_code>", methods=["GET", "OPTIONS"], strict_slashes=False)
 @app.route("/api/refund_requests/<airport_code>", methods=["GET", "OPTIONS"], strict_slashes=False)
+@db_budget(1)
 def list_refund_flights_by_airport(airport_code):
     if request.method == "OPTIONS":
         res = make_response("", 200)
@@ -647,6 +1224,7 @@ def list_refund_flights_by_airport(airport_code):
 # Route 2: Get refund requests for a specific flight (e.g., /api/refunds/DEL/QR621)
 @app.route("/api/refunds/<airport_code>/<flight_id>", methods=["GET", "OPTIONS"], strict_slashes=False)
 @app.route("/api/refund_requests/<airport_code>/<flight_id>", methods=["GET", "OPTIONS"], strict_slashes=False)
+@db_budget(1)
 def get_refund_requests_by_flight(airport_code, flight_id):
     app.logger.info("🚀 HIT: Manifest for %s/%s", airport_code, flight_id)
     
@@ -659,39 +1237,33 @@ def get_refund_requests_by_flight(airport_code, flight_id):
     flight_id = str(flight_id).upper()
     
     try:
-        result = []
+        records = {}
         
         # PRIMARY SOURCE: Firebase refund_requests/{airport}/{flight}
         # Structure: refund_requests/DEL/QR621/{push_id}/{data}
         try:
             rref = safe_ref(f"refund_requests/{airport_code}/{flight_id}")
             rdata = rref.get() or {}
-            app.logger.info("📦 Firebase data for %s/%s: %s", airport_code, flight_id, rdata)
+            app.logger.info("📦 Firebase data for %s/%s: %d entries", airport_code, flight_id, len(rdata))
             
             if isinstance(rdata, dict):
-                for push_id, details in rdata.items():
-                    # Direct structure: push_id -> {amount, name, pnr, reason, status, timestamp, upi_id}
-                    if isinstance(details, dict):
-                        result.append({
-                            "passenger_id": str(push_id),
-                            "name": details.get("name", "Unknown"),
-                            "pnr": details.get("pnr") or push_id,
-                            "amount": details.get("amount", 0),
-                            "upi_id": details.get("upi_id", ""),
-                            "reason": details.get("reason", "Refund request"),
-                            "status": details.get("status", "pending"),
-                            "timestamp": details.get("timestamp")
-                        })
+                # Direct structure: push_id -> {amount, name, pnr, reason, status, timestamp, upi_id}
+                records = {str(k): v for k, v in rdata.items() if isinstance(v, dict)}
         except Exception as fb_exc:
             app.logger.exception("Firebase read failed: %s", fb_exc)
 
         # LOCAL FALLBACK
-        if not result:
+        if not records:
             local = _read_local_refunds()
             flight_map = local.get(airport_code, {}).get(flight_id, {}) if isinstance(local, dict) else {}
-            for pax_id, details in (flight_map.items() if isinstance(flight_map, dict) else []):
-                result.append({
-                    "passenger_id": str(pax_id),
+            if isinstance(flight_map, dict):
+                records = {str(k): v for k, v in flight_map.items() if isinstance(v, dict)}
+
+        def rows():
+            for pax_id in sorted(records):
+                details = records[pax_id]
+                yield {
+                    "passenger_id": pax_id,
                     "name": details.get("name", "Unknown"),
                     "pnr": details.get("pnr") or pax_id,
                     "amount": details.get("amount", 0),
@@ -699,12 +1271,15 @@ def get_refund_requests_by_flight(airport_code, flight_id):
                     "reason": details.get("reason", "Refund request"),
                     "status": details.get("status", "pending"),
                     "timestamp": details.get("timestamp")
-                })
+                }
+
+        app.logger.info("✅ Returning %d refund requests", len(records))
 
-        result.sort(key=lambda x: (x.get("passenger_id") or ""))
-        app.logger.info("✅ Returning %d refund requests", len(result))
+        streamed = stream_list(rows())
+        if streamed is not None:
+            return add_cors_headers(streamed), 200
         
-        return add_cors_headers(jsonify(result)), 200
+        return add_cors_headers(jsonify(list(rows()))), 200
         
     except Exception as e:
         app.logger.exception("get_refund_requests_by_flight error: %s", e)
@@ -713,6 +1288,7 @@ def get_refund_requests_by_flight(airport_code, flight_id):
 # Route 3: Finalize/delete a refund request
 @app.route("/api/refunds/<airport_code>/<flight_id>/<passenger_id>", methods=["DELETE", "OPTIONS"], strict_slashes=False)
 @app.route("/api/refund_requests/<airport_code>/<flight_id>/<passenger_id>", methods=["DELETE", "OPTIONS"], strict_slashes=False)
+@db_budget(1)
 def finalize_refund_request(airport_code, flight_id, passenger_id):
     if request.method == "OPTIONS":
         res = make_response("", 200)
@@ -741,20 +1317,22 @@ def get_flight_record(airport: str, flight_id: str):
     Return flight record dict from Realtime DB (or None).
     """
     try:
-        root = get_database()
-        rec = root.child("airports").child(airport).child("flights").child(flight_id).get()
+        rec = cached_get(flight_path(airport, flight_id))
         return rec or None
     except Exception as e:
         print("Error fetching flight record:", e)
         return None
 
-def send_notifications_to_passengers(flight_obj: dict, message: str, ntype: str = "UPDATE"):
+def send_notifications_to_passengers(flight_obj: dict, message: str, ntype: str = "UPDATE", batch: WriteBatch = None):
     """
     Write notification(s) to the Realtime DB under /notifications/<PNR>.
     flight_obj: flight record expected to contain a 'passengers' mapping (pnr -> passengerObj).
+    batch: add the notifications to the caller's WriteBatch instead of committing them here.
     """
     try:
-        root = get_database()
+        own_batch = batch is None
+        if own_batch:
+            batch = WriteBatch(get_database())
         passengers = {}
         if isinstance(flight_obj, dict):
             passengers = flight_obj.get("passengers") or {}
@@ -767,10 +1345,9 @@ def send_notifications_to_passengers(flight_obj: dict, message: str, ntype: str
                 "type": ntype,
                 "timestamp": now_iso
             }
-            try:
-                root.child("notifications").child(pnr.upper()).push(notif)
-            except Exception as e:
-                print(f"Failed to push notification for PNR {pnr}: {e}")
+            push_notification(batch, pnr.upper(), notif)
+        if own_batch:
+            batch.commit()
     except Exception as ex:
         print("send_notifications_to_passengers error:", ex)
 
@@ -778,6 +1355,7 @@ def send_notifications_to_passengers(flight_obj: dict, message: str, ntype: str
 # merge with your real handler logic:
 @app.route('/flights/<airport>/<flight_id>', methods=['GET','PATCH','DELETE','POST'])
 @app.route('/flights/<airport>/<flight_id>.json', methods=['GET','PATCH','DELETE','POST'])
+@db_budget(3)
 def flight_item(airport, flight_id):
     # normalize id (strip .json if present)
     clean_id = flight_id.replace('.json', '')
@@ -787,6 +1365,8 @@ def flight_item(airport, flight_id):
         flight = get_flight_record(airport, clean_id)
         if not flight:
             return jsonify({"ok": False, "error": "Flight not found"}), 404
+        if is_split(flight):
+            flight = with_passengers(flight, read_passengers(root, airport, clean_id, flight, reader=cached_get))
         # attach id and source for frontend convenience
         flight_resp = {"id": clean_id, **(flight if isinstance(flight, dict) else {})}
         return jsonify({"ok": True, "data": flight_resp}), 200
@@ -803,12 +1383,20 @@ def flight_item(airport, flight_id):
             for k, v in data.items():
                 if k in allowed or k.startswith("custom_"):
                     updates[k] = v
+            # Flight fields, index entries, notifications and the cache version go out together
+            batch = WriteBatch(root)
             if updates:
-                flight_ref.update(updates)
+                batch.update({f"{flight_path(airport, clean_id)}/{k}": v for k, v in updates.items()})
+                if existing:
+                    batch.update(flight_index_updates(airport, clean_id, existing, {**existing, **updates}))
             # notify passengers if requested
             if data.get("notifyPassengers"):
-                # fetch updated flight (after applying updates)
-                flight = get_flight_record(airport, clean_id) or {"id": clean_id, "flight_number": data.get("flight_number", clean_id), "source": airport}
+                # the flight as it is after this update, built locally instead of read back;
+                # notifications only need the PNRs, so split manifests are read shallow
+                if existing:
+                    flight = with_passengers({**existing, **updates}, read_passengers(root, airport, clean_id, existing, shallow=True))
+                else:
+                    flight = {"id": clean_id, "flight_number": data.get("flight_number", clean_id), "source": airport}
                 status = data.get("status", "Updated")
                 delay = data.get("delay")
                 dep_time = data.get("dep_time")
@@ -820,7 +1408,11 @@ def flight_item(airport, flight_id):
                 if dep_time:
                     parts.append(f"New departure: {dep_time}")
                 message = " · ".join(parts) or "Flight update"
-                send_notifications_to_passengers(flight, message, ntype=(status or "UPDATE"))
+                send_notifications_to_passengers(flight, message, ntype=(status or "UPDATE"), batch=batch)
+            if updates:
+                commit_flight_write(batch, airport)
+            elif len(batch):
+                batch.commit()
             return jsonify({"ok": True}), 200
         except Exception as e:
             traceback.print_exc()
@@ -832,12 +1424,17 @@ def flight_item(airport, flight_id):
             flight_data = flight_ref.get()
             if not flight_data:
                 return jsonify({"ok": False, "error": "Flight not found"}), 404
+            flight_data = with_passengers(flight_data, read_passengers(root, airport, clean_id, flight_data))
             # archive and delete similar to cancel_flight behavior (lightweight)
+            batch = WriteBatch(root)
             archive = {**flight_data, "cancelled_at": datetime.utcnow().isoformat()}
-            root.child("cancelled_flights").child(clean_id).set(archive)
-            flight_ref.delete()
+            batch.set(f"cancelled_flights/{clean_id}", archive)
+            batch.delete(flight_path(airport, clean_id))
+            batch.delete(manifest_path(airport, clean_id))
+            batch.update(flight_index_updates(airport, clean_id, flight_data, None))
             # notify passengers about cancellation
-            send_notifications_to_passengers(archive, f"Flight {archive.get('flight_number', clean_id)} has been cancelled.", ntype="CANCELLED")
+            send_notifications_to_passengers(archive, f"Flight {archive.get('flight_number', clean_id)} has been cancelled.", ntype="CANCELLED", batch=batch)
+            commit_flight_write(batch, airport)
             return jsonify({"ok": True}), 200
         except Exception as e:
             traceback.print_exc()
@@ -845,8 +1442,6 @@ def flight_item(airport, flight_id):
 
     return jsonify({"ok": False, "error": "Method not allowed"}), 405
 
-from flask import make_response
-
 # Helper to add CORS to any response (uses ALLOWED_ORIGINS defined above)
 def add_cors(res):
     origin = request.headers.get("Origin", "")
@@ -860,6 +1455,7 @@ def add_cors(res):
     return res
 
 @app.route("/api/refunds/submit", methods=["POST", "OPTIONS"])
+@db_budget(1)
 def submit_refund():
     if request.method == "OPTIONS":
         return add_cors(make_response("", 200))
@@ -0,0 +1,117 @@
+"""
+Micro-benchmark: per-passenger email rendering cost for one flight event.
+
+Compares the inline f-string previously used by send_professional_email
+against the compiled two-stage templates in email_templates.py.
+
+    python benchmarks/email_render.py [--passengers 500] [--repeat 20]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from email_templates import EMAIL_TEMPLATES  # noqa: E402
+
+
+def legacy_cancellation_html(passenger_name, flight_id, source, destination, reason):
+    """The f-string send_professional_email rendered for every passenger."""
+    return f"""
+    <div style="font-family: Arial, sans-serif; max-width: 600px; margin: auto; border: 1px solid #e0e0e0; border-radius: 10px; overflow: hidden;">
+        <div style="background-color: #dc2626; padding: 20px; text-align: center;">
+            <h1 style="color: white; margin: 0; font-size: 24px;">UDAAN SATHI</h1>
+            <p style="color: #fee2e2; margin: 5px 0 0 0;">Important Travel Update</p>
+        </div>
+        <div style="padding: 30px; color: #333; line-height: 1.6;">
+            <h2 style="color: #111;">Flight Cancellation Notice</h2>
+            <p>Dear <strong>{passenger_name}</strong>,</p>
+            <p>We regret to inform you that your upcoming flight <strong>{flight_id}</strong> from <strong>{source}</strong> to <strong>{destination}</strong> has been cancelled due to <strong>{reason}</strong>.</p>
+            
+            <div style="background-color: #f9fafb; border-radius: 8px; padding: 20px; margin: 20px 0; border: 1px border-left: 4px solid #dc2626;">
+                <p style="margin: 0;"><strong>Flight Number:</strong> {flight_id}</p>
+                <p style="margin: 5px 0 0 0;"><strong>Route:</strong> {source} &rarr; {destination}</p>
+            </div>
+
+            <p>Your comfort and safety are our priorities. We have already prepared your options in the <strong>Disruption Control Center</strong>:</p>
+            
+            <div style="text-align: center; margin: 30px 0;">
+                <a href="http://localhost:5173/user/disruption" 
+                   style="background-color: #dc2626; color: white; padding: 14px 25px; text-decoration: none; font-weight: bold; border-radius: 5px; display: inline-block;">
+                   View Refund & Rebooking Options
+                </a>
+            </div>
+
+            <p style="font-size: 14px; color: #666;">
+                If you require immediate assistance, please visit our help desk at the airport or reply to this email.
+            </p>
+        </div>
+        <div style="background-color: #f3f4f6; padding: 20px; text-align: center; font-size: 12px; color: #9ca3af;">
+            &copy; 2025 Udaan Sathi Airlines. All rights reserved.
+        </div>
+    </div>
+    """
+
+
+def make_manifest(n: int) -> list:
+    return [(f"passenger{i}@email.com", f"Passenger {i}") for i in range(n)]
+
+
+def bench_legacy(manifest, event_args) -> list:
+    return [
+        {
+            "to": email,
+            "subject": f"URGENT: Your flight {event_args['flight_id']} has been cancelled",
+            "html": legacy_cancellation_html(name, **event_args),
+        }
+        for email, name in manifest
+    ]
+
+
+def bench_templates_html(manifest, event_args) -> list:
+    event = EMAIL_TEMPLATES["cancellation"].for_event(**event_args)
+    return [
+        {"to": email, "subject": event.subject, "html": event.render_html(passenger_name=name)}
+        for email, name in manifest
+    ]
+
+
+def bench_templates(manifest, event_args) -> list:
+    event = EMAIL_TEMPLATES["cancellation"].for_event(**event_args)
+    return [event.message(email, passenger_name=name) for email, name in manifest]
+
+
+def best_of(fn, repeat: int, *args) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--passengers", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    manifest = make_manifest(args.passengers)
+    event_args = {"flight_id": "6E558", "source": "DEL", "destination": "CAN", "reason": "Severe weather"}
+
+    legacy = best_of(bench_legacy, args.repeat, manifest, event_args)
+    compiled_html = best_of(bench_templates_html, args.repeat, manifest, event_args)
+    compiled = best_of(bench_templates, args.repeat, manifest, event_args)
+    n = max(1, args.passengers)
+
+    print(f"Rendering {args.passengers} cancellation emails (best of {args.repeat})")
+    print(f"  f-string per passenger    : {legacy * 1000:8.2f} ms total  {legacy / n * 1e6:7.2f} us/passenger")
+    print(f"  compiled template, html   : {compiled_html * 1000:8.2f} ms total  {compiled_html / n * 1e6:7.2f} us/passenger"
+          f"  ({legacy / compiled_html:.2f}x)")
+    print(f"  compiled template, + text : {compiled * 1000:8.2f} ms total  {compiled / n * 1e6:7.2f} us/passenger"
+          f"  ({legacy / compiled:.2f}x)")
+
+if __name__ == "__main__":
+    main()
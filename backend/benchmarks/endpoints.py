@@ -0,0 +1,379 @@
+"""
+Endpoint benchmark: every route in app.py through the Flask test client,
+against the local (in-memory) storage backend at several fixture sizes.
+
+For each route it reports p50 / p95 latency, peak Python allocations per
+request (tracemalloc, measured on separate requests so it doesn't skew the
+timings), database round trips per request (db_trace.py) next to the
+route's declared @db_budget, and the database payload per request (KB read
+and written, measured on the allocation samples).
+
+    python benchmarks/endpoints.py                       # small + medium
+    python benchmarks/endpoints.py --scales small,medium,large --requests 100
+    python benchmarks/endpoints.py --save benchmarks/baseline.json
+    python benchmarks/endpoints.py --compare benchmarks/baseline.json
+    python benchmarks/endpoints.py --check-budgets
+    python benchmarks/endpoints.py --layout legacy           # passengers inside flight nodes
+
+Fixtures come from generate_json.py (fixed seed) and are cached in the temp
+directory; they are migrated to the split manifest layout (manifests.py)
+unless --layout legacy is given. Emails are not sent: the Resend client is replaced by a no-op.
+`--compare` flags routes whose p50 grew by more than --threshold (default
+25%) or that make more database round trips than the baseline.
+"""
+
+import argparse
+import json
+import logging
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+SCALES = {
+    # name: (airports, flights, passengers per flight)
+    "small": (25, 100, (10, 15)),
+    "medium": (25, 2000, (40, 80)),
+    "large": (25, 10000, (30, 60)),
+}
+
+FIXTURE_DIR = os.path.join(tempfile.gettempdir(), "udaansathi-bench")
+
+
+def fixture_path(scale: str) -> str:
+    """Generate (once) and return the fixture file for a scale."""
+    from generate_json import generate_real_hierarchy
+
+    airports, flights, passengers = SCALES[scale]
+    os.makedirs(FIXTURE_DIR, exist_ok=True)
+    path = os.path.join(FIXTURE_DIR, f"{scale}-{airports}-{flights}-{passengers[0]}-{passengers[1]}.json")
+    if not os.path.exists(path):
+        generate_real_hierarchy(airports=airports, flights=flights, passengers=passengers,
+                                seed=2025, output=path, indent=None)
+    return path
+
+
+# Before app.py is imported: local storage, no network email, quiet logs
+os.environ["STORAGE_BACKEND"] = "local"
+os.environ.setdefault("LOCAL_DATA_PATH", fixture_path("small"))
+
+import resend  # noqa: E402
+
+resend.Emails.send = staticmethod(lambda params: {"id": "bench"})
+resend.Batch.send = staticmethod(lambda params: {"data": [{"id": "bench"} for _ in params]})
+
+import app as backend  # noqa: E402
+from db_trace import TracingStorage, capture, route_budget  # noqa: E402
+from indexes import rebuild_indexes  # noqa: E402
+from manifests import migrate_manifests  # noqa: E402
+from storage import LocalStorage, set_storage  # noqa: E402
+from tickets import TicketCache  # noqa: E402
+
+logging.disable(logging.WARNING)
+
+
+# --- fixture state ---
+
+class Fixture:
+    """Loaded database plus the ids the request cases draw from."""
+
+    def __init__(self, scale: str, layout: str = "split"):
+        started = time.monotonic()
+        local = LocalStorage.from_file(fixture_path(scale))
+        root = local.reference("/")
+        rebuild_indexes(root)
+
+        airports = root.child("airports").get() or {}
+        self.flights = []  # (source, flight_id, pnrs)
+        for src in sorted(airports):
+            if src not in backend.SUPPORTED_AIRPORTS:
+                continue
+            for f_id, f_data in sorted((airports[src].get("flights") or {}).items()):
+                self.flights.append((src, f_id, sorted((f_data.get("passengers") or {}).keys())))
+        del airports
+        self.busiest = max({s for s, _, _ in self.flights},
+                           key=lambda s: sum(1 for f in self.flights if f[0] == s))
+        self.routes = sorted({(s, self._destination(root, s, f)) for s, f, _ in self.flights[:50]})
+
+        # Refund fixtures: a slice of flights archived as cancelled, plus refund requests
+        archived = self.flights[: max(1, len(self.flights) // 10)]
+        updates = {}
+        for src, f_id, pnrs in archived:
+            flight = root.child(f"airports/{src}/flights/{f_id}").get()
+            updates[f"cancelled_flights/{f_id}"] = {**flight, "cancelled_at": "2025-12-29T00:00:00"}
+            for pnr in pnrs[:5]:
+                updates[f"refund_requests/{src}/{f_id}/{pnr}"] = {
+                    "name": "Bench", "pnr": pnr, "upi_id": "bench@upi", "amount": 5500,
+                    "status": "pending", "timestamp": 0,
+                }
+        root.update(updates)
+        self.archived = archived
+        if layout == "split":
+            migrate_manifests(root, log=lambda *_: None)
+
+        set_storage(TracingStorage(local))
+        backend.flight_cache.clear()
+        backend._seen_versions.clear()
+        backend.ticket_cache = TicketCache()
+        self.load_seconds = time.monotonic() - started
+
+        # Cases that consume flights (cancel / delete) take them from the tail
+        self._spare = list(self.flights[len(archived):])
+
+    @staticmethod
+    def _destination(root, src, f_id):
+        return root.child(f"airports/{src}/flights/{f_id}/destination").get()
+
+    def take_flight(self):
+        return self._spare.pop() if self._spare else None
+
+    def flight(self, i):
+        return self.flights[i % len(self.flights)]
+
+    def passenger(self, i):
+        src, f_id, pnrs = self.flight(i)
+        while not pnrs:
+            i += 1
+            src, f_id, pnrs = self.flight(i)
+        return src, f_id, pnrs[i % len(pnrs)]
+
+
+# --- cases ---
+
+def build_cases(fx: Fixture, heavy_requests: int):
+    """
+    (name, request_factory, max_timed_requests) per route. Factories return
+    (method, url, json_body), or None once a consumable pool (flights to
+    cancel, refunds to finalize) runs dry.
+    """
+    busy_flights = [f for f in fx.flights if f[0] == fx.busiest]
+    finalize_pax = [(src, f_id, pnr) for src, f_id, pnrs in fx.archived for pnr in pnrs[:5]]
+    archived_pax = [(f_id, pnr) for _, f_id, pnrs in fx.archived for pnr in pnrs[5:]]
+
+    def pop(items):
+        return items.pop() if items else None
+
+    def cancel(i):
+        flight = fx.take_flight()
+        return ("POST", "/cancel-flight", {"flight_id": flight[1], "source": flight[0], "reason": "Benchmark"}) if flight else None
+
+    def delay(i):
+        src, f_id, _ = fx.flight(i)
+        return "POST", "/delay-flight", {"flight_id": f_id, "source": src, "new_time": "23:59", "delay": "2h"}
+
+    def delete_flight(i):
+        flight = fx.take_flight()
+        return ("DELETE", f"/flights/{flight[0]}/{flight[1]}", None) if flight else None
+
+    def refund_delete(i):
+        item = pop(archived_pax)
+        return ("DELETE", f"/api/refunds/{item[0]}/{item[1]}", None) if item else None
+
+    def refund_finalize(i):
+        item = pop(finalize_pax)
+        return ("DELETE", f"/api/refunds/{item[0]}/{item[1]}/{item[2]}", None) if item else None
+
+    # Whole airports cancelled in one request each, busiest first
+    departures = {}
+    for src, _, _ in fx.flights:
+        departures[src] = departures.get(src, 0) + 1
+    disrupted_airports = sorted(departures, key=lambda s: (departures[s], s))
+
+    def bulk_cancel(i):
+        src = pop(disrupted_airports)
+        return ("POST", "/bulk-disruption", {"source": src, "action": "cancel", "reason": "Benchmark"}) if src else None
+
+    def add_flight(i):
+        return "POST", "/add-flight", {
+            "flight_no": f"BN{i:05d}", "source": fx.busiest, "destination": "DEL", "dest_city": "Delhi",
+            "airline": "Benchmark Air", "dep_time": "10:00", "arrival_time": "12:00",
+        }
+
+    cases = [
+        ("GET /", lambda i: ("GET", "/", None), None),
+        ("GET /flights (full)", lambda i: ("GET", f"/flights?airport={fx.busiest}", None), None),
+        ("GET /flights (summary)", lambda i: ("GET", f"/flights?airport={fx.busiest}&view=summary", None), None),
+        ("GET /flights/search", lambda i: ("GET", "/flights/search?source={}&destination={}".format(*fx.routes[i % len(fx.routes)]), None), None),
+        ("GET /flights/connections", lambda i: ("GET", "/flights/connections?source={}&destination={}".format(*fx.routes[i % len(fx.routes)]), None), None),
+        ("GET /bookings/<pnr>", lambda i: ("GET", f"/bookings/{fx.passenger(i)[2]}", None), None),
+        ("GET /bookings/<pnr>/ticket", lambda i: ("GET", f"/bookings/{fx.passenger(i)[2]}/ticket", None), None),
+        ("GET tickets.zip", lambda i: ("GET", "/flights/{}/{}/tickets.zip".format(*busy_flights[i % len(busy_flights)][:2]), None), heavy_requests),
+        ("GET /notifications/<pnr>", lambda i: ("GET", f"/notifications/{fx.passenger(i)[2]}", None), None),
+        ("GET flight_item", lambda i: ("GET", "/flights/{}/{}".format(*fx.flight(i)[:2]), None), None),
+        ("PATCH flight_item", lambda i: ("PATCH", "/flights/{}/{}".format(*fx.flight(i)[:2]), {"status": "Boarding"}), None),
+        ("PATCH flight_item (notify)", lambda i: ("PATCH", "/flights/{}/{}".format(*fx.flight(i)[:2]), {"status": "Delayed", "delay": "1h", "notifyPassengers": True}), None),
+        ("POST /add-flight", add_flight, None),
+        ("POST /delay-flight", delay, None),
+        ("POST /bulk-disruption (delay hub)", lambda i: ("POST", "/bulk-disruption", {"source": fx.busiest, "action": "delay", "delay_minutes": 5}), heavy_requests),
+        ("GET /api/refunds", lambda i: ("GET", "/api/refunds", None), heavy_requests),
+        ("GET /api/refunds?limit=20", lambda i: ("GET", "/api/refunds?limit=20", None), None),
+        ("GET /api/refunds/<airport>", lambda i: ("GET", f"/api/refunds/{fx.archived[i % len(fx.archived)][0]}", None), None),
+        ("GET /api/refunds/<airport>/<flight>", lambda i: ("GET", "/api/refunds/{}/{}".format(*fx.archived[i % len(fx.archived)][:2]), None), None),
+        ("POST /api/refunds/submit", lambda i: ("POST", "/api/refunds/submit", {"airport_code": fx.busiest, "flight_id": "BENCH", "passenger_id": f"P{i}", "amount": 100}), None),
+        ("DELETE /api/refunds/<flight>/<pax>", refund_delete, None),
+        ("DELETE /api/refunds/<airport>/<flight>/<pax>", refund_finalize, None),
+        ("POST /cancel-flight", cancel, None),
+        ("DELETE flight_item", delete_flight, None),
+        # Consumes whole airports, so it runs after every other case that reads flights
+        ("POST /bulk-disruption (cancel airport)", bulk_cancel, heavy_requests),
+        ("GET /cache/stats", lambda i: ("GET", "/cache/stats", None), None),
+    ]
+    return cases
+
+
+def run_case(client, factory, requests: int, alloc_samples: int) -> dict:
+    latencies, allocs, payloads, trips, statuses = [], [], [], [], {}
+    budget = None
+    total = requests + alloc_samples
+    for i in range(total + 1):
+        req = factory(i)
+        if req is None:
+            break
+        method, url, body = req
+        if i == 0:
+            budget = route_budget(backend.app, method, url)
+        measure_alloc = i > requests
+        if measure_alloc:
+            tracemalloc.start()
+        with capture(measure_bytes=measure_alloc) as trace:
+            start = time.perf_counter()
+            res = client.open(url, method=method, json=body)
+            res.get_data()  # drain streamed bodies
+            elapsed = time.perf_counter() - start
+        if measure_alloc:
+            allocs.append(tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+            payloads.append(trace.bytes)
+        res.close()
+        if i == 0:
+            continue  # warm-up (cold caches, first-call imports)
+        statuses[res.status_code] = statuses.get(res.status_code, 0) + 1
+        if not measure_alloc:
+            latencies.append(elapsed)
+            trips.append(trace.calls)
+
+    if not latencies:
+        return {"requests": 0}
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "p50_ms": round(statistics.median(latencies) * 1000, 3),
+        "p95_ms": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000, 3),
+        "peak_alloc_kb": round(max(allocs) / 1024, 1) if allocs else None,
+        "db_kb": round(statistics.mean(payloads) / 1024, 1) if payloads else None,
+        "db_round_trips": round(statistics.mean(trips), 2),
+        "db_round_trips_max": max(trips),
+        "db_budget": budget,
+        "statuses": {str(k): v for k, v in sorted(statuses.items())},
+    }
+
+
+def run_scale(scale: str, requests: int, alloc_samples: int, layout: str = "split") -> dict:
+    fx = Fixture(scale, layout)
+    passengers = sum(len(p) for _, _, p in fx.flights)
+    print(f"\n== {scale}: {len(fx.flights)} flights, {passengers} passengers, {layout} layout "
+          f"(loaded in {fx.load_seconds:.1f}s, busiest airport {fx.busiest})")
+    print(f"{'route':46} {'n':>4} {'p50 ms':>9} {'p95 ms':>9} {'alloc KB':>10} {'db/req':>7} {'budget':>7} {'db KB':>8}  status")
+
+    client = backend.app.test_client()
+    # Whole-archive / whole-manifest routes get fewer timed requests
+    heavy = max(3, requests // 10) if scale == "large" else max(3, requests // 2)
+    results = {}
+    for name, factory, limit in build_cases(fx, heavy):
+        n = requests if limit is None else min(requests, limit)
+        r = run_case(client, factory, n, alloc_samples)
+        results[name] = r
+        if r["requests"]:
+            alloc = "-" if r["peak_alloc_kb"] is None else f"{r['peak_alloc_kb']:.1f}"
+            payload = "-" if r["db_kb"] is None else f"{r['db_kb']:.1f}"
+            budget = "-" if r["db_budget"] is None else str(r["db_budget"])
+            if r["db_budget"] is not None and r["db_round_trips_max"] > r["db_budget"]:
+                budget += " ⚠️"
+            print(f"{name:46} {r['requests']:>4} {r['p50_ms']:>9.3f} {r['p95_ms']:>9.3f} {alloc:>10} "
+                  f"{r['db_round_trips']:>7.2f} {budget:>7} {payload:>8}  {r['statuses']}")
+        else:
+            print(f"{name:46}    0  (no data for this case)")
+    return results
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except Exception:
+        return "unknown"
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> int:
+    """Print regressions against a saved baseline; returns how many were found."""
+    regressions = 0
+    print(f"\n== compared with {baseline.get('commit', '?')} (p50 threshold +{threshold:.0%})")
+    for scale, routes in results.items():
+        for name, r in routes.items():
+            old = baseline.get("results", {}).get(scale, {}).get(name)
+            if not old or not old.get("requests") or not r.get("requests"):
+                continue
+            notes = []
+            if r["p50_ms"] > old["p50_ms"] * (1 + threshold):
+                notes.append(f"p50 {old['p50_ms']:.3f} -> {r['p50_ms']:.3f} ms")
+            if r["db_round_trips"] > old["db_round_trips"]:
+                notes.append(f"db/req {old['db_round_trips']} -> {r['db_round_trips']}")
+            if notes:
+                regressions += 1
+                print(f"  ⚠️ {scale} {name}: {', '.join(notes)}")
+    if not regressions:
+        print("  ✅ no regressions")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scales", default="small,medium", help=f"comma-separated: {', '.join(SCALES)}")
+    parser.add_argument("--requests", type=int, default=50, help="timed requests per route")
+    parser.add_argument("--alloc-samples", type=int, default=3, help="extra requests per route measured with tracemalloc")
+    parser.add_argument("--save", help="write results as a JSON baseline")
+    parser.add_argument("--compare", help="baseline JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed relative p50 growth for --compare")
+    parser.add_argument("--check-budgets", action="store_true", help="exit non-zero if any route exceeds its @db_budget")
+    parser.add_argument("--layout", choices=("split", "legacy"), default="split",
+                        help="passengers under manifests/ (split) or inside flight nodes (legacy)")
+    args = parser.parse_args()
+
+    scales = [s.strip() for s in args.scales.split(",") if s.strip()]
+    unknown = [s for s in scales if s not in SCALES]
+    if unknown:
+        parser.error(f"unknown scale(s): {', '.join(unknown)}")
+
+    results = {scale: run_scale(scale, args.requests, args.alloc_samples, args.layout) for scale in scales}
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({"commit": git_commit(), "python": sys.version.split()[0], "requests": args.requests,
+                       "results": results}, f, indent=2)
+        print(f"\n💾 Baseline written to {args.save}")
+
+    failed = False
+    if args.check_budgets:
+        over = [(scale, name, r) for scale, routes in results.items() for name, r in routes.items()
+                if r.get("db_budget") is not None and r["db_round_trips_max"] > r["db_budget"]]
+        for scale, name, r in over:
+            print(f"  ⚠️ {scale} {name}: up to {r['db_round_trips_max']} round trips, budget {r['db_budget']}")
+        failed = bool(over)
+
+    if args.compare:
+        with open(args.compare, "r") as f:
+            baseline = json.load(f)
+        failed = compare(results, baseline, args.threshold) > 0 or failed
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
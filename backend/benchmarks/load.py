@@ -0,0 +1,354 @@
+"""
+Load test: requests per second for the I/O-bound routes, per worker mode.
+
+    python benchmarks/load.py                                # sync vs gevent
+    python benchmarks/load.py --modes sync,gthread,gevent --clients 128 --duration 20
+    python benchmarks/load.py --latency-ms 80 --routes bookings,delay
+
+The app runs under gunicorn (gunicorn.conf.py) for each --modes entry,
+talking to a local stub backend instead of the real services:
+
+    - a Realtime Database stand-in speaking the REST protocol the Firebase
+      Admin SDK uses against the emulator (FIREBASE_DATABASE_EMULATOR_HOST),
+      backed by a LocalStorage tree built from generate_json.py
+    - a Resend stand-in (RESEND_API_URL) accepting /emails and /emails/batch
+
+Every stub response waits --latency-ms, like a round trip to the real
+service, and FLIGHT_CACHE_TTL=0 makes every app request reach it. --clients
+keep-alive client threads then hit each route for --duration seconds. The
+report lists throughput, p50 / p95 latency and errors per route and mode.
+
+Needs gunicorn (and gevent for the gevent mode) from requirements.txt.
+"""
+
+import argparse
+import http.client
+import json
+import os
+import random
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from indexes import rebuild_indexes  # noqa: E402
+from manifests import migrate_manifests  # noqa: E402
+from storage import LocalStorage, generate_push_key  # noqa: E402
+
+FIXTURE = (25, 500, (20, 40))  # airports, flights, passengers per flight
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def load_fixture() -> LocalStorage:
+    from generate_json import generate_real_hierarchy
+
+    airports, flights, passengers = FIXTURE
+    path = os.path.join(tempfile.gettempdir(), "udaansathi-bench",
+                        f"load-{airports}-{flights}-{passengers[0]}-{passengers[1]}.json")
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        generate_real_hierarchy(airports=airports, flights=flights, passengers=passengers,
+                                seed=2025, output=path, indent=None)
+    local = LocalStorage.from_file(path)
+    root = local.reference("/")
+    rebuild_indexes(root)
+    migrate_manifests(root, log=lambda *_: None)
+    return local
+
+
+# --- stub backend ---
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Realtime Database REST (emulator flavour) plus the two Resend send calls."""
+
+    protocol_version = "HTTP/1.1"  # keep-alive, so client-side pooling shows
+    storage = None
+    latency = 0.0
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, status: int, body=None, headers: dict = None):
+        data = b"" if status == 204 else json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"null") if length else None
+
+    def _handle(self):
+        time.sleep(self.latency)
+        url = urllib.parse.urlparse(self.path)
+        params = {k: v[-1] for k, v in urllib.parse.parse_qs(url.query).items()}
+        if url.path.startswith("/emails"):
+            body = self._body()
+            if url.path.rstrip("/").endswith("/batch"):
+                return self._reply(200, {"data": [{"id": generate_push_key()} for _ in body or []]})
+            return self._reply(200, {"id": generate_push_key()})
+
+        path = url.path[:-len(".json")] if url.path.endswith(".json") else url.path
+        ref = self.storage.reference(path or "/")
+        silent = params.get("print") == "silent"
+        if self.command == "GET":
+            if "orderBy" in params:
+                query = ref.order_by_key()
+                if "startAt" in params:
+                    query.start_at(json.loads(params["startAt"]))
+                if "endAt" in params:
+                    query.end_at(json.loads(params["endAt"]))
+                if "limitToFirst" in params:
+                    query.limit_to_first(int(params["limitToFirst"]))
+                if "limitToLast" in params:
+                    query.limit_to_last(int(params["limitToLast"]))
+                value = query.get()
+            else:
+                value = ref.get(shallow=params.get("shallow") == "true")
+            return self._reply(200, value, {"ETag": "stub"})
+        body = self._body()
+        if self.command == "PUT":
+            ref.set(body)
+        elif self.command == "PATCH":
+            ref.update(body)
+        elif self.command == "DELETE":
+            ref.delete()
+        elif self.command == "POST":
+            return self._reply(200, {"name": ref.push(body).key})
+        return self._reply(204 if silent else 200, None if silent else body)
+
+    do_GET = do_PUT = do_PATCH = do_DELETE = do_POST = _handle
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+
+def start_stub(storage: LocalStorage, latency_ms: float):
+    handler = type("Handler", (StubHandler,), {"storage": storage, "latency": latency_ms / 1000})
+    server = StubServer(("127.0.0.1", _free_port()), handler)
+    threading.Thread(target=server.serve_forever, name="stub-backend", daemon=True).start()
+    return server
+
+
+# --- app under gunicorn ---
+
+def start_app(mode: str, stub_port: int, workers: int, env_extra: dict):
+    port = _free_port()
+    env = dict(os.environ, **env_extra)
+    env.update({
+        "WORKER_CLASS": mode,
+        "WEB_CONCURRENCY": str(workers),
+        "PORT": str(port),
+        "STORAGE_BACKEND": "firebase",
+        "FIREBASE_DATABASE_URL": "https://udaansathi-load.firebaseio.com",
+        "FIREBASE_DATABASE_EMULATOR_HOST": f"127.0.0.1:{stub_port}",
+        "RESEND_API_URL": f"http://127.0.0.1:{stub_port}",
+        "RESEND_API_KEY": "re_load_test",
+        "FLIGHT_CACHE_TTL": "0",
+    })
+    for name in ("FIREBASE_CREDENTIALS_JSON", "FIREBASE_CRED_PATH", "SNAPSHOT_PATH", "DB_TRACE"):
+        env.pop(name, None)
+    # A file, not a pipe: nobody drains the log while the load runs
+    log = tempfile.TemporaryFile(mode="w+")
+    proc = subprocess.Popen([sys.executable, "-m", "gunicorn", "app:app"], cwd=BACKEND_DIR, env=env,
+                            stdout=subprocess.DEVNULL, stderr=log)
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            log.seek(0)
+            raise SystemExit(f"❌ gunicorn ({mode}) exited:\n{log.read()[-2000:]}")
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+            conn.request("GET", "/")
+            if conn.getresponse().status == 200:
+                conn.close()
+                return proc, port
+        except OSError:
+            pass
+        time.sleep(0.1)
+    proc.kill()
+    raise SystemExit(f"❌ gunicorn ({mode}) did not answer within 60s")
+
+
+def stop_app(proc):
+    proc.send_signal(signal.SIGTERM)
+    try:
+        proc.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+
+
+# --- load ---
+
+def build_routes(storage: LocalStorage) -> dict:
+    """name -> request factory (i -> (method, url, body)) drawn from the fixture."""
+    root = storage.reference("/")
+    flights, pnrs = [], []
+    for src, node in sorted((root.child("airports").get() or {}).items()):
+        for f_id, f_data in sorted((node.get("flights") or {}).items()):
+            flights.append((src, f_id, f_data.get("destination")))
+    for pnr in sorted(root.child("pnr_index").get(shallow=True) or {}):
+        pnrs.append(pnr)
+    rng = random.Random(7)
+    rng.shuffle(flights)
+    rng.shuffle(pnrs)
+
+    def flight(i):
+        return flights[i % len(flights)]
+
+    # A dashboard refresh: every client asks for the same airport and flight
+    hub = max({f[0] for f in flights}, key=lambda s: sum(1 for f in flights if f[0] == s))
+    hub_flight = next(f for f in flights if f[0] == hub)
+
+    return {
+        "flight": lambda i: ("GET", "/flights/{}/{}".format(*flight(i)[:2]), None),
+        "search": lambda i: ("GET", "/flights/search?source={}&destination={}".format(flight(i)[0], flight(i)[2]), None),
+        "bookings": lambda i: ("GET", f"/bookings/{pnrs[i % len(pnrs)]}", None),
+        "notifications": lambda i: ("GET", f"/notifications/{pnrs[i % len(pnrs)]}", None),
+        "dashboard": lambda i: (("GET", f"/flights?airport={hub}&view=summary", None) if i % 2
+                                else ("GET", f"/flights/{hub}/{hub_flight[1]}", None)),
+        "delay": lambda i: ("POST", "/delay-flight", {"flight_id": flight(i)[1], "source": flight(i)[0],
+                                                        "new_time": "23:59", "delay": "1h"}),
+    }
+
+
+def run_load(port: int, factory, clients: int, duration: float) -> dict:
+    latencies, errors = [], [0]
+    lock = threading.Lock()
+    counter = iter(range(10 ** 9))
+    deadline = time.monotonic() + duration
+
+    def client():
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+        mine, failed = [], 0
+        while time.monotonic() < deadline:
+            method, url, body = factory(next(counter))
+            payload = json.dumps(body) if body is not None else None
+            headers = {"Content-Type": "application/json"} if body is not None else {}
+            started = time.perf_counter()
+            try:
+                conn.request(method, url, body=payload, headers=headers)
+                res = conn.getresponse()
+                res.read()
+                if res.status >= 500:
+                    failed += 1
+                else:
+                    mine.append(time.perf_counter() - started)
+            except (OSError, http.client.HTTPException):
+                failed += 1
+                conn.close()
+                conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+        conn.close()
+        with lock:
+            latencies.extend(mine)
+            errors[0] += failed
+
+    started = time.monotonic()
+    threads = [threading.Thread(target=client, daemon=True) for _ in range(clients)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.monotonic() - started
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies) * 1000, 1) if latencies else None,
+        "p95_ms": round(latencies[int(len(latencies) * 0.95)] * 1000, 1) if latencies else None,
+        "errors": errors[0],
+    }
+
+
+def coalescing(port: int) -> str:
+    """Identical concurrent reads collapsed by the worker that answers (single_flight.py)."""
+    try:
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+        conn.request("GET", "/cache/stats")
+        stats = json.loads(conn.getresponse().read())["data"]["flights"]["coalescing"]
+        conn.close()
+    except (OSError, ValueError, KeyError):
+        return "-"
+    return f"{stats['collapsed']} of {stats['reads'] + stats['collapsed']} reads collapsed in one worker"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modes", default="sync,gevent", help="comma-separated WORKER_CLASS values")
+    parser.add_argument("--workers", type=int, default=2, help="WEB_CONCURRENCY")
+    parser.add_argument("--clients", type=int, default=64, help="concurrent keep-alive clients")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per route")
+    parser.add_argument("--latency-ms", type=float, default=30.0, help="stub round-trip time")
+    parser.add_argument("--routes", default="flight,search,bookings,notifications,dashboard,delay")
+    parser.add_argument("--pool-size", type=int, help="HTTP_POOL_SIZE for the app (default: gunicorn.conf.py's)")
+    parser.add_argument("--save", help="write results as JSON")
+    args = parser.parse_args()
+
+    modes = [m.strip() for m in args.modes.split(",") if m.strip()]
+    print(f"Loading fixture {FIXTURE} ...")
+    storage = load_fixture()
+    routes = build_routes(storage)
+    unknown = [r for r in args.routes.split(",") if r not in routes]
+    if unknown:
+        parser.error(f"unknown route(s): {', '.join(unknown)} (choose from {', '.join(routes)})")
+    stub = start_stub(storage, args.latency_ms)
+    env_extra = {"HTTP_POOL_SIZE": str(args.pool_size)} if args.pool_size else {}
+
+    results = {}
+    print(f"{args.clients} clients, {args.duration:.0f}s per route, stub latency {args.latency_ms:.0f} ms, "
+          f"{args.workers} workers\n")
+    print(f"{'mode':10} {'route':15} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'errors':>7}")
+    try:
+        for mode in modes:
+            proc, port = start_app(mode, stub.server_address[1], args.workers, env_extra)
+            results[mode] = {}
+            try:
+                for name in args.routes.split(","):
+                    r = run_load(port, routes[name], args.clients, args.duration)
+                    results[mode][name] = r
+                    p50 = "-" if r["p50_ms"] is None else f"{r['p50_ms']:.1f}"
+                    p95 = "-" if r["p95_ms"] is None else f"{r['p95_ms']:.1f}"
+                    print(f"{mode:10} {name:15} {r['rps']:>9.1f} {p50:>9} {p95:>9} {r['errors']:>7}")
+                print(f"{'':10} {'(coalescing)':15} {coalescing(port)}")
+            finally:
+                stop_app(proc)
+    finally:
+        stub.shutdown()
+
+    if len(modes) > 1:
+        base = modes[0]
+        print()
+        for mode in modes[1:]:
+            for name, r in results[mode].items():
+                before = results[base][name]["rps"]
+                if before:
+                    print(f"{name:15} {mode} vs {base}: {r['rps'] / before:.1f}x req/s")
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({"args": vars(args), "results": results}, f, indent=2)
+        print(f"\n💾 Results written to {args.save}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Cold-start benchmark: what a fresh worker costs before it can answer.
+
+    python benchmarks/startup.py                          # local storage backend
+    python benchmarks/startup.py --storage firebase --snapshot flight_snapshot.bin
+    python benchmarks/startup.py --url "/flights/search?source=DEL&destination=BOM" --runs 10
+
+1. Import profile: runs `python -X importtime -c "import app"` and lists the
+   modules app.py imports directly, slowest (cumulative) first.
+2. Time to first successful response: starts the app on a free port in a new
+   interpreter and polls --url until it answers 200, measured from process
+   spawn, over --runs fresh processes. The X-Data-Source header shows
+   whether the answer came from the local snapshot.
+
+The environment is passed through, so Firebase runs need the usual
+FIREBASE_* variables. Workers also report the same number live as
+process_first_success_seconds on /metrics.
+"""
+
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SERVER = "import app; app.app.run(host='127.0.0.1', port={port}, use_reloader=False, threaded=True)"
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def import_profile(env: dict, top: int) -> float:
+    """Print app.py's direct imports by cumulative import time; return the total in ms."""
+    # The warm-up thread's imports would interleave with (and skew) the import tree
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import app"],
+                            cwd=BACKEND_DIR, env=dict(env, FIREBASE_WARMUP="0"), capture_output=True, text=True)
+    rows = []
+    total = 0.0
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line or "self [us]" in line:
+            continue
+        _, self_us, cumulative_us, name = (part for part in line.replace("import time:", "|", 1).split("|"))
+        depth = (len(name) - len(name.lstrip())) // 2
+        name = name.strip()
+        if name == "app":
+            total = int(cumulative_us) / 1000
+        elif depth == 1:
+            rows.append((int(cumulative_us) / 1000, int(self_us) / 1000, name))
+
+    if result.returncode != 0:
+        print(result.stderr[-2000:])
+        raise SystemExit("❌ import app failed")
+    print(f"import app: {total:.1f} ms")
+    print(f"  {'module':40} {'cumulative ms':>14} {'self ms':>9}")
+    for cumulative, own, name in sorted(rows, reverse=True)[:top]:
+        print(f"  {name:40} {cumulative:>14.1f} {own:>9.1f}")
+    return total
+
+
+def first_success(env: dict, url: str, timeout: float) -> tuple:
+    """Spawn the app and return (seconds until the first 200 for `url`, X-Data-Source)."""
+    port = _free_port()
+    started = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, "-c", SERVER.format(port=port)], cwd=BACKEND_DIR, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while time.perf_counter() - started < timeout:
+            if proc.poll() is not None:
+                raise SystemExit(f"❌ App exited with code {proc.returncode} before answering")
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}{url}", timeout=timeout) as res:
+                    res.read()
+                    if res.status == 200:
+                        return time.perf_counter() - started, res.headers.get("X-Data-Source", "live")
+            except (urllib.error.URLError, ConnectionError):
+                pass
+            time.sleep(0.005)
+        raise SystemExit(f"❌ No successful response within {timeout}s")
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--storage", choices=("local", "firebase"), default=os.environ.get("STORAGE_BACKEND", "local"))
+    parser.add_argument("--snapshot", help="SNAPSHOT_PATH for the app (see snapshot.py)")
+    parser.add_argument("--url", default="/flights?airport=DEL&view=summary")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=12, help="imports to list")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    args = parser.parse_args()
+
+    env = dict(os.environ, STORAGE_BACKEND=args.storage)
+    if args.snapshot:
+        env["SNAPSHOT_PATH"] = os.path.abspath(args.snapshot)
+
+    import_profile(env, args.top)
+
+    timings, sources = [], {}
+    for _ in range(args.runs):
+        seconds, source = first_success(env, args.url, args.timeout)
+        timings.append(seconds)
+        sources[source] = sources.get(source, 0) + 1
+    print(f"\nfirst 200 for {args.url} ({args.storage}, {args.runs} cold starts):")
+    print(f"  median {statistics.median(timings) * 1000:.0f} ms | min {min(timings) * 1000:.0f} ms | "
+          f"max {max(timings) * 1000:.0f} ms | served from {sources}")
+
+
+if __name__ == "__main__":
+    main()
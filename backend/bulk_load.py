@@ -0,0 +1,323 @@
+"""
+Streaming, chunked, resumable bulk loads into the database.
+
+    with open("udaansathi_real_hierarchy.json") as f:
+        writes = hierarchy_writes(JsonScanner(f), LoadStats())
+        BulkLoader(root, "udaansathi_real_hierarchy.json").run(writes)
+
+`iter_json_items` parses the input incrementally: it only walks the object
+levels it is told to descend into and decodes everything below them (one
+flight, one airport field) with the C decoder, so memory is bounded by the
+largest single flight rather than the file.
+
+`hierarchy_writes` / `initial_writes` turn the parsed items into
+(path, value) writes in the split layout (flight node plus
+manifests/<SRC>/<ID>, see manifests.py), including the pnr_index /
+route_index entries of every flight, so the indexes are built in the same
+pass as the data.
+
+`BulkLoader` groups the writes into size-bounded multi-path updates
+(`storage.chunk_updates`), uploads them from a thread pool with a bounded
+number of chunks in flight, retries failed chunks with backoff and records
+finished chunk numbers in a checkpoint file. Chunking is deterministic for a
+given input and limits, so a re-run with the same file skips every chunk that
+already landed.
+
+Settings (env): SEED_WORKERS (8), SEED_MAX_ATTEMPTS (3), SEED_REPORT_EVERY
+seconds (5); chunk limits come from WRITE_BATCH_MAX_PATHS / WRITE_BATCH_MAX_BYTES.
+"""
+
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from indexes import flight_index_updates
+from manifests import flight_writes
+from storage import chunk_updates
+
+_WS = re.compile(r"[ \t\n\r]*")
+_NUMBER_TAIL = re.compile(r"[0-9eE+\-.]*")
+
+READ_SIZE = 1024 * 1024
+
+
+class JsonScanner:
+    """Pull tokens and whole values out of a text stream without loading it all."""
+
+    def __init__(self, f, read_size: int = READ_SIZE):
+        self._f = f
+        self._read_size = read_size
+        self._buf = ""
+        self._pos = 0
+        self._eof = False
+        self._decoder = json.JSONDecoder()
+        self.chars_read = 0
+
+    def _fill(self) -> bool:
+        if self._eof:
+            return False
+        chunk = self._f.read(self._read_size)
+        if not chunk:
+            self._eof = True
+            return False
+        self.chars_read += len(chunk)
+        self._buf = self._buf[self._pos:] + chunk
+        self._pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Skip whitespace and return the next character ('' at end of input)."""
+        while True:
+            self._pos = _WS.match(self._buf, self._pos).end()
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, char: str):
+        found = self.peek()
+        if found != char:
+            raise ValueError(f"Expected '{char}' but found {found!r} near character {self.chars_read - len(self._buf) + self._pos}")
+        self._pos += 1
+
+    def value(self):
+        """Decode one complete JSON value, reading more input until it fits in the buffer."""
+        self.peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buf, self._pos)
+            except json.JSONDecodeError:
+                if self._fill():
+                    continue
+                raise
+            # A number cut off by the end of the buffer (e.g. "-1.5" of "-1.5e3")
+            # may continue in the next read
+            if _NUMBER_TAIL.fullmatch(self._buf, end) and self._fill():
+                continue
+            self._pos = end
+            return value
+
+
+def _descends(path: tuple, patterns) -> bool:
+    return any(len(p) == len(path) and all(a in ("*", b) for a, b in zip(p, path)) for p in patterns)
+
+
+def _walk(scanner: JsonScanner, path: tuple, patterns):
+    scanner.expect("{")
+    if scanner.peek() == "}":
+        scanner.expect("}")
+        return
+    while True:
+        key = scanner.value()
+        scanner.expect(":")
+        child = path + (key,)
+        if scanner.peek() == "{" and _descends(child, patterns):
+            yield from _walk(scanner, child, patterns)
+        else:
+            yield child, scanner.value()
+        if scanner.peek() == ",":
+            scanner.expect(",")
+            continue
+        scanner.expect("}")
+        return
+
+
+def iter_json_items(f, descend=()):
+    """
+    Yield (key_path, value) for a JSON object read from `f`. Objects whose key
+    path matches one of the `descend` patterns (tuples of keys, "*" matching
+    any key) are walked key by key; everything else is decoded whole.
+
+        iter_json_items(f, [("airports",), ("airports", "*"), ("airports", "*", "flights")])
+        -> (("airports", "DEL", "city"), "Delhi"),
+           (("airports", "DEL", "flights", "6E558"), {...}), ...
+    """
+    scanner = f if isinstance(f, JsonScanner) else JsonScanner(f)
+    yield from _walk(scanner, (), list(descend))
+
+
+class LoadStats:
+    """Counters filled in by the write generators while the input is parsed."""
+
+    def __init__(self):
+        self.flights = 0
+        self.passengers = 0
+        self.airports = set()
+
+
+def _flight_writes(source: str, flight_id: str, flight, stats: LoadStats):
+    stats.flights += 1
+    stats.airports.add(source)
+    passengers = flight.get("passengers") if isinstance(flight, dict) else None
+    stats.passengers += len(passengers) if isinstance(passengers, dict) else 0
+    if isinstance(flight, dict):
+        yield from flight_writes(source, flight_id, flight).items()
+    else:
+        yield f"airports/{source}/flights/{flight_id}", flight
+    yield from flight_index_updates(source, flight_id, None, flight).items()
+
+
+def hierarchy_writes(scanner: JsonScanner, stats: LoadStats):
+    """Writes for an airports/<SRC>/flights/<ID> export (udaansathi_real_hierarchy.json)."""
+    patterns = [("airports",), ("airports", "*"), ("airports", "*", "flights")]
+    for key_path, value in iter_json_items(scanner, patterns):
+        if key_path[0] != "airports" or len(key_path) < 2:
+            continue
+        if len(key_path) == 4 and key_path[2] == "flights":
+            yield from _flight_writes(key_path[1], key_path[3], value, stats)
+        else:
+            stats.airports.add(key_path[1])
+            yield "/".join(key_path), value
+
+
+def initial_writes(scanner: JsonScanner, stats: LoadStats):
+    """Writes for the flat initial_flight_data.json layout (flights carry their `source`)."""
+    for key_path, value in iter_json_items(scanner, [("flights",)]):
+        if key_path[0] == "flights" and len(key_path) == 2:
+            source = value.get("source", "UNKNOWN") if isinstance(value, dict) else "UNKNOWN"
+            yield from _flight_writes(source, key_path[1], value, stats)
+        elif key_path == ("airlines",):
+            yield "airlines", value
+        elif key_path == ("airports",):
+            yield "airport_info", value
+
+
+class BulkLoader:
+    """Upload a stream of (path, value) writes as parallel, checkpointed multi-path updates."""
+
+    def __init__(self, root, source_path: str, checkpoint_path: str = None, workers: int = None,
+                 max_paths: int = None, max_bytes: int = None, max_attempts: int = None,
+                 report_every: float = None, log=print):
+        self.root = root
+        self.source_path = os.path.abspath(source_path)
+        self.checkpoint_path = checkpoint_path or self.source_path + ".seed-checkpoint.json"
+        self.workers = workers or int(os.environ.get("SEED_WORKERS", 8))
+        self.max_paths = max_paths or int(os.environ.get("WRITE_BATCH_MAX_PATHS", 1000))
+        self.max_bytes = max_bytes or int(os.environ.get("WRITE_BATCH_MAX_BYTES", 4 * 1024 * 1024))
+        self.max_attempts = max_attempts or int(os.environ.get("SEED_MAX_ATTEMPTS", 3))
+        self.report_every = float(os.environ.get("SEED_REPORT_EVERY", 5)) if report_every is None else report_every
+        self.log = log
+
+        self._lock = threading.Lock()
+        self._completed = set()
+        self._error = None
+        self.chunks_sent = 0
+        self.chunks_skipped = 0
+        self.paths_sent = 0
+        self.bytes_sent = 0
+
+    # --- checkpoint ---
+
+    def _identity(self) -> dict:
+        st = os.stat(self.source_path)
+        return {"source": self.source_path, "size": st.st_size, "mtime": int(st.st_mtime),
+                "max_paths": self.max_paths, "max_bytes": self.max_bytes}
+
+    def load_checkpoint(self):
+        """Return the saved checkpoint for this input and chunking, or None."""
+        if not os.path.exists(self.checkpoint_path):
+            return None
+        with open(self.checkpoint_path, "r") as f:
+            saved = json.load(f)
+        if saved.get("identity") != self._identity():
+            self.log("⚠️ Checkpoint is for a different input or chunk size; starting over")
+            return None
+        return saved
+
+    def _save_checkpoint(self, prepared: bool = True):
+        with self._lock:
+            state = {"identity": self._identity(), "prepared": prepared, "completed": sorted(self._completed)}
+        tmp = self.checkpoint_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp, self.checkpoint_path)
+
+    # --- upload ---
+
+    def _send(self, index: int, chunk: dict, size: int):
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                self.root.update(chunk)
+                break
+            except Exception as e:
+                if attempt == self.max_attempts:
+                    raise
+                self.log(f"  ↻ chunk {index} failed ({e}); retry {attempt}/{self.max_attempts - 1}")
+                time.sleep(min(2 ** attempt, 30))
+        with self._lock:
+            self._completed.add(index)
+            self.chunks_sent += 1
+            self.paths_sent += len(chunk)
+            self.bytes_sent += size
+
+    def _report(self, started: float, progress: float = None):
+        elapsed = max(time.monotonic() - started, 1e-9)
+        with self._lock:
+            chunks, paths, sent = self.chunks_sent, self.paths_sent, self.bytes_sent
+        line = (f"  ⏫ {chunks} chunks | {paths:,} paths | {sent / 1e6:.1f} MB | "
+                f"{sent / 1e6 / elapsed:.2f} MB/s | {paths / elapsed:,.0f} paths/s")
+        if progress is not None:
+            line += f" | {progress:.0%} of input parsed"
+        self.log(line)
+
+    def run(self, writes, prepare=None, restart: bool = False, progress=None) -> dict:
+        """
+        Upload every write. `prepare(root)` runs once before the first chunk of a
+        fresh (non-resumed) load, e.g. to clear the nodes being replaced.
+        `progress()` may return the parsed fraction of the input for reports.
+        Raises the first chunk error after saving the checkpoint.
+        """
+        saved = None if restart else self.load_checkpoint()
+        if saved:
+            self._completed = set(saved.get("completed", []))
+            self.log(f"↪️ Resuming: {len(self._completed)} chunks already uploaded")
+        if prepare and not (saved and saved.get("prepared")):
+            prepare(self.root)
+        self._save_checkpoint()
+
+        started = time.monotonic()
+        last_report = last_save = started
+        in_flight = threading.BoundedSemaphore(self.workers * 2)
+
+        def task(index, chunk, size):
+            try:
+                self._send(index, chunk, size)
+            except Exception as e:
+                with self._lock:
+                    if self._error is None:
+                        self._error = e
+            finally:
+                in_flight.release()
+
+        index = -1
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            for index, (chunk, size) in enumerate(chunk_updates(writes, self.max_paths, self.max_bytes)):
+                if self._error is not None:
+                    break
+                if index in self._completed:
+                    self.chunks_skipped += 1
+                    continue
+                in_flight.acquire()
+                pool.submit(task, index, chunk, size)
+
+                now = time.monotonic()
+                if now - last_save >= 1:
+                    self._save_checkpoint()
+                    last_save = now
+                if self.report_every and now - last_report >= self.report_every:
+                    self._report(started, progress() if progress else None)
+                    last_report = now
+
+        self._save_checkpoint()
+        self._report(started, progress() if progress else None)
+        if self._error is not None:
+            self.log(f"❌ Upload stopped: {self._error}. Re-run the same command to resume.")
+            raise self._error
+
+        os.remove(self.checkpoint_path)
+        elapsed = time.monotonic() - started
+        return {"chunks": index + 1, "uploaded": self.chunks_sent, "skipped": self.chunks_skipped,
+                "paths": self.paths_sent, "bytes": self.bytes_sent, "seconds": round(elapsed, 2)}
@@ -0,0 +1,312 @@
+"""
+Connecting itineraries (up to two stops) for rebooking.
+
+/flights/search only returns direct flights. GET /flights/connections
+searches an in-memory timetable built from route_index (the passenger-free
+flight summaries indexes.py keeps in step with airports/*/flights):
+
+    /flights/connections?source=DEL&destination=JFK
+    /flights/connections?source=DEL&destination=JFK&after=2026-01-10T06:00&max_stops=1
+    /flights/connections?source=DEL&destination=JFK&after=18:30&min_connection=60&limit=5
+
+Time model:
+    - a flight departs at dep_date + dep_time and arrives at arrival_time,
+      on the next day when arrival_time is not after dep_time
+    - flights without dep_date form a daily timetable: they sit on day 0 and
+      repeat on day 1 so overnight connections work; time-only `after`
+      values search them, dated ones search dated flights
+    - a connection needs MIN_CONNECTION_MINUTES (default 45) on the ground
+      and at most MAX_LAYOVER_MINUTES (default 1440)
+
+For a destination D the graph keeps, per airport, its departures sorted by
+time together with a suffix minimum of the earliest arrival at D reachable
+on them: directly (one leg) and via one more airport (two legs). These
+tables are built on the first query for D and dropped when the timetable
+changes. A query is then one bisect per departure out of the source: each
+first leg yields its earliest-arriving itinerary with 0, 1 and 2 stops.
+Itineraries beaten by another on departure, arrival and legs are dropped,
+and the rest are ranked by arrival, then number of legs.
+
+Freshness: flight writes in this process mark their airport stale
+(`mark_stale`), and cache_versions is compared at most every
+ROUTE_GRAPH_REFRESH seconds (default 5) to pick up other instances' writes.
+Only stale airports' route_index/<SRC> are re-read.
+"""
+
+import os
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime
+
+from indexes import ROUTE_INDEX
+from read_cache import CACHE_VERSIONS
+
+DAY = 24 * 60
+
+# Leg tuple fields
+DEP, ARR, FLIGHT_ID, SRC, DST, REPEAT = range(6)
+
+
+def _minutes(value):
+    """'HH:MM' -> minutes after midnight, None if unparseable."""
+    try:
+        hh, mm = str(value).strip().split(":")[:2]
+        hh, mm = int(hh), int(mm)
+    except (TypeError, ValueError):
+        return None
+    return hh * 60 + mm if 0 <= hh < 24 and 0 <= mm < 60 else None
+
+
+def _day(value):
+    try:
+        return date.fromisoformat(str(value)).toordinal()
+    except ValueError:
+        return None
+
+
+def parse_after(value):
+    """`after` query value ('HH:MM', 'YYYY-MM-DD' or 'YYYY-MM-DDTHH:MM') -> timeline minute."""
+    if value in (None, ""):
+        return None
+    value = str(value).strip()
+    day_part, _, time_part = value.replace(" ", "T").partition("T")
+    if ":" in day_part:
+        day_part, time_part = "", day_part
+    day = _day(day_part) if day_part else 0
+    minutes = _minutes(time_part) if time_part else 0
+    if day is None or minutes is None:
+        raise ValueError(f"Invalid after {value!r}; use HH:MM, YYYY-MM-DD or YYYY-MM-DDTHH:MM")
+    return day * DAY + minutes
+
+
+def flight_legs(source: str, destination: str, flights: dict) -> list:
+    """Leg tuples for one route_index/<SRC>/<DST> node, sorted by departure."""
+    legs = []
+    for f_id, summary in (flights or {}).items():
+        if not isinstance(summary, dict):
+            continue
+        dep, arr = _minutes(summary.get("dep_time")), _minutes(summary.get("arrival_time"))
+        if dep is None or arr is None:
+            continue
+        day = _day(summary["dep_date"]) if summary.get("dep_date") else 0
+        if day is None:
+            continue
+        dep += day * DAY
+        arr += day * DAY + (DAY if arr <= dep % DAY else 0)
+        legs.append((dep, arr, f_id, source, destination, False))
+        if not summary.get("dep_date"):
+            legs.append((dep + DAY, arr + DAY, f_id, source, destination, True))
+    legs.sort()
+    return legs
+
+
+class _Table:
+    """Options sorted by departure with a suffix argmin over their arrival at the destination."""
+
+    __slots__ = ("deps", "arrivals", "options", "best")
+
+    def __init__(self, rows):
+        rows.sort(key=lambda row: row[0])
+        self.deps = [row[0] for row in rows]
+        self.arrivals = [row[1] for row in rows]
+        self.options = [row[2] for row in rows]
+        self.best = [0] * len(rows)
+        best = None
+        for i in range(len(rows) - 1, -1, -1):
+            if best is None or self.arrivals[i] <= self.arrivals[best]:
+                best = i
+            self.best[i] = best
+
+    def earliest(self, ready: int, max_wait: int, avoid: str = None):
+        """
+        Index of the option departing in [ready, ready + max_wait] that arrives
+        first, skipping options whose first leg lands at `avoid`.
+        """
+        i = bisect_left(self.deps, ready)
+        if i == len(self.deps) or self.deps[i] - ready > max_wait:
+            return None
+        j = self.best[i]
+        if self.deps[j] - ready <= max_wait and (avoid is None or self.options[j][0][DST] != avoid):
+            return j
+        # The overall earliest arrival waits too long or loops back; look inside the window only
+        hi = bisect_right(self.deps, ready + max_wait)
+        window = [k for k in range(i, hi) if avoid is None or self.options[k][0][DST] != avoid]
+        return min(window, key=self.arrivals.__getitem__) if window else None
+
+
+class RouteGraph:
+    """Timetable of every indexed flight plus the per-destination search tables."""
+
+    def __init__(self, refresh_every: float = None, min_connection: int = None, max_layover: int = None):
+        self.refresh_every = float(os.environ.get("ROUTE_GRAPH_REFRESH", 5)) if refresh_every is None else refresh_every
+        self.min_connection = int(os.environ.get("MIN_CONNECTION_MINUTES", 45)) if min_connection is None else min_connection
+        self.max_layover = int(os.environ.get("MAX_LAYOVER_MINUTES", DAY)) if max_layover is None else max_layover
+        self._lock = threading.Lock()
+        self._legs = {}       # src -> {dst: [leg, ...]}
+        self._summaries = {}  # src -> {dst: {flight_id: summary}}
+        self._tables = {}     # (dst, min_connection) -> (direct tables, one-stop tables)
+        self._versions = None
+        self._stale = set()
+        self._checked_at = 0.0
+        self.loads = 0
+        self.queries = 0
+        self.table_builds = 0
+
+    # --- freshness ---
+
+    def mark_stale(self, source: str):
+        """A flight departing from `source` was written; re-read it on the next query."""
+        with self._lock:
+            self._stale.add(source)
+
+    def _set_airports(self, routes: dict, replace: bool):
+        legs = {src: {dst: flight_legs(src, dst, flights) for dst, flights in (by_dst or {}).items()}
+                for src, by_dst in routes.items()}
+        with self._lock:
+            if replace:
+                self._legs, self._summaries = legs, dict(routes)
+            else:
+                self._legs = {**self._legs, **legs}
+                self._summaries = {**self._summaries, **routes}
+            self._tables = {}
+            self.loads += 1
+
+    def refresh(self, root, force: bool = False) -> int:
+        """Re-read what changed (everything on first use); returns the airports read."""
+        now = time.monotonic()
+        with self._lock:
+            stale = set(self._stale)
+            self._stale.clear()
+            first = self._versions is None
+            due = force or first or now - self._checked_at >= self.refresh_every
+        if due:
+            versions = root.child(CACHE_VERSIONS).get() or {}
+            with self._lock:
+                known = self._versions or {}
+                stale |= {src for src in set(versions) | set(known) if versions.get(src) != known.get(src)}
+                self._versions = versions
+                self._checked_at = now
+        if first or len(stale) > 1:
+            # One read of the whole index beats one per airport
+            routes = root.child(ROUTE_INDEX).get() or {}
+            self._set_airports(routes, replace=True)
+            return len(routes)
+        if stale:
+            source = stale.pop()
+            self._set_airports({source: root.child(ROUTE_INDEX).child(source).get() or {}}, replace=False)
+            return 1
+        return 0
+
+    # --- search ---
+
+    def _tables_for(self, destination: str, min_connection: int):
+        key = (destination, min_connection)
+        with self._lock:
+            tables = self._tables.get(key)
+            legs = self._legs
+        if tables is not None:
+            return tables
+
+        direct = {src: _Table([(leg[DEP], leg[ARR], (leg,)) for leg in by_dst[destination]])
+                  for src, by_dst in legs.items() if by_dst.get(destination)}
+        one_stop = {}
+        for src, by_dst in legs.items():
+            rows = []
+            for via, route in by_dst.items():
+                table = direct.get(via)
+                if via == destination or table is None:
+                    continue
+                for leg in route:
+                    j = table.earliest(leg[ARR] + min_connection, self.max_layover)
+                    if j is not None:
+                        rows.append((leg[DEP], table.arrivals[j], (leg,) + table.options[j]))
+            if rows:
+                one_stop[src] = _Table(rows)
+
+        tables = (direct, one_stop)
+        with self._lock:
+            if self._legs is legs:
+                self._tables[key] = tables
+                self.table_builds += 1
+        return tables
+
+    def search(self, source: str, destination: str, after: int = None, max_stops: int = 2,
+               min_connection: int = None, limit: int = 10) -> list:
+        """Ranked itineraries (tuples of legs) from `source` to `destination`."""
+        min_connection = self.min_connection if min_connection is None else min_connection
+        direct, one_stop = self._tables_for(destination, min_connection)
+        with self._lock:
+            routes = self._legs.get(source) or {}
+            self.queries += 1
+
+        options = []
+        for via, legs in routes.items():
+            start = bisect_left(legs, (after,)) if after is not None else 0
+            # Time-only `after` searches the daily timetable (days 0-1), not dated flights
+            end = bisect_left(legs, (2 * DAY,)) if after is not None and after < DAY else len(legs)
+            for leg in legs[start:end]:
+                if leg[REPEAT]:
+                    continue  # a daily flight's next-day copy only serves connections
+                if via == destination:
+                    options.append((leg[ARR], 1, leg[DEP], (leg,)))
+                    continue
+                ready = leg[ARR] + min_connection
+                if max_stops >= 1 and via in direct:
+                    j = direct[via].earliest(ready, self.max_layover)
+                    if j is not None:
+                        options.append((direct[via].arrivals[j], 2, leg[DEP], (leg,) + direct[via].options[j]))
+                if max_stops >= 2 and via in one_stop:
+                    # The middle stop must not be the origin again
+                    j = one_stop[via].earliest(ready, self.max_layover, avoid=source)
+                    if j is not None:
+                        options.append((one_stop[via].arrivals[j], 3, leg[DEP], (leg,) + one_stop[via].options[j]))
+
+        # Keep the Pareto front: nothing else departs no earlier, arrives no later with no more legs
+        options.sort(key=lambda o: (o[0], o[1], -o[2]))
+        kept = []
+        for arrival, legs, departure, itinerary in options:
+            if any(k[2] >= departure and k[1] <= legs for k in kept):
+                continue
+            kept.append((arrival, legs, departure, itinerary))
+            if len(kept) >= limit:
+                break
+        return [k[3] for k in kept]
+
+    # --- output ---
+
+    def describe(self, itinerary) -> dict:
+        """JSON-ready itinerary: legs with their flight summaries, stops, layovers and timings."""
+        first, last = itinerary[0], itinerary[-1]
+        with self._lock:
+            summaries = self._summaries
+        legs = []
+        for leg in itinerary:
+            summary = dict((summaries.get(leg[SRC]) or {}).get(leg[DST], {}).get(leg[FLIGHT_ID]) or {})
+            summary.pop("passenger_count", None)
+            legs.append({**summary, "id": leg[FLIGHT_ID], "source": leg[SRC], "destination": leg[DST],
+                         "day_offset": leg[DEP] // DAY - first[DEP] // DAY})
+        out = {
+            "stops": len(itinerary) - 1,
+            "via": [leg[DST] for leg in itinerary[:-1]],
+            "departure": legs[0].get("dep_time"),
+            "arrival": legs[-1].get("arrival_time"),
+            "arrival_day_offset": last[ARR] // DAY - first[DEP] // DAY,
+            "duration_minutes": last[ARR] - first[DEP],
+            "layover_minutes": [b[DEP] - a[ARR] for a, b in zip(itinerary, itinerary[1:])],
+            "legs": legs,
+        }
+        if first[DEP] >= DAY * 2:
+            out["arrival_date"] = datetime.fromordinal(last[ARR] // DAY).date().isoformat()
+        return out
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "airports": len(self._legs),
+                "legs": sum(len(legs) for by_dst in self._legs.values() for legs in by_dst.values()),
+                "destination_tables": len(self._tables),
+                "loads": self.loads,
+                "table_builds": self.table_builds,
+                "queries": self.queries,
+            }
@@ -0,0 +1,283 @@
+"""
+Database round-trip tracing and per-route budgets.
+
+`TracingStorage` wraps any storage backend and records every call that goes
+over the wire (get, set, update, push, delete, query get) with its path,
+payload size and wall time into the trace of the current request.
+
+    DB_TRACE=header   adds X-DB-Trace (totals) and X-DB-Trace-Ops (each call)
+    DB_TRACE=log      logs one line per request
+    DB_TRACE=header,log
+
+Without DB_TRACE nothing is wrapped. Routes declare how many round trips
+they are allowed with `@db_budget(n)` (placed under @app.route); a traced
+request over budget logs a warning and, in header mode, sets
+X-DB-Budget-Exceeded.
+
+`assert_db_budget(app, client, "GET", "/bookings/ABC123")` runs one request
+through the test client and raises DbBudgetExceeded if the route made more
+round trips than it declared, so a check script or benchmark can fail on it.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import g, request
+
+from storage import Storage, get_storage, set_storage
+
+logger = logging.getLogger(__name__)
+
+MAX_HEADER_OPS = 20
+
+_local = threading.local()
+
+
+class DbBudgetExceeded(AssertionError):
+    pass
+
+
+def db_budget(max_round_trips: int):
+    """Declare the round trips a route may make per request."""
+    def decorator(view):
+        view.db_budget = max_round_trips
+        return view
+    return decorator
+
+
+def _size(value) -> int:
+    if value is None:
+        return 0
+    try:
+        return len(json.dumps(value, default=str))
+    except (TypeError, ValueError):
+        return 0
+
+
+class RequestTrace:
+    """Round trips recorded for one request (or one `capture()` block)."""
+
+    def __init__(self, measure_bytes: bool = True):
+        self.measure_bytes = measure_bytes
+        self.ops = []  # (operation, path, payload_bytes, seconds)
+
+    def record(self, operation: str, path: str, payload, seconds: float):
+        size = _size(payload) if self.measure_bytes else 0
+        self.ops.append((operation, path, size, seconds))
+
+    @property
+    def calls(self) -> int:
+        return len(self.ops)
+
+    @property
+    def seconds(self) -> float:
+        return sum(op[3] for op in self.ops)
+
+    @property
+    def bytes(self) -> int:
+        return sum(op[2] for op in self.ops)
+
+    def summary(self) -> str:
+        return f"{self.calls} calls, {self.seconds * 1000:.2f} ms, {self.bytes} B"
+
+    def describe(self, limit: int = None) -> str:
+        ops = self.ops if limit is None else self.ops[:limit]
+        text = ", ".join(f"{op} {path} {secs * 1000:.2f}ms {size}B" for op, path, size, secs in ops)
+        if limit is not None and len(self.ops) > limit:
+            text += f", ... (+{len(self.ops) - limit} more)"
+        return text
+
+
+def current_trace():
+    return getattr(_local, "trace", None)
+
+
+@contextmanager
+def capture(measure_bytes: bool = True):
+    """Record the round trips made on this thread inside the block."""
+    previous = current_trace()
+    trace = _local.trace = RequestTrace(measure_bytes)
+    try:
+        yield trace
+    finally:
+        _local.trace = previous
+
+
+def _traced(operation: str, path: str, call, payload=None, result_is_payload=False):
+    trace = current_trace()
+    if trace is None:
+        return call()
+    start = time.perf_counter()
+    result = call()
+    trace.record(operation, path, result if result_is_payload else payload, time.perf_counter() - start)
+    return result
+
+
+class TracingQuery:
+    def __init__(self, query, path: str):
+        self._query = query
+        self._path = path
+
+    def _chain(self, name, *args):
+        return TracingQuery(getattr(self._query, name)(*args), self._path)
+
+    def start_at(self, key):
+        return self._chain("start_at", key)
+
+    def end_at(self, key):
+        return self._chain("end_at", key)
+
+    def limit_to_first(self, limit):
+        return self._chain("limit_to_first", limit)
+
+    def limit_to_last(self, limit):
+        return self._chain("limit_to_last", limit)
+
+    def get(self):
+        return _traced("query", self._path, self._query.get, result_is_payload=True)
+
+
+class TracingReference:
+    """Reference wrapper that records each network call in the current trace."""
+
+    def __init__(self, ref):
+        self._ref = ref
+
+    def __getattr__(self, name):
+        return getattr(self._ref, name)
+
+    @property
+    def path(self):
+        return self._ref.path
+
+    @property
+    def key(self):
+        return self._ref.key
+
+    @property
+    def parent(self):
+        parent = self._ref.parent
+        return TracingReference(parent) if parent is not None else None
+
+    def child(self, path):
+        return TracingReference(self._ref.child(path))
+
+    def order_by_key(self):
+        return TracingQuery(self._ref.order_by_key(), self._ref.path)
+
+    def get(self, *args, **kwargs):
+        return _traced("get", self._ref.path, lambda: self._ref.get(*args, **kwargs), result_is_payload=True)
+
+    def set(self, value):
+        return _traced("set", self._ref.path, lambda: self._ref.set(value), value)
+
+    def update(self, value):
+        return _traced("update", self._ref.path, lambda: self._ref.update(value), value)
+
+    def push(self, value=""):
+        return TracingReference(_traced("push", self._ref.path, lambda: self._ref.push(value), value))
+
+    def delete(self):
+        return _traced("delete", self._ref.path, self._ref.delete)
+
+
+class TracingStorage(Storage):
+    """Any backend, with its references wrapped in TracingReference."""
+
+    def __init__(self, inner: Storage):
+        self.inner = inner
+        self.name = inner.name
+
+    def reference(self, path: str = "/"):
+        return TracingReference(self.inner.reference(path))
+
+
+def install_tracing():
+    """Wrap the process-wide storage backend (idempotent)."""
+    storage = get_storage()
+    if not isinstance(storage, TracingStorage):
+        set_storage(TracingStorage(storage))
+
+
+class DbTracer:
+    """Per-request tracing hooks for a Flask app, configured by DB_TRACE."""
+
+    def __init__(self, app=None, mode: str = None):
+        mode = os.environ.get("DB_TRACE", "") if mode is None else mode
+        self.modes = {m.strip().lower() for m in mode.split(",") if m.strip()}
+        if app is not None:
+            self.init_app(app)
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.modes)
+
+    def init_app(self, app):
+        if not self.enabled:
+            return
+        install_tracing()
+        self.app = app
+        app.before_request(self._before)
+        app.after_request(self._after)
+        app.teardown_request(self._teardown)
+
+    def _before(self):
+        if current_trace() is None:
+            # capture() blocks (assert_db_budget) own their trace; otherwise this request does
+            g._db_trace_owned = True
+            _local.trace = RequestTrace()
+
+    def _after(self, response):
+        trace = current_trace()
+        if trace is None:
+            return response
+
+        view = self.app.view_functions.get(request.endpoint)
+        budget = getattr(view, "db_budget", None)
+        over = budget is not None and trace.calls > budget
+        if over:
+            logger.warning("DB budget exceeded on %s %s: %d round trips (budget %d): %s",
+                           request.method, request.path, trace.calls, budget, trace.describe(MAX_HEADER_OPS))
+        if "header" in self.modes:
+            response.headers["X-DB-Trace"] = trace.summary()
+            response.headers["X-DB-Trace-Ops"] = trace.describe(MAX_HEADER_OPS)
+            if over:
+                response.headers["X-DB-Budget-Exceeded"] = f"{trace.calls}/{budget}"
+        if "log" in self.modes:
+            logger.info("DB trace %s %s -> %s: %s [%s]", request.method, request.path,
+                        response.status_code, trace.summary(), trace.describe(MAX_HEADER_OPS))
+        return response
+
+    def _teardown(self, exc):
+        # Also runs when the view raised, so a request's trace never leaks into the next one
+        if g.pop("_db_trace_owned", False):
+            _local.trace = None
+
+
+def route_budget(app, method: str, path: str):
+    """The db_budget declared on the view that serves `method path`, or None."""
+    adapter = app.url_map.bind("localhost")
+    endpoint, _ = adapter.match(path.split("?")[0], method=method)
+    return getattr(app.view_functions.get(endpoint), "db_budget", None)
+
+
+def assert_db_budget(app, client, method: str, url: str, budget: int = None, **kwargs) -> RequestTrace:
+    """
+    Run one request through `client` with tracing on and raise DbBudgetExceeded
+    if it made more round trips than `budget` (default: the route's declared
+    db_budget). Returns the trace.
+    """
+    install_tracing()
+    if budget is None:
+        budget = route_budget(app, method, url)
+    with capture() as trace:
+        response = client.open(url, method=method, **kwargs)
+        response.get_data()
+        response.close()
+    if budget is not None and trace.calls > budget:
+        raise DbBudgetExceeded(f"{method} {url}: {trace.calls} round trips, budget {budget}: {trace.describe()}")
+    return trace
@@ -0,0 +1,103 @@
+"""
+Selecting the flights hit by an airport-wide disruption.
+
+POST /bulk-disruption cancels or delays many flights departing from one
+airport in a single operation:
+
+    {"source": "DEL", "action": "cancel", "reason": "Fog"}
+    {"source": "DEL", "action": "delay", "delay_minutes": 90,
+     "from": "2026-01-10T06:00", "to": "2026-01-10T11:00"}
+    {"source": "DEL", "action": "cancel", "flight_ids": ["6E558", "AI101"]}
+
+`from` / `to` bound the departure (inclusive) and take either "HH:MM" or
+"YYYY-MM-DD[T ]HH:MM". A date is only compared against flights that carry a
+dep_date; a time-only window that ends before it starts (22:00 -> 02:00)
+wraps past midnight. `flight_ids` narrows the selection further; ids that
+are not active at the airport come back in "missing".
+
+A delay either shifts every selected flight by `delay_minutes` (dep_date
+rolls over at midnight) or moves them all to `new_time`.
+
+The handler lives in app.py; this module only holds the pure helpers.
+"""
+
+import re
+from datetime import datetime, timedelta
+
+ACTIONS = ("cancel", "delay")
+
+_BOUND = re.compile(r"^(?:(\d{4}-\d{2}-\d{2})[T ])?(\d{2}:\d{2})$")
+_TIME = re.compile(r"^\d{1,2}:\d{2}$")
+
+
+def parse_bound(value):
+    """'HH:MM' -> (None, 'HH:MM'); 'YYYY-MM-DD[T ]HH:MM' -> (date, time); None stays None."""
+    if value in (None, ""):
+        return None
+    match = _BOUND.match(str(value).strip())
+    if not match:
+        raise ValueError(f"Invalid departure bound {value!r}; use HH:MM or YYYY-MM-DDTHH:MM")
+    return match.group(1), match.group(2)
+
+
+def _compare(flight: dict, bound) -> tuple:
+    """(flight side, bound side) compared by date and time when both have a date, else by time."""
+    date, hhmm = bound
+    if date and flight.get("dep_date"):
+        return (flight["dep_date"], flight["dep_time"]), (date, hhmm)
+    return flight["dep_time"], hhmm
+
+
+def departs_within(flight: dict, start=None, end=None) -> bool:
+    """Whether a flight departs inside [start, end] (parsed bounds; None is open)."""
+    if start is None and end is None:
+        return True
+    if not flight.get("dep_time"):
+        return False
+    if start and end and not start[0] and not end[0] and start[1] > end[1]:
+        # Time-only window across midnight
+        return flight["dep_time"] >= start[1] or flight["dep_time"] <= end[1]
+    if start is not None:
+        mine, theirs = _compare(flight, start)
+        if mine < theirs:
+            return False
+    if end is not None:
+        mine, theirs = _compare(flight, end)
+        if mine > theirs:
+            return False
+    return True
+
+
+def select_flights(flights: dict, flight_ids=None, start=None, end=None):
+    """
+    ({flight_id: flight}, missing_ids) for an airport's flights node: flights
+    in the window and, when `flight_ids` is given, only those.
+    """
+    flights = flights if isinstance(flights, dict) else {}
+    wanted = None if flight_ids is None else [str(f) for f in flight_ids]
+    candidates = flights if wanted is None else {f: flights[f] for f in wanted if f in flights}
+    selected = {f_id: flight for f_id, flight in candidates.items()
+                if isinstance(flight, dict) and departs_within(flight, start, end)}
+    missing = [] if wanted is None else [f for f in wanted if f not in flights]
+    return selected, missing
+
+
+def format_delay(minutes: int) -> str:
+    hours, mins = divmod(int(minutes), 60)
+    if hours and mins:
+        return f"{hours}h {mins}m"
+    return f"{hours}h" if hours else f"{mins}m"
+
+
+def delayed_departure(flight: dict, minutes: int) -> dict:
+    """dep_time (and dep_date, when the flight has one) moved `minutes` later."""
+    if not _TIME.match(str(flight.get("dep_time") or "")):
+        raise ValueError(f"dep_time {flight.get('dep_time')!r} cannot be shifted")
+    hh, mm = (int(part) for part in flight["dep_time"].split(":"))
+    date = flight.get("dep_date")
+    base = datetime.strptime(date, "%Y-%m-%d") if date else datetime(2000, 1, 1)
+    moved = base + timedelta(hours=hh, minutes=mm + int(minutes))
+    out = {"dep_time": moved.strftime("%H:%M")}
+    if date:
+        out["dep_date"] = moved.strftime("%Y-%m-%d")
+    return out
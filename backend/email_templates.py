@@ -0,0 +1,111 @@
+"""
+Compiled email templates for passenger notices.
+
+Templates live in templates/emails/<name>.html and <name>.txt and are compiled
+once at import. Rendering happens in two stages:
+
+    event = EMAIL_TEMPLATES["cancellation"].for_event(flight_id=..., source=..., ...)
+    for pnr, p in passengers.items():
+        message = event.message(p["email"], passenger_name=p["name"])
+
+`for_event` renders the flight-level body once, with a sentinel in place of
+every per-recipient field, and splits the result around those sentinels.
+`message` only joins the pre-rendered pieces with the (escaped) recipient
+values, so the per-passenger cost is one string join per body.
+"""
+
+import html
+import os
+import re
+
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "templates", "emails")
+SENDER = "Udaan Sathi <onboarding@resend.dev>"
+
+# Fields that differ per recipient within one flight event
+RECIPIENT_FIELDS = ("passenger_name",)
+
+_SENTINEL = "\x00{}\x00"
+_SENTINEL_RE = re.compile("\x00(\\w+)\x00")
+
+_env = Environment(
+    loader=FileSystemLoader(TEMPLATE_DIR),
+    autoescape=select_autoescape(enabled_extensions=("html",), default_for_string=False),
+    keep_trailing_newline=True,
+)
+
+
+class _Body:
+    """
+    A body rendered with sentinels, split into literal pieces and the recipient
+    fields between them. With a single recipient field (the usual case) filling
+    it in is one C-level `value.join(pieces)`.
+    """
+
+    __slots__ = ("pieces", "fields", "single_field")
+
+    def __init__(self, rendered: str):
+        parts = _SENTINEL_RE.split(rendered)
+        self.pieces = parts[0::2]
+        self.fields = parts[1::2]
+        distinct = set(self.fields)
+        self.single_field = distinct.pop() if len(distinct) == 1 else None
+
+    def fill(self, values: dict) -> str:
+        if self.single_field is not None or not self.fields:
+            return values.get(self.single_field, "").join(self.pieces)
+        out = [self.pieces[0]]
+        for field, piece in zip(self.fields, self.pieces[1:]):
+            out.append(values.get(field, ""))
+            out.append(piece)
+        return "".join(out)
+
+
+class EventEmail:
+    """One flight event rendered once; `message` fills in the per-recipient parts."""
+
+    def __init__(self, subject: str, html_body: _Body, text_body: _Body):
+        self.subject = subject
+        self.html_body = html_body
+        self.text_body = text_body
+
+    def render_html(self, **recipient) -> str:
+        return self.html_body.fill({k: html.escape(str(v)) for k, v in recipient.items()})
+
+    def render(self, **recipient) -> tuple:
+        """Return (html, text) for one recipient."""
+        values = {k: str(v) for k, v in recipient.items()}
+        escaped = {k: html.escape(v) for k, v in values.items()}
+        return self.html_body.fill(escaped), self.text_body.fill(values)
+
+    def message(self, to: str, **recipient) -> dict:
+        """Resend params for one recipient, with a plain-text alternative."""
+        html_body, text_body = self.render(**recipient)
+        return {"from": SENDER, "to": to, "subject": self.subject, "html": html_body, "text": text_body}
+
+
+class EmailTemplate:
+    """HTML + text template pair with a subject line, compiled once."""
+
+    def __init__(self, name: str, subject: str):
+        self.name = name
+        self.subject = _env.from_string(subject)
+        self.html = _env.get_template(f"{name}.html")
+        self.text = _env.get_template(f"{name}.txt")
+
+    def for_event(self, **context) -> EventEmail:
+        """Render the flight-level body once for every recipient of this event."""
+        placeholders = {field: _SENTINEL.format(field) for field in RECIPIENT_FIELDS}
+        values = {**context, **placeholders}
+        return EventEmail(
+            self.subject.render(**context),
+            _Body(self.html.render(**values)),
+            _Body(self.text.render(**values)),
+        )
+
+
+EMAIL_TEMPLATES = {
+    "cancellation": EmailTemplate("cancellation", "URGENT: Your flight {{ flight_id }} has been cancelled"),
+    "delay": EmailTemplate("delay", "NOTICE: Your flight {{ flight_id }} has been delayed"),
+}
@@ -1,6 +1,27 @@
-import firebase_admin
-from firebase_admin import credentials, db
+"""
+Lazy Firebase Admin initialization.
+
+Importing firebase_admin pulls in google-auth, requests and friends (~100 ms)
+and initializing it reads credentials, so neither happens at import time any
+more: `init_firebase()` does both on first use (a request, or the warm-up
+thread app.py starts) and later calls return immediately.
+
+Credentials come from FIREBASE_CREDENTIALS_JSON (service account JSON, for
+Render / production) or FIREBASE_CRED_PATH (a file, for local development);
+FIREBASE_DATABASE_URL names the database. With FIREBASE_DATABASE_EMULATOR_HOST
+set (the Realtime Database emulator, or the stub in benchmarks/load.py)
+no credentials are needed.
+
+Once initialized, the database client's connections are pooled
+(http_pool.py, HTTP_POOL_SIZE).
+"""
+
+import json
+import logging
 import os
+import threading
+import time
+
 from dotenv import load_dotenv
 
 # This tells Python to look for .env in the same folder as THIS file
@@ -8,26 +29,63 @@ BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 env_path = os.path.join(BASE_DIR, ".env")
 load_dotenv(dotenv_path=env_path)
 
-def get_database():
-    if not firebase_admin._apps:
-        url = os.getenv("FIREBASE_DATABASE_URL")
-        
-        # DEBUG PRINTS - Check your terminal for these!
-        print(f"--- DEBUG INFO ---")
-        print(f"Looking for .env at: {env_path}")
-        print(f"Loaded URL: {url}")
-        print(f"------------------")
-
-        if not url:
-            raise ValueError("FIREBASE_DATABASE_URL not found in .env")
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_state = {"initialized": False, "error": None, "seconds": None}
+
+
+def _credentials():
+    from firebase_admin import credentials
 
+    cred_json = os.environ.get("FIREBASE_CREDENTIALS_JSON")
+    if cred_json:
+        logger.info("✅ Firebase credentials from FIREBASE_CREDENTIALS_JSON env var")
+        return credentials.Certificate(json.loads(cred_json))
+    path = os.environ.get("FIREBASE_CRED_PATH")
+    if path and os.path.exists(path):
+        logger.info(f"✅ Firebase credentials from file: {path}")
+        return credentials.Certificate(path)
+    return None
+
+
+def init_firebase() -> bool:
+    """Initialize the default Firebase app once; True when it is usable."""
+    if _state["initialized"]:
+        return True
+    with _lock:
+        if _state["initialized"] or _state["error"] is not None:
+            return _state["initialized"]
+        started = time.perf_counter()
         try:
-            KEY_PATH = os.path.join(BASE_DIR, "serviceAccountKey.json")
-            cred = credentials.Certificate(KEY_PATH)
-            firebase_admin.initialize_app(cred, {"databaseURL": url})
-            print("✅ Firebase initialized successfully!")
+            import firebase_admin
+
+            if not firebase_admin._apps:
+                cred = _credentials()
+                if cred is None and not os.environ.get("FIREBASE_DATABASE_EMULATOR_HOST"):
+                    raise RuntimeError("Firebase credentials not found! Set either FIREBASE_CREDENTIALS_JSON or FIREBASE_CRED_PATH")
+                firebase_admin.initialize_app(cred, {"databaseURL": os.environ.get("FIREBASE_DATABASE_URL")})
+            _state["initialized"] = True
+            try:
+                from http_pool import pool_firebase
+
+                pool_firebase()
+            except Exception as e:
+                logger.warning(f"Firebase connection pool not applied: {e}")
         except Exception as e:
-            print(f"❌ Initialization failed: {e}")
-            raise e
+            # Credentials don't change at runtime, so don't retry on every request
+            _state["error"] = str(e)
+            logger.error(f"❌ Failed to initialize Firebase: {e}")
+        _state["seconds"] = round(time.perf_counter() - started, 4)
+        return _state["initialized"]
 
-    return db.reference("/")
\ No newline at end of file
+
+def firebase_status() -> dict:
+    return dict(_state)
+
+
+def get_database():
+    if not init_firebase():
+        raise RuntimeError(f"Firebase not initialized: {_state['error']}")
+    from firebase_admin import db
+    return db.reference("/")
@@ -1,6 +1,11 @@
+import argparse
 import json
+import math
+import os
 import random
 import string
+import time
+from datetime import date, timedelta
 
 # 1. Real-World Data (50 Major Airports)
 REAL_AIRPORTS = [
@@ -74,58 +79,202 @@ REAL_PASSENGERS = [
 # Keep backward compatibility
 REAL_NAMES = [p["name"] for p in REAL_PASSENGERS]
 
-def generate_real_hierarchy():
-    db = {"airports": {}}
-    
-    # Initialize Airport Structure
-    for ap in REAL_AIRPORTS:
-        db["airports"][ap["code"]] = {
-            "city": ap["city"],
-            "country": ap["country"],
-            "flights": {}
-        }
+PNR_CHARS = string.ascii_uppercase + string.digits
+PNR_SPACE = len(PNR_CHARS) ** 6          # 36^6 six-character PNRs
+FLIGHT_NUMBER_BASE = 100
+FLIGHT_NUMBER_SPACE = 9900               # 100-9999 per airline before spilling into 5 digits
+
+def _coprime_multiplier(rng, space):
+    """A random multiplier coprime with `space`, so i -> (i * a + b) % space is a permutation."""
+    while True:
+        a = rng.randrange(space // 3, space - 1) | 1
+        if math.gcd(a, space) == 1:
+            return a
+
+class UniqueCodes:
+    """
+    Collision-free PNRs and flight numbers. Both are a seeded permutation of a
+    counter, so they look random, never repeat and need no `seen` set.
+    """
+
+    def __init__(self, rng):
+        self._pnr_a = _coprime_multiplier(rng, PNR_SPACE)
+        self._pnr_b = rng.randrange(PNR_SPACE)
+        self._pnr_count = 0
+        self._fn_a = _coprime_multiplier(rng, FLIGHT_NUMBER_SPACE)
+        self._fn_b = rng.randrange(FLIGHT_NUMBER_SPACE)
+        self._fn_count = {}
+
+    def pnr(self) -> str:
+        if self._pnr_count >= PNR_SPACE:
+            raise ValueError("PNR space exhausted")
+        n = (self._pnr_count * self._pnr_a + self._pnr_b) % PNR_SPACE
+        self._pnr_count += 1
+        chars = []
+        for _ in range(6):
+            n, r = divmod(n, len(PNR_CHARS))
+            chars.append(PNR_CHARS[r])
+        return "".join(chars)
+
+    def flight_number(self, airline_code: str) -> str:
+        i = self._fn_count.get(airline_code, 0)
+        self._fn_count[airline_code] = i + 1
+        if i < FLIGHT_NUMBER_SPACE:
+            number = FLIGHT_NUMBER_BASE + (i * self._fn_a + self._fn_b) % FLIGHT_NUMBER_SPACE
+        else:
+            number = FLIGHT_NUMBER_BASE + i  # past 9999: 10000, 10001, ...
+        return f"{airline_code}{number}"
 
-    # Generate 100 Flights
-    for _ in range(100):
-        src_ap = random.choice(REAL_AIRPORTS)
-        dest_ap = random.choice([a for a in REAL_AIRPORTS if a != src_ap])
-        airline = random.choice(AIRLINES)
-        
-        flight_no = f"{airline['c']}{random.randint(100, 999)}"
-        
-        # Fixed the random time range (0-59)
-        flight_data = {
-            "airline": airline["n"],
-            "destination": dest_ap["code"],
-            "dest_city": dest_ap["city"],
-            "dep_time": f"{random.randint(0,23):02}:{random.randint(0,59):02}",
-            "arrival_time": f"{random.randint(0,23):02}:{random.randint(0,59):02}",
-            "passengers": {}
+def build_airports(count: int) -> list:
+    """The first `count` real airports, padded with synthetic ones (ZAA, ZAB, ...) beyond 25."""
+    airports = REAL_AIRPORTS[:count]
+    taken = {ap["code"] for ap in REAL_AIRPORTS}
+    n = 0
+    while len(airports) < count:
+        if n >= 26 * 26:
+            raise ValueError(f"At most {len(REAL_AIRPORTS) + 26 * 26} airports are supported")
+        code = "Z" + string.ascii_uppercase[n // 26] + string.ascii_uppercase[n % 26]
+        n += 1
+        if code not in taken:
+            airports.append({"code": code, "city": f"City {code}", "country": "Synthetic"})
+    return airports
+
+def _generate_flight(rng, codes, src_index, destinations, passengers, dep_date):
+    dest_ap = destinations[src_index][rng.randrange(len(destinations[src_index]))]
+    airline = AIRLINES[rng.randrange(len(AIRLINES))]
+    flight_no = codes.flight_number(airline["c"])
+
+    # Fixed the random time range (0-59)
+    flight_data = {
+        "airline": airline["n"],
+        "destination": dest_ap["code"],
+        "dest_city": dest_ap["city"],
+        "dep_date": dep_date,
+        "dep_time": f"{rng.randint(0,23):02}:{rng.randint(0,59):02}",
+        "arrival_time": f"{rng.randint(0,23):02}:{rng.randint(0,59):02}",
+        "passengers": {}
+    }
+
+    # Passengers with complete contact info for Resend notifications
+    for _ in range(rng.randint(*passengers)):
+        passenger = REAL_PASSENGERS[rng.randrange(len(REAL_PASSENGERS))]
+        flight_data["passengers"][codes.pnr()] = {
+            "name": passenger["name"],
+            "email": passenger["email"],
+            "phone": passenger["phone"],
+            "seat": f"{rng.randint(1, 30)}{rng.choice('ABCDEF')}",
+            "status": "Confirmed",
+            "booking_date": "2025-12-28",
+            "notification_sent": False  # Track if delay/cancellation notification was sent
         }
+    return flight_no, flight_data
+
+class _StreamWriter:
+    """Writes the airports hierarchy piece by piece, formatted like json.dump(indent=...)."""
+
+    def __init__(self, f, indent):
+        self.f = f
+        self.indent = indent
+        self.colon = ": " if indent is not None else ":"
+        self.bytes = 0
 
-        # Add 10-15 Passengers per flight with complete contact info for Resend notifications
-        num_passengers = random.randint(10, 15)
-        for _ in range(num_passengers):
-            pnr = ''.join(random.choices(string.ascii_uppercase + string.digits, k=6))
-            passenger = random.choice(REAL_PASSENGERS)
-            flight_data["passengers"][pnr] = {
-                "name": passenger["name"],
-                "email": passenger["email"],
-                "phone": passenger["phone"],
-                "seat": f"{random.randint(1, 30)}{random.choice('ABCDEF')}",
-                "status": "Confirmed",
-                "booking_date": "2025-12-28",
-                "notification_sent": False  # Track if delay/cancellation notification was sent
-            }
-        
-        # Nest the flight under the Source Airport
-        db["airports"][src_ap["code"]]["flights"][flight_no] = flight_data
-
-    # Save file
-    with open("udaansathi_real_hierarchy.json", "w") as f:
-        json.dump(db, f, indent=2)
-    
-    print("✅ Created realistic hierarchical JSON: 'udaansathi_real_hierarchy.json'")
+    def _nl(self, level: int) -> str:
+        return "" if self.indent is None else "\n" + " " * (self.indent * level)
+
+    def write(self, text: str):
+        self.f.write(text)
+        self.bytes += len(text)
+
+    def entry(self, key: str, value, level: int, first: bool):
+        if self.indent is None:
+            body = json.dumps(value, separators=(",", ":"))
+        else:
+            body = json.dumps(value, indent=self.indent).replace("\n", self._nl(level))
+        self.write(("" if first else ",") + self._nl(level) + json.dumps(key) + self.colon + body)
+
+    def open(self, key: str, level: int, first: bool):
+        self.write(("" if first else ",") + self._nl(level) + json.dumps(key) + self.colon + "{")
+
+    def close(self, level: int, empty: bool):
+        self.write(("" if empty else self._nl(level)) + "}")
+
+def generate_real_hierarchy(airports=len(REAL_AIRPORTS), flights=100, passengers=(10, 15), days=1,
+                            seed=2025, start_date="2025-12-29", output="udaansathi_real_hierarchy.json",
+                            indent=2):
+    """
+    Write an airports/<SRC>/flights/<FLIGHT_NO>/passengers/<PNR> fixture.
+    `flights` departures are spread over `days` days starting at `start_date`;
+    every run with the same arguments produces the same file. Flights are
+    generated and written one airport at a time, so memory stays flat and
+    the output can be as large as the disk allows.
+    """
+    rng = random.Random(seed)
+    codes = UniqueCodes(rng)
+    airport_list = build_airports(airports)
+    if len(airport_list) < 2:
+        raise ValueError("At least 2 airports are needed")
+    destinations = [[a for a in airport_list if a is not ap] for ap in airport_list]
+    first_day = date.fromisoformat(start_date)
+    dates = [(first_day + timedelta(days=d)).isoformat() for d in range(days)]
+
+    # Decide every flight's source up front (ints only) so airports can be streamed in order
+    per_airport = [[] for _ in airport_list]
+    for _ in range(flights):
+        per_airport[rng.randrange(len(airport_list))].append(dates[rng.randrange(days)])
+
+    started = time.monotonic()
+    total_passengers = 0
+    tmp = output + ".tmp"
+    with open(tmp, "w", buffering=1024 * 1024) as f:
+        w = _StreamWriter(f, indent)
+        w.write("{")
+        w.open("airports", 1, True)
+        for i, ap in enumerate(airport_list):
+            w.open(ap["code"], 2, i == 0)
+            w.entry("city", ap["city"], 3, True)
+            w.entry("country", ap["country"], 3, False)
+            w.open("flights", 3, False)
+            for j, dep_date in enumerate(sorted(per_airport[i])):
+                flight_no, flight_data = _generate_flight(rng, codes, i, destinations, passengers, dep_date)
+                total_passengers += len(flight_data["passengers"])
+                w.entry(flight_no, flight_data, 4, j == 0)
+            w.close(3, not per_airport[i])
+            w.close(2, False)
+        w.close(1, not airport_list)
+        w.write(w._nl(0) + "}")
+    os.replace(tmp, output)
+
+    elapsed = time.monotonic() - started
+    print(f"✅ Created realistic hierarchical JSON: '{output}'")
+    print(f"📊 {len(airport_list)} airports, {flights} flights over {days} day(s), {total_passengers} passengers, "
+          f"{w.bytes / 1e6:.1f} MB in {elapsed:.1f}s")
+
+def _passenger_range(value: str) -> tuple:
+    low, _, high = value.partition("-")
+    low, high = int(low), int(high or low)
+    if low < 0 or high < low:
+        raise argparse.ArgumentTypeError("expected N or MIN-MAX")
+    return low, high
 
 if __name__ == "__main__":
-    generate_real_hierarchy()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Generate a deterministic airports/flights/passengers fixture")
+    parser.add_argument("--airports", type=int, default=len(REAL_AIRPORTS), help="number of airports (real ones first, then synthetic)")
+    parser.add_argument("--flights", type=int, default=100, help="total flights")
+    parser.add_argument("--passengers", type=_passenger_range, default=(10, 15), help="passengers per flight: N or MIN-MAX")
+    parser.add_argument("--days", type=int, default=1, help="days the schedule is spread over")
+    parser.add_argument("--start-date", default="2025-12-29", help="first departure date (YYYY-MM-DD)")
+    parser.add_argument("--seed", type=int, default=2025, help="random seed; same seed, same file")
+    parser.add_argument("--output", default="udaansathi_real_hierarchy.json")
+    parser.add_argument("--compact", action="store_true", help="no indentation (much smaller for large fixtures)")
+    args = parser.parse_args()
+
+    generate_real_hierarchy(
+        airports=args.airports,
+        flights=args.flights,
+        passengers=args.passengers,
+        days=max(args.days, 1),
+        seed=args.seed,
+        start_date=args.start_date,
+        output=args.output,
+        indent=None if args.compact else 2,
+    )
@@ -0,0 +1,39 @@
+"""
+Gunicorn settings (picked up automatically from the backend directory):
+
+    gunicorn app:app                              # sync workers, as before
+    WORKER_CLASS=gevent gunicorn app:app          # high-concurrency mode
+
+Handlers spend most of their time waiting on Firebase REST and Resend, so
+with sync workers concurrency is capped at WEB_CONCURRENCY x THREADS. Gevent
+workers serve up to WORKER_CONNECTIONS requests each on one OS thread; the
+worker monkey-patches sockets, threads and time before app.py is imported,
+so the pooled sessions (http_pool.py), the email outbox and the SSE streams
+all become cooperative. Size HTTP_POOL_SIZE close to WORKER_CONNECTIONS
+so in-flight requests don't queue for a connection. The ticket PDF process
+pool (tickets.py) is started with "spawn", so its processes never inherit a
+forked, monkey-patched gevent worker.
+
+    WORKER_CLASS        sync | gthread | gevent       (default sync)
+    WEB_CONCURRENCY     worker processes              (default 2)
+    THREADS             threads per gthread worker    (default 4)
+    WORKER_CONNECTIONS  requests per gevent worker    (default 200)
+    PORT                listen port                   (default 5000)
+    GUNICORN_TIMEOUT    worker timeout in seconds     (default 120)
+
+benchmarks/load.py compares the modes against a local stub backend.
+"""
+
+import os
+
+worker_class = os.environ.get("WORKER_CLASS", "sync")
+workers = int(os.environ.get("WEB_CONCURRENCY", 2))
+threads = int(os.environ.get("THREADS", 4)) if worker_class == "gthread" else 1
+worker_connections = int(os.environ.get("WORKER_CONNECTIONS", 200))
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 120))
+keepalive = 5
+
+if worker_class == "gevent":
+    # One pooled connection per concurrent request unless set explicitly
+    os.environ.setdefault("HTTP_POOL_SIZE", str(worker_connections))
@@ -0,0 +1,47 @@
+"""
+Conditional GET helpers (ETag / If-None-Match).
+
+Polled endpoints tag their responses with a strong ETag derived from a
+version token maintained on write (e.g. cache_versions/<SRC>,
+notification_versions/<PNR>). When the client's If-None-Match still matches
+the current token the handler answers 304 before reading or serializing the
+body. Without a token the ETag falls back to a hash of the JSON body, which
+still saves the bandwidth.
+"""
+
+import hashlib
+
+from flask import Response, jsonify, request
+
+
+def version_etag(*parts) -> str:
+    """Strong (unquoted) ETag value for a version token plus whatever shapes the body."""
+    raw = "|".join("" if p is None else str(p) for p in parts)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def etag_matches(etag: str) -> bool:
+    """True if the request's If-None-Match already names `etag`."""
+    return bool(etag) and request.if_none_match.contains(etag)
+
+
+def not_modified(etag: str) -> Response:
+    res = Response(status=304)
+    res.set_etag(etag)
+    res.headers["Cache-Control"] = "no-cache"
+    return res
+
+
+def conditional_json(payload, status: int = 200, etag: str = None) -> Response:
+    """
+    jsonify `payload` with an ETag (the given version ETag, or a hash of the
+    body) and turn it into a 304 if the client already has it.
+    """
+    res = jsonify(payload)
+    res.status_code = status
+    res.headers["Cache-Control"] = "no-cache"
+    if etag:
+        res.set_etag(etag)
+    else:
+        res.add_etag()
+    return res.make_conditional(request)
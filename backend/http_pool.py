@@ -0,0 +1,101 @@
+"""
+Pooled keep-alive HTTP sessions for Firebase and Resend.
+
+Every handler's latency is mostly Firebase REST round trips, and the email
+outbox's is Resend calls. Out of the box the Firebase Admin client keeps 10
+connections per host, and the Resend SDK opens a new connection for every
+email (a plain requests.request call). Once more than a handful of requests
+are in flight (gevent workers, see gunicorn.conf.py), both end up paying TCP
+and TLS setup again on most calls.
+
+    pool_firebase()   re-mounts the Firebase Admin database client's session
+                      with a pool of HTTP_POOL_SIZE connections
+    pool_resend(mod)  sends the Resend SDK's requests through one shared
+                      keep-alive session
+
+Tuning via environment:
+    HTTP_POOL_SIZE    connections kept per host        (default 10, use about
+                      WORKER_CONNECTIONS under gevent)
+    HTTP_POOL_BLOCK   "1" makes callers wait for a free connection instead
+                      of opening (and then dropping) extra ones (default off)
+"""
+
+import logging
+import os
+import sys
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+_sessions = {}
+_lock = threading.Lock()
+
+
+def pool_size() -> int:
+    try:
+        return max(1, int(os.environ.get("HTTP_POOL_SIZE", 10)))
+    except (TypeError, ValueError):
+        return 10
+
+
+def pooled_adapter(max_retries=0) -> HTTPAdapter:
+    size = pool_size()
+    return HTTPAdapter(pool_connections=size, pool_maxsize=size, max_retries=max_retries,
+                       pool_block=os.environ.get("HTTP_POOL_BLOCK") == "1")
+
+
+def mount_pool(session: requests.Session, max_retries=0) -> requests.Session:
+    """Give `session` a pooled adapter for http and https (keeps its auth and headers)."""
+    adapter = pooled_adapter(max_retries)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def shared_session(name: str) -> requests.Session:
+    """Process-wide pooled session for `name` (one per upstream service)."""
+    session = _sessions.get(name)
+    if session is None:
+        with _lock:
+            session = _sessions.get(name)
+            if session is None:
+                session = _sessions[name] = mount_pool(requests.Session())
+    return session
+
+
+def pool_firebase():
+    """Pool the connections of the default app's Realtime Database client (Firebase must be initialized)."""
+    from firebase_admin import _http_client, db
+
+    # Reference objects share one cached client per database URL, so this covers every later call
+    client = db.reference("/")._client
+    mount_pool(client.session, _http_client.DEFAULT_RETRY_CONFIG)
+    _sessions["firebase"] = client.session
+
+
+class _SessionRequests:
+    """Stands in for the `requests` module inside the Resend SDK: same API, calls go through a session."""
+
+    def __init__(self, session: requests.Session):
+        self._session = session
+
+    def request(self, method, url, **kwargs):
+        return self._session.request(method, url, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(requests, name)
+
+
+def pool_resend(resend):
+    """Route the Resend SDK's HTTP calls through the shared "resend" session."""
+    # Newer SDKs send through resend.default_http_client, older ones from resend.request
+    client = getattr(resend, "default_http_client", None)
+    transport = sys.modules.get(type(client).__module__) if client is not None else getattr(resend, "request", None)
+    if getattr(transport, "requests", None) is not requests:
+        logger.warning("Unrecognized resend SDK layout; emails use the SDK's own connections")
+        return
+    transport.requests = _SessionRequests(shared_session("resend"))
+
@@ -0,0 +1,145 @@
+"""
+Secondary indexes maintained next to the hierarchical airports tree.
+
+Layout in the Realtime Database:
+    pnr_index/<PNR>                       -> {"airport": <SRC>, "flight_id": <FLIGHT_ID>}
+    route_index/<SRC>/<DST>/<FLIGHT_ID>   -> flight summary (flight fields + passenger_count)
+
+Every route that writes a flight node passes the flight as it was before and
+after the write to `flight_index_updates`, which turns the difference into
+index paths; the route adds them to the same WriteBatch as the flight write,
+so flight and indexes are committed in one multi-path update. Reads go
+through app.py's cached_get (route_index/<SRC>, merged with
+`merge_route_summaries`). `rebuild_indexes` is the one-shot backfill
+(see `python seed_database.py --reindex`).
+
+Flights are passed with their passenger map attached (see manifests.py);
+a split flight node without it still has an up-to-date passenger_count, so
+field-only updates can pass the bare node.
+"""
+
+from manifests import MANIFESTS, SPLIT_FLAG, airport_passengers, with_passengers
+
+PNR_INDEX = "pnr_index"
+ROUTE_INDEX = "route_index"
+
+
+def _passenger_keys(flight):
+    """Return the set of PNRs booked on a flight dict (or an empty set)."""
+    if not isinstance(flight, dict):
+        return set()
+    passengers = flight.get("passengers") or {}
+    if not isinstance(passengers, dict):
+        return set()
+    return {str(pnr).upper() for pnr in passengers.keys()}
+
+
+def flight_summary(flight) -> dict:
+    """Return a copy of a flight dict with its passenger map replaced by `passenger_count`."""
+    if not isinstance(flight, dict):
+        return {}
+    summary = {k: v for k, v in flight.items() if k not in ("passengers", SPLIT_FLAG)}
+    passengers = flight.get("passengers")
+    if isinstance(passengers, dict):
+        summary["passenger_count"] = len(passengers)
+    else:
+        summary["passenger_count"] = flight.get("passenger_count", 0) if flight.get(SPLIT_FLAG) else 0
+    return summary
+
+
+def _route_key(source: str, flight) -> str:
+    """Return 'route_index/<SRC>/<DST>' for a flight dict, or None if it has no destination."""
+    if not isinstance(flight, dict):
+        return None
+    destination = str(flight.get("destination") or "").strip().upper()
+    if not destination:
+        return None
+    return f"{ROUTE_INDEX}/{source.upper()}/{destination}"
+
+
+def flight_index_updates(source: str, flight_id: str, before, after) -> dict:
+    """
+    Build the multi-path update that moves the index entries of one flight
+    from its `before` state to its `after` state. Pass None for `before` when
+    the flight is new and None for `after` when it is being removed.
+    """
+    updates = {}
+    entry = {"airport": source, "flight_id": flight_id}
+
+    old_pnrs = _passenger_keys(before)
+    new_pnrs = _passenger_keys(after)
+
+    for pnr in old_pnrs - new_pnrs:
+        updates[f"{PNR_INDEX}/{pnr}"] = None
+    for pnr in new_pnrs - old_pnrs:
+        updates[f"{PNR_INDEX}/{pnr}"] = entry
+
+    old_route = _route_key(source, before)
+    new_route = _route_key(source, after)
+    if old_route and old_route != new_route:
+        updates[f"{old_route}/{flight_id}"] = None
+    if new_route:
+        summary = flight_summary(after)
+        if old_route != new_route or summary != flight_summary(before):
+            updates[f"{new_route}/{flight_id}"] = summary
+
+    return updates
+
+
+def lookup_pnr(root, pnr: str):
+    """Return the index entry {"airport", "flight_id"} for a PNR, or None."""
+    entry = root.child(PNR_INDEX).child(pnr.upper()).get()
+    if not isinstance(entry, dict) or not entry.get("airport") or not entry.get("flight_id"):
+        return None
+    return entry
+
+
+def merge_route_summaries(data):
+    """Flatten a route_index/<SRC> node ({dst: {flight_id: summary}}) into {flight_id: summary}."""
+    if not isinstance(data, dict):
+        return None
+    summaries = {}
+    for flights in data.values():
+        if isinstance(flights, dict):
+            summaries.update(flights)
+    return summaries
+
+
+def build_indexes(airports: dict, manifests: dict = None) -> dict:
+    """Compute every index from in-memory `airports` and `manifests` trees (either layout)."""
+    pnr_index = {}
+    route_index = {}
+    manifests = manifests if isinstance(manifests, dict) else {}
+    for air_code, air_data in (airports or {}).items():
+        if not isinstance(air_data, dict):
+            continue
+        flights = air_data.get("flights") or {}
+        if not isinstance(flights, dict):
+            continue
+        passengers = airport_passengers(flights, manifests.get(air_code))
+        for f_id, f_data in flights.items():
+            if not isinstance(f_data, dict):
+                continue
+            f_data = with_passengers(f_data, passengers.get(f_id))
+            for pnr in _passenger_keys(f_data):
+                pnr_index[pnr] = {"airport": air_code, "flight_id": str(f_id)}
+            route = _route_key(air_code, f_data)
+            if route:
+                _, src, dst = route.split("/")
+                route_index.setdefault(src, {}).setdefault(dst, {})[str(f_id)] = flight_summary(f_data)
+    return {PNR_INDEX: pnr_index, ROUTE_INDEX: route_index}
+
+
+def rebuild_indexes(root) -> dict:
+    """
+    One-shot backfill: read the airports and manifests trees once and
+    overwrite every index. Returns the number of entries written per index.
+    """
+    airports = root.child("airports").get() or {}
+    indexes = build_indexes(airports, root.child(MANIFESTS).get())
+    for name, entries in indexes.items():
+        root.child(name).set(entries)
+    return {
+        PNR_INDEX: len(indexes[PNR_INDEX]),
+        ROUTE_INDEX: sum(len(flights) for dests in indexes[ROUTE_INDEX].values() for flights in dests.values()),
+    }
@@ -0,0 +1,206 @@
+"""
+Passenger manifests stored apart from flight nodes.
+
+Layout in the Realtime Database:
+    airports/<SRC>/flights/<ID>         -> flight fields + "manifest": true + passenger_count
+    manifests/<SRC>/<ID>/<PNR>          -> passenger record
+
+The legacy layout kept the passenger map inside the flight node
+(airports/<SRC>/flights/<ID>/passengers/<PNR>), so every flight, airport or
+tree read carried all of its passengers. A flight node with "manifest": true
+has been split; any other node is still legacy. Readers go through
+`read_passengers` / `passenger_path`, which handle both, so the app keeps
+working while `migrate_manifests` converts the data underneath it:
+
+    python manifests.py                  # every airport
+    python manifests.py --airport DEL --page 100
+    python manifests.py --dry-run        # count what would move
+
+The migration reads each airport's flights a page at a time and moves the
+passengers of legacy flights with one multi-path update per page (manifest,
+passenger_count, marker, embedded map removed and cache_versions/<SRC>
+bumped together). It is idempotent, so an interrupted run is resumed by
+running it again. A change to a flight that lands between its page being
+read and written (a cancellation, a delay's notification_sent flags) can be
+undone, so run it while no disruption is being processed.
+"""
+
+import json
+import os
+
+from read_cache import CACHE_VERSIONS
+from storage import WriteBatch, generate_push_key
+
+MANIFESTS = "manifests"
+
+# A flight node with this flag set keeps its passengers under manifests/
+SPLIT_FLAG = "manifest"
+
+
+def manifest_path(source: str, flight_id: str) -> str:
+    return f"{MANIFESTS}/{source}/{flight_id}"
+
+
+def flight_node_path(source: str, flight_id: str) -> str:
+    return f"airports/{source}/flights/{flight_id}"
+
+
+def is_split(flight) -> bool:
+    return isinstance(flight, dict) and bool(flight.get(SPLIT_FLAG))
+
+
+def embedded_passengers(flight) -> dict:
+    passengers = flight.get("passengers") if isinstance(flight, dict) else None
+    return passengers if isinstance(passengers, dict) else {}
+
+
+def split_flight(flight: dict):
+    """(flight node without passengers, passenger map) for writing the split layout."""
+    passengers = embedded_passengers(flight)
+    node = {k: v for k, v in flight.items() if k != "passengers"}
+    node[SPLIT_FLAG] = True
+    node["passenger_count"] = len(passengers)
+    return node, passengers
+
+
+def flight_writes(source: str, flight_id: str, flight: dict) -> dict:
+    """Multi-path writes that store a whole flight (passengers included) in the split layout."""
+    node, passengers = split_flight(flight)
+    return {flight_node_path(source, flight_id): node, manifest_path(source, flight_id): passengers or None}
+
+
+def with_passengers(flight: dict, passengers: dict) -> dict:
+    """The flight as the API (and the indexes) see it: one dict with its passenger map."""
+    merged = {k: v for k, v in flight.items() if k != SPLIT_FLAG}
+    merged["passengers"] = passengers or {}
+    return merged
+
+
+def read_passengers(root, source: str, flight_id: str, flight, shallow: bool = False, reader=None) -> dict:
+    """
+    Passenger map of a flight in either layout; costs a read only for split
+    flights. `shallow` returns {pnr: True} (enough to address notifications).
+    `reader(path)` replaces the direct read, e.g. to go through a cache.
+    """
+    if not is_split(flight):
+        return embedded_passengers(flight)
+    if reader is not None and not shallow:
+        data = reader(manifest_path(source, flight_id))
+    else:
+        data = root.child(manifest_path(source, flight_id)).get(shallow=shallow)
+    return data if isinstance(data, dict) else {}
+
+
+def read_passenger(root, source: str, flight_id: str, flight, pnr: str):
+    """One passenger record in either layout (a single small read for split flights)."""
+    if not is_split(flight):
+        return embedded_passengers(flight).get(pnr)
+    record = root.child(manifest_path(source, flight_id)).child(pnr).get()
+    return record if isinstance(record, dict) else None
+
+
+def passenger_path(source: str, flight_id: str, flight, pnr: str) -> str:
+    """Where a passenger record of this flight is written."""
+    if is_split(flight):
+        return f"{manifest_path(source, flight_id)}/{pnr}"
+    return f"{flight_node_path(source, flight_id)}/passengers/{pnr}"
+
+
+def airport_passengers(flights: dict, manifests) -> dict:
+    """{flight_id: passengers} for an airport's flights node plus its manifests/<SRC> node."""
+    manifests = manifests if isinstance(manifests, dict) else {}
+    out = {}
+    for f_id, flight in (flights or {}).items():
+        if isinstance(flight, dict):
+            out[f_id] = (manifests.get(f_id) or {}) if is_split(flight) else embedded_passengers(flight)
+    return out
+
+
+# --- migration ---
+
+def _iter_flight_pages(ref, page_size: int):
+    """Yield pages of {flight_id: flight} from an airport's flights node in key order."""
+    cursor = None
+    while True:
+        query = ref.order_by_key()
+        if cursor is not None:
+            # start_at is inclusive, so ask for one extra and skip the cursor
+            query = query.start_at(cursor).limit_to_first(page_size + 1)
+        else:
+            query = query.limit_to_first(page_size)
+        page = {k: v for k, v in (query.get() or {}).items() if k != cursor}
+        if page:
+            yield page
+        if len(page) < page_size:
+            return
+        cursor = list(page)[-1]
+
+
+def migrate_manifests(root, airports=None, page_size: int = None, dry_run: bool = False, log=print) -> dict:
+    """
+    Move the passengers of every legacy flight (of `airports`, default all)
+    into manifests/. Returns counts and the flight-node bytes before/after.
+    """
+    page_size = page_size or int(os.environ.get("MANIFEST_PAGE_FLIGHTS", 50))
+    if airports is None:
+        airports = sorted((root.child("airports").get(shallow=True) or {}).keys())
+    stats = {"airports": 0, "flights": 0, "migrated": 0, "passengers": 0, "bytes_before": 0, "bytes_after": 0}
+
+    for source in airports:
+        stats["airports"] += 1
+        flights_ref = root.child("airports").child(source).child("flights")
+        for page in _iter_flight_pages(flights_ref, page_size):
+            batch = WriteBatch(root)
+            moved = 0
+            for f_id, flight in page.items():
+                if not isinstance(flight, dict):
+                    continue
+                stats["flights"] += 1
+                size = len(json.dumps(flight, default=str))
+                stats["bytes_before"] += size
+                if is_split(flight):
+                    stats["bytes_after"] += size
+                    continue
+                node, passengers = split_flight(flight)
+                stats["bytes_after"] += len(json.dumps(node, default=str))
+                stats["passengers"] += len(passengers)
+                moved += 1
+                # Field-level writes, so a concurrent status/time update to the flight is kept
+                node_path = flight_node_path(source, f_id)
+                batch.set(f"{node_path}/passengers", None)
+                batch.set(f"{node_path}/{SPLIT_FLAG}", True)
+                batch.set(f"{node_path}/passenger_count", node["passenger_count"])
+                batch.set(manifest_path(source, f_id), passengers or None)
+            if moved and not dry_run:
+                batch.set(f"{CACHE_VERSIONS}/{source}", generate_push_key())
+                batch.commit()
+            stats["migrated"] += moved
+        log(f"  ✈️ {source}: {stats['migrated']} flights moved so far")
+
+    before, after = stats["bytes_before"], stats["bytes_after"]
+    saved = f" ({1 - after / before:.0%} smaller)" if before else ""
+    log(f"{'🔎 Would move' if dry_run else '✅ Moved'} {stats['passengers']:,} passengers of {stats['migrated']:,} flights; "
+        f"flight nodes {before / 1e6:.2f} MB -> {after / 1e6:.2f} MB{saved}")
+    return stats
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from firebase_config import init_firebase
+    from storage import get_storage
+
+    parser = argparse.ArgumentParser(description="Move passengers out of flight nodes into manifests/")
+    parser.add_argument("--airport", action="append", help="only this airport (repeatable)")
+    parser.add_argument("--page", type=int, help="flights read and written per update (default MANIFEST_PAGE_FLIGHTS or 50)")
+    parser.add_argument("--dry-run", action="store_true", help="report what would move without writing")
+    parser.add_argument("--save", action="store_true", help="local backend: write the migrated tree back to LOCAL_DATA_PATH")
+    args = parser.parse_args()
+
+    storage = get_storage()
+    if storage.name == "firebase" and not init_firebase():
+        raise SystemExit("❌ Firebase is not configured")
+    airports = [a.upper() for a in args.airport] if args.airport else None
+    migrate_manifests(storage.reference("/"), airports=airports, page_size=args.page, dry_run=args.dry_run)
+    if args.save and storage.name == "local" and not args.dry_run:
+        storage.save()
@@ -0,0 +1,247 @@
+"""
+Request metrics in Prometheus text format.
+
+`RequestMetrics(app)` installs before/after/teardown hooks that record, per
+route template (request.url_rule, e.g. "/bookings/<pnr>", never the raw
+path) and method:
+
+    http_requests_total{method, route, status}           counter
+    http_request_duration_seconds{method, route}         histogram
+    http_response_size_bytes{method, route}              histogram
+    http_requests_in_flight{method, route}               gauge
+    process_first_success_seconds                        gauge
+
+The last one is the time from process start (interpreter start, not app
+import) to the end of the first 2xx response: the cold-start cost a user
+actually waits for.
+
+Latency runs until the handler returns (time to first byte for streamed
+bodies); sizes of streamed bodies are counted as the chunks are sent.
+Requests that match no route are recorded under route="<unmatched>" so
+scanners can't blow up the label space. Every series also carries a
+pid="<worker pid>" label: each gunicorn worker keeps its own registry, so a
+scrape sees one worker and the pid keeps its series apart from the others.
+
+`render()` returns the exposition text served at /metrics. Set METRICS_TOKEN
+to require "Authorization: Bearer <token>" on that route.
+"""
+
+import bisect
+import os
+import threading
+import time
+
+from flask import g, request
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS = (100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000, 100_000_000)
+
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+def process_start_time() -> float:
+    """Epoch time the current process started (Linux /proc; otherwise now)."""
+    try:
+        with open("/proc/self/stat", "r") as f:
+            # Field 22 (starttime, clock ticks since boot); the name in field 2 may contain spaces
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/stat", "r") as f:
+            boot = next(int(line.split()[1]) for line in f if line.startswith("btime "))
+        return boot + start_ticks / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError, StopIteration):
+        return time.time()
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_number(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value)) if abs(value) < 1e15 else repr(value)
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, label_names=()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def remove(self, labels: tuple):
+        with self._lock:
+            self._values.pop(labels, None)
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+            lines.extend(self._render_samples(items))
+        return lines
+
+    def _render_samples(self, items) -> list:
+        return [f"{self.name}{_format_labels(self.label_names, labels)} {_format_number(value)}"
+                for labels, value in items]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, labels: tuple, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def inc(self, labels: tuple, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, labels: tuple, amount: float = 1):
+        self.inc(labels, -amount)
+
+    def get(self, labels: tuple, default=None):
+        with self._lock:
+            return self._values.get(labels, default)
+
+    def set(self, labels: tuple, value: float):
+        with self._lock:
+            self._values[labels] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, label_names=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, label_names)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, labels: tuple, value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                # per-bucket (non-cumulative) counts incl. +Inf, then sum
+                state = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][index] += 1
+            state[1] += value
+
+    def _render_samples(self, items) -> list:
+        lines = []
+        for labels, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = f'le="{_format_number(float(bound))}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, labels, le)} {cumulative}")
+            label_text = _format_labels(self.label_names, labels)
+            lines.append(f"{self.name}_sum{label_text} {_format_number(total)}")
+            lines.append(f"{self.name}_count{label_text} {cumulative}")
+        return lines
+
+
+class RequestMetrics:
+    """Per-route HTTP metrics for a Flask app."""
+
+    def __init__(self, app=None):
+        self.pid = str(os.getpid())
+        labels = ("pid", "method", "route")
+        self.requests = Counter("http_requests_total", "HTTP requests by route template and status.", labels + ("status",))
+        self.duration = Histogram("http_request_duration_seconds", "Request latency by route template.", labels, LATENCY_BUCKETS)
+        self.size = Histogram("http_response_size_bytes", "Response body size by route template.", labels, SIZE_BUCKETS)
+        self.in_flight = Gauge("http_requests_in_flight", "Requests currently being handled.", labels)
+        self.started = Gauge("process_start_time_seconds", "Start time of this worker since the epoch.", ("pid",))
+        self.started.set((self.pid,), process_start_time())
+        self.first_success = Gauge("process_first_success_seconds",
+                                   "Seconds from worker start to its first successful response.", ("pid",))
+        self._first_success_seen = False
+        self.metrics = [self.requests, self.duration, self.size, self.in_flight, self.started, self.first_success]
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.before_request(self._before)
+        app.after_request(self._after)
+        app.teardown_request(self._teardown)
+
+    def _labels(self) -> tuple:
+        # A forked worker must not report under its parent's pid
+        pid = str(os.getpid())
+        if pid != self.pid:
+            self.started.remove((self.pid,))
+            self.first_success.remove((self.pid,))
+            self._first_success_seen = False
+            self.pid = pid
+            self.started.set((pid,), process_start_time())
+        route = request.url_rule.rule if request.url_rule is not None else UNMATCHED_ROUTE
+        return (pid, request.method, route)
+
+    def _before(self):
+        labels = self._labels()
+        g._metrics = {"start": time.perf_counter(), "labels": labels, "status": 500}
+        self.in_flight.inc(labels)
+
+    def _after(self, response):
+        state = g.get("_metrics")
+        if state is None:
+            return response
+        state["status"] = response.status_code
+        labels = state["labels"]
+        if response.content_length is not None:
+            self.size.observe(labels, response.content_length)
+        else:
+            # Streamed body: count the bytes as they go out
+            response.response = self._counted(response.response, labels)
+        return response
+
+    def _counted(self, body, labels):
+        sent = 0
+        try:
+            for chunk in body:
+                sent += len(chunk)
+                yield chunk
+        finally:
+            self.size.observe(labels, sent)
+            if hasattr(body, "close"):
+                body.close()
+
+    def _teardown(self, exc):
+        state = g.pop("_metrics", None)
+        if state is None:
+            return
+        labels = state["labels"]
+        self.in_flight.dec(labels)
+        self.duration.observe(labels, time.perf_counter() - state["start"])
+        self.requests.inc(labels + (str(state["status"]),))
+        if not self._first_success_seen and 200 <= state["status"] < 300:
+            self._first_success_seen = True
+            pid = labels[0]
+            started = self.started.get((pid,), time.time())
+            self.first_success.set((pid,), round(time.time() - started, 4))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def authorized(self) -> bool:
+        token = os.environ.get("METRICS_TOKEN")
+        return not token or request.headers.get("Authorization", "") == f"Bearer {token}"
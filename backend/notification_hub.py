@@ -0,0 +1,251 @@
+"""
+Server-Sent Events push channel for passenger notifications.
+
+NotificationSystem used to poll /notifications/<pnr> every few seconds, one
+database read per open browser per poll. GET /notifications/<pnr>/stream
+keeps one connection open instead and every connection in the process is
+fed by a single `NotificationHub`:
+
+    - notifications written by this process (cancel, delay, bulk disruption,
+      send_notifications_to_passengers) are published once their WriteBatch
+      commits, with no database read at all
+    - with NOTIFICATION_LISTEN=1 on Firebase, the hub also subscribes once to
+      notification_versions (one small key per PNR) and, for PNRs that have
+      a client connected here, reads what other instances wrote
+
+Wire format (text/event-stream):
+    id: <push-key>           event: notification   data: {"id": ..., ...}
+    event: reset                                   data: {"cursor": ...}
+    : ping                   (heartbeat comment every SSE_HEARTBEAT seconds)
+
+A reconnecting EventSource sends Last-Event-ID (or the client passes
+?since=), and the missed entries are replayed with one keyed query. Each
+connection buffers at most SSE_MAX_QUEUE events; a client that falls behind
+gets a `reset` with the last cursor it received and should fetch the gap
+from /notifications/<pnr>?since=<cursor>.
+
+Streams are off unless the worker can afford them: under gunicorn sync
+workers every open stream holds a whole worker for up to SSE_MAX_SECONDS,
+so a couple of open tabs would starve every other route. With streams off
+the route answers 404 and NotificationSystem keeps polling with ?since=.
+
+    NOTIFICATION_STREAM  "auto" (default): on only when sockets are
+                         cooperatively patched (gevent / eventlet workers,
+                         see gunicorn.conf.py); "1" forces on (e.g. a
+                         threaded dev server), "0" forces off
+
+Tuning via environment:
+    SSE_HEARTBEAT     seconds between heartbeats                 (default 15)
+    SSE_MAX_QUEUE     buffered events per connection             (default 100)
+    SSE_MAX_CLIENTS   open streams per process, then 503         (default 500)
+    SSE_MAX_SECONDS   stream lifetime before the client re-dials (default 300)
+"""
+
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+
+def _env_number(name: str, default, cast=int):
+    try:
+        return cast(os.environ.get(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def cooperative_workers() -> bool:
+    """True when gevent or eventlet has patched sockets, so an idle stream costs no worker."""
+    gevent_monkey = sys.modules.get("gevent.monkey")
+    if gevent_monkey is not None and gevent_monkey.is_module_patched("socket"):
+        return True
+    eventlet_patcher = sys.modules.get("eventlet.patcher")
+    return eventlet_patcher is not None and eventlet_patcher.is_monkey_patched("socket")
+
+
+def streams_enabled() -> bool:
+    setting = os.environ.get("NOTIFICATION_STREAM", "auto").strip().lower()
+    if setting in ("0", "1"):
+        return setting == "1"
+    return cooperative_workers()
+
+
+class Subscriber:
+    """One open stream: a bounded queue of (key, notification) for a single PNR."""
+
+    def __init__(self, pnr: str, cursor: str = None, max_queue: int = 100):
+        self.pnr = pnr
+        self.cursor = cursor  # key of the newest event handed to the client
+        self.lagged = False
+        self._queue = deque()
+        self._max_queue = max_queue
+        self._ready = threading.Condition()
+
+    def offer(self, key: str, notification: dict):
+        with self._ready:
+            if len(self._queue) >= self._max_queue:
+                # Too slow to keep up: drop the backlog and tell the client to re-sync
+                self._queue.clear()
+                self.lagged = True
+            else:
+                self._queue.append((key, notification))
+            self._ready.notify()
+
+    def wait(self, timeout: float):
+        """Pending events (oldest first) and whether the client lagged; waits up to `timeout`."""
+        with self._ready:
+            if not self._queue and not self.lagged:
+                self._ready.wait(timeout)
+            events, self._queue = list(self._queue), deque()
+            lagged, self.lagged = self.lagged, False
+        return events, lagged
+
+
+class NotificationHub:
+    """Fan-out of notification events to every stream open in this process."""
+
+    def __init__(self, max_queue: int = None, max_clients: int = None):
+        self.max_queue = max_queue or _env_number("SSE_MAX_QUEUE", 100)
+        self.max_clients = max_clients or _env_number("SSE_MAX_CLIENTS", 500)
+        self._lock = threading.Lock()
+        self._subscribers = {}  # pnr -> set(Subscriber)
+        self.published = 0
+        self.delivered = 0
+        self.lagged = 0
+        self.rejected = 0
+        self.listener_reads = 0
+
+    def subscribe(self, pnr: str, cursor: str = None):
+        """A new Subscriber for `pnr`, or None when the process is at SSE_MAX_CLIENTS."""
+        with self._lock:
+            if self.clients() >= self.max_clients:
+                self.rejected += 1
+                return None
+            sub = Subscriber(pnr, cursor, self.max_queue)
+            self._subscribers.setdefault(pnr, set()).add(sub)
+            return sub
+
+    def unsubscribe(self, sub: Subscriber):
+        with self._lock:
+            subs = self._subscribers.get(sub.pnr)
+            if subs is not None:
+                subs.discard(sub)
+                if not subs:
+                    del self._subscribers[sub.pnr]
+
+    def clients(self) -> int:
+        return sum(len(subs) for subs in self._subscribers.values())
+
+    def watching(self, pnr: str) -> bool:
+        return bool(self._subscribers.get(pnr))
+
+    def publish(self, pnr: str, key: str, notification: dict):
+        """Hand a committed notification to every stream open for `pnr`."""
+        with self._lock:
+            self.published += 1
+            subs = list(self._subscribers.get(pnr, ()))
+        for sub in subs:
+            sub.offer(key, notification)
+        if subs:
+            with self._lock:
+                self.delivered += len(subs)
+
+    def listen(self, versions_ref, read_since):
+        """
+        Follow notification_versions/<PNR> for writes made by other instances.
+        `read_since(pnr, key)` returns {push_key: notification} newer than `key`;
+        it is only called for PNRs with a stream open here. Returns the
+        firebase_admin ListenerRegistration (call .close() to stop).
+        """
+        state = {"initial": True}
+
+        def on_event(event):
+            try:
+                path = (event.path or "/").strip("/")
+                if not path:
+                    # First snapshot is the current state; streams replay from their own cursor
+                    state["initial"] = False
+                    return
+                pnr = path.split("/")[0]
+                with self._lock:
+                    subs = list(self._subscribers.get(pnr, ()))
+                if not subs:
+                    return
+                cursors = [sub.cursor for sub in subs]
+                since = None if None in cursors else min(cursors)
+                self.listener_reads += 1
+                for key, notification in sorted((read_since(pnr, since) or {}).items()):
+                    for sub in subs:
+                        if sub.cursor is None or key > sub.cursor:
+                            sub.offer(key, notification)
+            except Exception as e:
+                logger.warning("Notification listener event failed: %s", e)
+
+        return versions_ref.listen(on_event)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "enabled": streams_enabled(),
+                "clients": self.clients(),
+                "pnrs": len(self._subscribers),
+                "max_clients": self.max_clients,
+                "max_queue": self.max_queue,
+                "published": self.published,
+                "delivered": self.delivered,
+                "lagged": self.lagged,
+                "rejected": self.rejected,
+                "listener_reads": self.listener_reads,
+            }
+
+
+def sse_event(data: dict, event: str = None, event_id: str = None) -> str:
+    lines = []
+    if event_id:
+        lines.append(f"id: {event_id}")
+    if event:
+        lines.append(f"event: {event}")
+    lines.append("data: " + json.dumps(data, ensure_ascii=False, separators=(",", ":"), default=str))
+    return "\n".join(lines) + "\n\n"
+
+
+def event_stream(hub: NotificationHub, sub: Subscriber, backlog: dict = None,
+                 heartbeat: float = None, max_seconds: float = None):
+    """
+    SSE body for one subscriber: the replayed `backlog`, then live events,
+    heartbeats in between. Ends after max_seconds (EventSource re-dials with
+    Last-Event-ID) or when the client goes away; always unsubscribes.
+    """
+    heartbeat = heartbeat or _env_number("SSE_HEARTBEAT", 15, float)
+    max_seconds = max_seconds or _env_number("SSE_MAX_SECONDS", 300, float)
+    deadline = time.monotonic() + max_seconds
+    try:
+        # Tell EventSource how long to wait before reconnecting
+        yield "retry: 3000\n\n"
+        for key, notification in sorted((backlog or {}).items()):
+            if sub.cursor is None or key > sub.cursor:
+                sub.cursor = key
+                yield sse_event({"id": key, **notification}, "notification", key)
+        while time.monotonic() < deadline:
+            events, lagged = sub.wait(min(heartbeat, max(0.0, deadline - time.monotonic())))
+            if lagged:
+                with hub._lock:
+                    hub.lagged += 1
+                yield sse_event({"cursor": sub.cursor}, "reset")
+            sent = False
+            for key, notification in events:
+                # Writes from this process and the listener can both report a key
+                if sub.cursor is not None and key <= sub.cursor:
+                    continue
+                sub.cursor = key
+                sent = True
+                yield sse_event({"id": key, **notification}, "notification", key)
+            if not sent and not lagged:
+                yield ": ping\n\n"
+    finally:
+        hub.unsubscribe(sub)
@@ -0,0 +1,222 @@
+"""
+Background email outbox for disruption notices.
+
+Routes build the messages (plain Resend param dicts) and hand them to
+`EmailOutbox.submit`, which returns immediately with an `EmailJob`. The
+messages are split into batches and sent from a bounded thread pool:
+    - Resend batch sending (resend.Batch.send, up to 100 messages per call)
+      when available, otherwise one resend.Emails.send per message
+    - each batch is retried with exponential backoff + jitter; in
+      per-message mode a retry only sends the messages that have not gone
+      out yet, so nobody gets the same email twice
+    - progress (sent / failed / pending) is tracked per job and can be
+      mirrored to the database through `on_progress` so any worker can
+      answer the status endpoint
+
+Tuning via environment:
+    EMAIL_WORKERS       threads shared by all jobs          (default 4)
+    EMAIL_BATCH_SIZE    messages per Resend batch call      (default 50, max 100)
+    EMAIL_MAX_ATTEMPTS  attempts per batch before giving up (default 3)
+    EMAIL_BATCH_SEND    "0" to force one request per email  (default on)
+
+Jobs live in process memory: queued emails are lost if the worker exits.
+
+The resend SDK (and the requests stack under it) is imported on the first
+send through `resend_client()`, not when the app starts; its HTTP calls go
+through a shared keep-alive session (http_pool.py, HTTP_POOL_SIZE).
+"""
+
+import logging
+import os
+import random
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+RESEND_BATCH_LIMIT = 100
+
+_resend = None
+_resend_lock = threading.Lock()
+
+
+def resend_client():
+    """The resend module with RESEND_API_KEY applied, imported on first use."""
+    global _resend
+    if _resend is None:
+        with _resend_lock:
+            if _resend is None:
+                import resend
+
+                from http_pool import pool_resend
+
+                resend.api_key = os.getenv("RESEND_API_KEY")
+                pool_resend(resend)
+                _resend = resend
+    return _resend
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.environ.get(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+class EmailJob:
+    """Progress of one fan-out (e.g. all passengers of a cancelled flight)."""
+
+    def __init__(self, kind: str, total: int, meta: dict = None):
+        self.id = uuid.uuid4().hex[:16]
+        self.kind = kind
+        self.total = total
+        self.sent = 0
+        self.failed = 0
+        self.meta = meta or {}
+        self.errors = []
+        self.sent_tags = []
+        self.created_at = datetime.utcnow().isoformat()
+        self.finished_at = None
+        self._pending_batches = 0
+        self._lock = threading.Lock()
+
+    @property
+    def status(self) -> str:
+        if self.finished_at is None:
+            return "running" if (self.sent or self.failed) else "queued"
+        return "completed" if self.failed == 0 else ("failed" if self.sent == 0 else "partial")
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {
+                "job_id": self.id,
+                "kind": self.kind,
+                "status": self.status,
+                "total": self.total,
+                "sent": self.sent,
+                "failed": self.failed,
+                "pending": self.total - self.sent - self.failed,
+                "errors": list(self.errors),
+                "created_at": self.created_at,
+                "finished_at": self.finished_at,
+                **self.meta,
+            }
+
+
+class EmailOutbox:
+    """Bounded-concurrency sender shared by every job in the process."""
+
+    MAX_ERRORS_PER_JOB = 20
+    MAX_TRACKED_JOBS = 500
+
+    def __init__(self, workers: int = None, batch_size: int = None, max_attempts: int = None,
+                 use_batch: bool = None, backoff: float = 1.0, on_progress=None):
+        self.workers = max(1, workers or _env_int("EMAIL_WORKERS", 4))
+        self.batch_size = min(RESEND_BATCH_LIMIT, max(1, batch_size or _env_int("EMAIL_BATCH_SIZE", 50)))
+        self.max_attempts = max(1, max_attempts or _env_int("EMAIL_MAX_ATTEMPTS", 3))
+        if use_batch is None:
+            use_batch = os.environ.get("EMAIL_BATCH_SEND", "1") != "0"
+        self.use_batch = use_batch
+        self.backoff = backoff
+        self.on_progress = on_progress
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="email-outbox")
+        self._jobs = {}
+        self._jobs_lock = threading.Lock()
+
+    # --- public API ---
+
+    def submit(self, kind: str, messages: list, meta: dict = None, on_complete=None) -> EmailJob:
+        """
+        Queue `messages` and return the job right away. Each message is a
+        Resend params dict; an optional "tag" key is stripped before sending
+        and collected into `job.sent_tags` for every delivered message.
+        `on_complete(job)` runs on a worker thread once every batch finished.
+        """
+        job = EmailJob(kind, len(messages), meta)
+        self._track(job)
+        batches = [messages[i:i + self.batch_size] for i in range(0, len(messages), self.batch_size)]
+        job._pending_batches = len(batches)
+        if not batches:
+            self._finish(job, on_complete)
+            return job
+        for batch in batches:
+            self._executor.submit(self._run_batch, job, batch, on_complete)
+        self._report(job)
+        return job
+
+    def get(self, job_id: str):
+        with self._jobs_lock:
+            return self._jobs.get(job_id)
+
+    # --- internals ---
+
+    def _track(self, job: EmailJob):
+        with self._jobs_lock:
+            self._jobs[job.id] = job
+            if len(self._jobs) > self.MAX_TRACKED_JOBS:
+                # Forget the oldest finished jobs first
+                for old_id in [j.id for j in self._jobs.values() if j.finished_at][:len(self._jobs) - self.MAX_TRACKED_JOBS]:
+                    self._jobs.pop(old_id, None)
+
+    def _send(self, batch: list, delivered: set):
+        """Send the messages of `batch` whose index is not in `delivered`, adding each one that went out."""
+        pending = [i for i in range(len(batch)) if i not in delivered]
+        params = {i: {k: v for k, v in batch[i].items() if k != "tag"} for i in pending}
+        resend = resend_client()
+        if self.use_batch and len(pending) > 1 and hasattr(resend, "Batch"):
+            # One request: the whole batch is accepted or none of it is
+            resend.Batch.send([params[i] for i in pending])
+            delivered.update(pending)
+        else:
+            for i in pending:
+                resend.Emails.send(params[i])
+                delivered.add(i)
+
+    def _run_batch(self, job: EmailJob, batch: list, on_complete):
+        error = None
+        delivered = set()
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                self._send(batch, delivered)
+                error = None
+                break
+            except Exception as e:
+                error = e
+                logger.warning("Email batch for job %s failed (attempt %d/%d): %s", job.id, attempt, self.max_attempts, e)
+                if attempt < self.max_attempts:
+                    time.sleep(self.backoff * (2 ** (attempt - 1)) + random.uniform(0, self.backoff))
+
+        with job._lock:
+            job.sent += len(delivered)
+            job.failed += len(batch) - len(delivered)
+            job.sent_tags.extend(batch[i]["tag"] for i in sorted(delivered) if batch[i].get("tag") is not None)
+            if error is not None and len(job.errors) < self.MAX_ERRORS_PER_JOB:
+                job.errors.append(str(error))
+            job._pending_batches -= 1
+            done = job._pending_batches == 0
+
+        if done:
+            self._finish(job, on_complete)
+        else:
+            self._report(job)
+
+    def _finish(self, job: EmailJob, on_complete):
+        with job._lock:
+            job.finished_at = datetime.utcnow().isoformat()
+        if on_complete:
+            try:
+                on_complete(job)
+            except Exception as e:
+                logger.exception("on_complete for email job %s failed: %s", job.id, e)
+        self._report(job)
+
+    def _report(self, job: EmailJob):
+        if not self.on_progress:
+            return
+        try:
+            self.on_progress(job)
+        except Exception as e:
+            logger.debug("Could not record progress for email job %s: %s", job.id, e)
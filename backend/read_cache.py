@@ -0,0 +1,149 @@
+"""
+Read-through cache for hot flight reads.
+
+Entries are keyed by database path (e.g. "airports/DEL/flights",
+"route_index/DEL/BOM") and expire after FLIGHT_CACHE_TTL seconds (default 30,
+0 disables caching). At most FLIGHT_CACHE_MAX_ENTRIES paths are kept; the
+least recently used one is evicted first.
+
+Invalidation:
+    - write paths call `invalidate_airport(src)` after committing, which drops
+      every cached path under airports/<src>, route_index/<src> and
+      manifests/<src>
+    - every flight write also bumps cache_versions/<src>; with
+      FLIGHT_CACHE_LISTEN=1, `listen_for_invalidations` subscribes to that small
+      node so writes made by other instances invalidate this one too
+
+Concurrent misses for the same path share one database read (single_flight.py),
+even with the TTL at 0; FLIGHT_READ_COALESCE=0 turns that off.
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from single_flight import SingleFlight
+from storage import clone_tree
+
+logger = logging.getLogger(__name__)
+
+CACHE_VERSIONS = "cache_versions"
+
+# Cached path prefixes that belong to one source airport
+AIRPORT_PREFIXES = ("airports/{src}", "route_index/{src}", "manifests/{src}")
+
+_MISSING = object()
+
+
+class ReadCache:
+    """Thread-safe TTL + LRU cache of database reads with hit/miss counters."""
+
+    def __init__(self, ttl: float = None, max_entries: int = None):
+        self.ttl = float(os.environ.get("FLIGHT_CACHE_TTL", 30)) if ttl is None else ttl
+        self.max_entries = max_entries or int(os.environ.get("FLIGHT_CACHE_MAX_ENTRIES", 1024))
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._reads = SingleFlight(os.environ.get("FLIGHT_READ_COALESCE", "1") != "0")
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, path: str, loader):
+        """Return the cached value for `path`, calling `loader()` on a miss or expiry."""
+        path = path.strip("/")
+        if self.ttl <= 0:
+            with self._lock:
+                self.misses += 1
+            return self._reads.do(path, loader)
+
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(path, _MISSING)
+            if entry is not _MISSING and entry[0] > now:
+                self._entries.move_to_end(path)
+                self.hits += 1
+                return clone_tree(entry[1])
+            self.misses += 1
+            generation = self.invalidations
+
+        # Shared as-is: it is only stored and cloned below, never handed out
+        value = self._reads.do(path, loader, copy=None)
+
+        with self._lock:
+            # Skip the store if an invalidation raced with the load
+            if generation == self.invalidations:
+                self._entries[path] = (now + self.ttl, value)
+                self._entries.move_to_end(path)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+        return clone_tree(value)
+
+    def invalidate(self, prefix: str):
+        """Drop `prefix`, everything below it and every cached ancestor of it."""
+        prefix = prefix.strip("/")
+
+        def matches(path):
+            return path == prefix or path.startswith(prefix + "/") or prefix.startswith(path + "/")
+
+        with self._lock:
+            self.invalidations += 1
+            for path in list(self._entries):
+                if matches(path):
+                    del self._entries[path]
+        # Reads already in flight may predate the write; later callers must not join them
+        self._reads.forget(matches)
+
+    def invalidate_airport(self, source: str):
+        for template in AIRPORT_PREFIXES:
+            self.invalidate(template.format(src=source))
+
+    def clear(self):
+        with self._lock:
+            self.invalidations += 1
+            self._entries.clear()
+        self._reads.forget(lambda path: True)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "coalescing": self._reads.stats(),
+            }
+
+
+def listen_for_invalidations(versions_ref, cache: ReadCache):
+    """
+    Subscribe to cache_versions (one small value per airport) and invalidate
+    the matching airport whenever another instance writes. Returns the
+    firebase_admin ListenerRegistration (call .close() to stop).
+    """
+    state = {"initial": True}
+
+    def on_event(event):
+        try:
+            path = (event.path or "/").strip("/")
+            if not path:
+                # First snapshot is just the current versions; later root events
+                # (e.g. after a reconnect) may hide changes, so drop everything.
+                if state["initial"]:
+                    state["initial"] = False
+                else:
+                    cache.clear()
+                return
+            cache.invalidate_airport(path.split("/")[0])
+        except Exception as e:
+            logger.warning("Cache invalidation event failed: %s", e)
+
+    return versions_ref.listen(on_event)
@@ -7,6 +7,10 @@ import json
 import os
 import firebase_admin
 from firebase_admin import credentials, db
+from bulk_load import BulkLoader, JsonScanner, LoadStats, hierarchy_writes, initial_writes
+from indexes import PNR_INDEX, ROUTE_INDEX, rebuild_indexes
+from manifests import MANIFESTS
+from storage import generate_push_key
 
 # Firebase Configuration
 SERVICE_ACCOUNT_PATH = "serviceAccountKey.json"
@@ -30,72 +34,79 @@ def initialize_firebase():
     
     return db.reference()
 
-def seed_from_hierarchy_json():
+def _load(path, writes_for, prepare=None, root=None, restart=False, workers=None):
+    """Stream `path` through `writes_for` and upload it with a BulkLoader. Returns LoadStats."""
+    root = root or initialize_firebase()
+    stats = LoadStats()
+    total = os.path.getsize(path) or 1
+    loader = BulkLoader(root, path, workers=workers)
+
+    with open(path, "r", encoding="utf-8") as f:
+        scanner = JsonScanner(f)
+        result = loader.run(
+            writes_for(scanner, stats),
+            prepare=prepare,
+            restart=restart,
+            progress=lambda: min(scanner.chars_read / total, 1.0),
+        )
+
+    print(f"  ✅ {result['uploaded']} chunks uploaded ({result['skipped']} already done), "
+          f"{result['paths']:,} paths, {result['bytes'] / 1e6:.1f} MB in {result['seconds']}s")
+    bump_cache_versions(root, stats.airports)
+    return stats
+
+def seed_from_hierarchy_json(root=None, restart=False, workers=None, path="udaansathi_real_hierarchy.json"):
     """
     Upload udaansathi_real_hierarchy.json to Firebase.
     This includes all flights with passengers, emails, and notification_sent flags.
+    The file is streamed and uploaded in parallel chunks together with its
+    pnr_index / route_index entries; an interrupted run resumes where it stopped.
     """
-    root = initialize_firebase()
-    
-    with open("udaansathi_real_hierarchy.json", "r") as f:
-        data = json.load(f)
-    
     print("📤 Uploading hierarchical flight data to Firebase...")
-    
-    # Upload the entire airports structure
-    root.child("airports").set(data["airports"])
-    
-    print(f"✅ Uploaded {len(data['airports'])} airports with flights and passengers!")
-    
-    # Count totals for verification
-    total_flights = 0
-    total_passengers = 0
-    for airport_code, airport_data in data["airports"].items():
-        flights = airport_data.get("flights", {})
-        total_flights += len(flights)
-        for flight_id, flight_data in flights.items():
-            passengers = flight_data.get("passengers", {})
-            total_passengers += len(passengers)
-    
-    print(f"📊 Total: {total_flights} flights, {total_passengers} passengers with email addresses")
 
-def seed_from_initial_json():
+    def replace_existing(root):
+        # A fresh run replaces the airports tree, its manifests and the indexes derived from them
+        root.update({"airports": None, MANIFESTS: None, PNR_INDEX: None, ROUTE_INDEX: None})
+
+    stats = _load(path, hierarchy_writes, prepare=replace_existing, root=root, restart=restart, workers=workers)
+
+    print(f"✅ Uploaded {len(stats.airports)} airports with flights and passengers!")
+    print(f"📊 Total: {stats.flights} flights, {stats.passengers} passengers with email addresses")
+
+def seed_from_initial_json(root=None, restart=False, workers=None, path="initial_flight_data.json"):
     """
     Upload initial_flight_data.json to Firebase (alternative flat structure).
     This data also includes passengers with emails.
+    Flights are regrouped under airports/<source>/flights as they are streamed
+    and merged into whatever is already there.
     """
-    root = initialize_firebase()
-    
-    with open("initial_flight_data.json", "r") as f:
-        data = json.load(f)
-    
     print("📤 Uploading initial flight data to Firebase...")
-    
-    # Upload airlines reference
-    if "airlines" in data:
-        root.child("airlines").set(data["airlines"])
-        print(f"  ✅ Uploaded {len(data['airlines'])} airlines")
-    
-    # Upload airports reference  
-    if "airports" in data:
-        root.child("airport_info").set(data["airports"])
-        print(f"  ✅ Uploaded {len(data['airports'])} airport details")
-    
-    # Convert flat flights structure to hierarchical (by source airport)
-    if "flights" in data:
-        airports_hierarchy = {}
-        for flight_id, flight_info in data["flights"].items():
-            source = flight_info.get("source", "UNKNOWN")
-            if source not in airports_hierarchy:
-                airports_hierarchy[source] = {"flights": {}}
-            airports_hierarchy[source]["flights"][flight_id] = flight_info
-        
-        # Merge with existing airport data
-        for code, airport_data in airports_hierarchy.items():
-            root.child("airports").child(code).child("flights").set(airport_data["flights"])
-        
-        total_passengers = sum(len(f.get("passengers", {})) for f in data["flights"].values())
-        print(f"  ✅ Uploaded {len(data['flights'])} flights with {total_passengers} passengers")
+
+    stats = _load(path, initial_writes, root=root, restart=restart, workers=workers)
+
+    print(f"  ✅ Uploaded {stats.flights} flights with {stats.passengers} passengers")
+
+def bump_cache_versions(root, airports):
+    """
+    Flight data changed outside the API: move the version token of every
+    touched airport so caches and ETags held by running instances are invalidated.
+    """
+    if airports:
+        root.child("cache_versions").update({code: generate_push_key() for code in airports})
+
+def reindex_database():
+    """
+    Rebuild the secondary indexes (pnr_index, route_index) from the airports and manifests trees.
+    Safe to re-run at any time; existing index nodes are overwritten.
+    """
+    root = initialize_firebase()
+
+    print("🔎 Rebuilding secondary indexes...")
+    counts = rebuild_indexes(root)
+    for name, count in counts.items():
+        print(f"  ✅ {name}: {count} entries")
+
+    bump_cache_versions(root, root.child("airports").get(shallow=True) or {})
 
 def clear_database():
     """Clear all flight data (use with caution!)"""
@@ -104,22 +115,36 @@ def clear_database():
     confirm = input("⚠️ This will DELETE all flight data! Type 'YES' to confirm: ")
     if confirm == "YES":
         root.child("airports").delete()
+        root.child(MANIFESTS).delete()
         root.child("cancelled_flights").delete()
         root.child("notifications").delete()
+        root.child("pnr_index").delete()
+        root.child("route_index").delete()
+        root.child("cache_versions").delete()
+        root.child("notification_versions").delete()
         print("🗑️ Database cleared!")
     else:
         print("❌ Cancelled")
 
 if __name__ == "__main__":
-    import sys
-    
-    if len(sys.argv) > 1:
-        if sys.argv[1] == "--initial":
-            seed_from_initial_json()
-        elif sys.argv[1] == "--clear":
-            clear_database()
-        else:
-            print("Usage: python seed_database.py [--initial|--clear]")
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Seed the Realtime Database with flight data")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--initial", action="store_true", help="upload initial_flight_data.json instead of the hierarchy export")
+    mode.add_argument("--clear", action="store_true", help="delete all flight data")
+    mode.add_argument("--reindex", action="store_true", help="rebuild pnr_index / route_index from the airports tree")
+    parser.add_argument("--file", help="input JSON (defaults to the file for the chosen mode)")
+    parser.add_argument("--workers", type=int, help="parallel upload workers (default: SEED_WORKERS or 8)")
+    parser.add_argument("--restart", action="store_true", help="ignore an existing checkpoint and upload everything again")
+    args = parser.parse_args()
+
+    if args.clear:
+        clear_database()
+    elif args.reindex:
+        reindex_database()
+    elif args.initial:
+        seed_from_initial_json(restart=args.restart, workers=args.workers, path=args.file or "initial_flight_data.json")
     else:
         # Default: use the hierarchy JSON
-        seed_from_hierarchy_json()
+        seed_from_hierarchy_json(restart=args.restart, workers=args.workers, path=args.file or "udaansathi_real_hierarchy.json")
@@ -0,0 +1,101 @@
+"""
+Request coalescing ("single flight") for identical concurrent reads.
+
+When an admin dashboard refreshes during a disruption, dozens of identical
+/flights?airport=DEL and /flights/DEL/<id> requests arrive together, and on
+a cache miss (or with FLIGHT_CACHE_TTL=0) each would read the same path. With
+`SingleFlight.do(key, loader)` the first caller for a key runs the loader and
+every caller that arrives while it is running waits for that result instead
+of starting its own read. Nothing is kept once the read finishes, so this
+works the same with caching off.
+
+    - followers get their own copy of the result (`copy`, clone_tree by
+      default) and the leader keeps the original untouched until they have
+      it, so no caller sees another's mutations
+    - a loader exception is raised in every caller that shared the read
+    - `forget(matches)` detaches in-flight reads a write has made stale:
+      callers arriving after the write start a fresh read, callers already
+      waiting still get the old one
+
+ReadCache (read_cache.py) runs its loads through one of these; the counters
+show up under "coalescing" in /cache/stats.
+"""
+
+import threading
+
+from storage import clone_tree
+
+
+class _Call:
+    __slots__ = ("done", "value", "error", "waiters")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Collapses concurrent `do()` calls with the same key into one loader call."""
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.collapsed = 0
+        self.errors = 0
+
+    def do(self, key, loader, copy=clone_tree):
+        """`loader()`'s result, shared with every concurrent caller for `key`."""
+        if not self.enabled:
+            return loader()
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.leaders += 1
+            else:
+                call.waiters += 1
+                self.collapsed += 1
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return copy(call.value) if copy else call.value
+
+        try:
+            call.value = loader()
+        except Exception as e:
+            call.error = e
+            with self._lock:
+                self.errors += 1
+            raise
+        finally:
+            with self._lock:
+                if self._calls.get(key) is call:
+                    del self._calls[key]
+                shared = call.waiters > 0
+            call.done.set()
+        # Followers copy from call.value, so the leader must not hand out that object
+        return copy(call.value) if copy and shared else call.value
+
+    def forget(self, matches):
+        """Detach in-flight reads whose key satisfies `matches(key)`; later callers start anew."""
+        with self._lock:
+            for key in [k for k in self._calls if matches(k)]:
+                del self._calls[key]
+
+    def stats(self) -> dict:
+        with self._lock:
+            reads = self.leaders + self.collapsed
+            return {
+                "enabled": self.enabled,
+                "in_flight": len(self._calls),
+                "reads": self.leaders,
+                "collapsed": self.collapsed,
+                "collapse_ratio": round(self.collapsed / reads, 4) if reads else 0.0,
+                "errors": self.errors,
+            }
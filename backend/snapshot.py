@@ -0,0 +1,219 @@
+"""
+Local snapshot of flight summaries for cold starts.
+
+A cold worker has to initialize Firebase and open its first connection
+before it can answer anything. With SNAPSHOT_PATH set, the worker keeps a
+copy of route_index (passenger-free flight summaries per airport and route)
+and cache_versions on local disk, so summary reads (/flights?view=summary,
+/flights/search) can be answered from it while the live connection warms up.
+
+The file is marshal'd and zlib-compressed (a few hundred KB for 10k flights;
+loads in milliseconds) behind a small header:
+
+    b"UDSNAP" | format version (1 byte) | marshal version (1 byte) | payload
+
+A file written by another Python version or format is ignored, as is one
+older than SNAPSHOT_MAX_AGE seconds (default 86400).
+
+Once the app is live, `start_refresher` rewrites the file every
+SNAPSHOT_REFRESH seconds (default 300). A refresh reads cache_versions (one
+small value per airport) and re-reads route_index/<SRC> only for airports
+whose version moved. To ship a snapshot with a deploy, run
+
+    python snapshot.py [--output PATH]
+
+as part of the build.
+"""
+
+import logging
+import marshal
+import os
+import threading
+import time
+import zlib
+
+from indexes import ROUTE_INDEX, merge_route_summaries
+from read_cache import CACHE_VERSIONS
+from storage import clone_tree
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"UDSNAP"
+FORMAT_VERSION = 1
+
+
+def encode_snapshot(data: dict) -> bytes:
+    return MAGIC + bytes((FORMAT_VERSION, marshal.version)) + zlib.compress(marshal.dumps(data), 6)
+
+
+def decode_snapshot(blob: bytes) -> dict:
+    header = len(MAGIC) + 2
+    if blob[:len(MAGIC)] != MAGIC or len(blob) < header:
+        raise ValueError("Not a flight snapshot")
+    if blob[len(MAGIC)] != FORMAT_VERSION or blob[len(MAGIC) + 1] != marshal.version:
+        raise ValueError("Snapshot was written by a different format or Python version")
+    data = marshal.loads(zlib.decompress(blob[header:]))
+    if not isinstance(data, dict):
+        raise ValueError("Snapshot payload is not a dict")
+    return data
+
+
+def _plain(value):
+    """marshal only takes builtin types; database values already are, but be strict."""
+    if isinstance(value, dict):
+        return {str(k): _plain(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_plain(v) for v in value]
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    return str(value)
+
+
+class FlightSnapshot:
+    """route_index + cache_versions, loaded from and saved to SNAPSHOT_PATH."""
+
+    def __init__(self, path: str = None, refresh_every: float = None, max_age: float = None):
+        self.path = os.environ.get("SNAPSHOT_PATH") if path is None else path
+        self.refresh_every = float(os.environ.get("SNAPSHOT_REFRESH", 300)) if refresh_every is None else refresh_every
+        self.max_age = float(os.environ.get("SNAPSHOT_MAX_AGE", 86400)) if max_age is None else max_age
+        self._lock = threading.Lock()
+        self._routes = {}
+        self._versions = {}
+        self.written_at = None
+        self.served = 0
+        self.refreshes = 0
+        self._refresher = None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.path)
+
+    @property
+    def loaded(self) -> bool:
+        return self.written_at is not None
+
+    def age(self):
+        return None if self.written_at is None else max(0.0, time.time() - self.written_at)
+
+    def load(self) -> bool:
+        """Read the snapshot file; False (and nothing served) if missing, stale or unreadable."""
+        if not self.enabled or not os.path.exists(self.path):
+            return False
+        started = time.perf_counter()
+        try:
+            with open(self.path, "rb") as f:
+                data = decode_snapshot(f.read())
+        except Exception as e:
+            logger.warning("Ignoring flight snapshot %s: %s", self.path, e)
+            return False
+        written_at = data.get("written_at") or 0
+        if self.max_age and time.time() - written_at > self.max_age:
+            logger.info("Flight snapshot %s is older than %ss; not serving it", self.path, self.max_age)
+            return False
+        with self._lock:
+            self._routes = data.get("routes") or {}
+            self._versions = data.get("versions") or {}
+            self.written_at = written_at
+        logger.info("Loaded flight snapshot (%d airports) in %.1f ms",
+                    len(self._routes), (time.perf_counter() - started) * 1000)
+        return True
+
+    def save(self):
+        with self._lock:
+            data = {"written_at": self.written_at, "routes": self._routes, "versions": self._versions}
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(encode_snapshot(data))
+        os.replace(tmp, self.path)
+
+    # --- reads (callers get their own copies) ---
+
+    def airport(self, source: str):
+        """({flight_id: summary}, version) for one airport, or None if not in the snapshot."""
+        with self._lock:
+            routes = self._routes.get(source)
+            if routes is None:
+                return None
+            self.served += 1
+            return merge_route_summaries(clone_tree(routes)) or {}, self._versions.get(source)
+
+    def route(self, source: str, destination: str):
+        """{flight_id: summary} for one route, or None if the airport is not in the snapshot."""
+        with self._lock:
+            routes = self._routes.get(source)
+            if routes is None:
+                return None
+            self.served += 1
+            return clone_tree(routes.get(destination) or {})
+
+    # --- refresh ---
+
+    def refresh(self, root) -> int:
+        """Re-read the airports whose cache_versions moved and save. Returns how many were read."""
+        versions = root.child(CACHE_VERSIONS).get() or {}
+        with self._lock:
+            stale = [src for src, v in versions.items() if self._versions.get(src) != v]
+            full = not self._routes
+        if full:
+            routes = _plain(root.child(ROUTE_INDEX).get() or {})
+        else:
+            routes = {src: _plain(root.child(ROUTE_INDEX).child(src).get() or {}) for src in stale}
+        with self._lock:
+            if full:
+                self._routes = routes
+            else:
+                self._routes.update(routes)
+            self._versions = _plain(versions)
+            self.written_at = time.time()
+            self.refreshes += 1
+        self.save()
+        return len(routes)
+
+    def start_refresher(self, root_factory):
+        """Refresh now and then every `refresh_every` seconds on a daemon thread."""
+        if not self.enabled or self._refresher is not None:
+            return
+
+        def loop():
+            while True:
+                try:
+                    self.refresh(root_factory())
+                except Exception as e:
+                    logger.warning("Flight snapshot refresh failed: %s", e)
+                time.sleep(max(self.refresh_every, 1))
+
+        self._refresher = threading.Thread(target=loop, name="flight-snapshot", daemon=True)
+        self._refresher.start()
+
+    def stats(self) -> dict:
+        age = self.age()
+        return {
+            "enabled": self.enabled,
+            "loaded": self.loaded,
+            "airports": len(self._routes),
+            "age_seconds": round(age, 1) if age is not None else None,
+            "served": self.served,
+            "refreshes": self.refreshes,
+        }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from firebase_config import init_firebase
+    from indexes import rebuild_indexes
+    from storage import get_storage
+
+    parser = argparse.ArgumentParser(description="Write the flight summary snapshot used on cold starts")
+    parser.add_argument("--output", default=os.environ.get("SNAPSHOT_PATH") or "flight_snapshot.bin")
+    args = parser.parse_args()
+
+    storage = get_storage()
+    if storage.name == "firebase" and not init_firebase():
+        raise SystemExit("❌ Firebase is not configured")
+    root = storage.reference("/")
+    if storage.name == "local" and root.child(ROUTE_INDEX).get(shallow=True) is None:
+        rebuild_indexes(root)
+    snapshot = FlightSnapshot(path=args.output)
+    count = snapshot.refresh(root)
+    print(f"✅ Wrote {args.output}: {count} airports, {os.path.getsize(args.output) / 1024:.1f} KB")
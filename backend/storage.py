@@ -0,0 +1,418 @@
+"""
+Storage backends behind `safe_ref` / `get_database`.
+
+Routes only ever talk to a Reference-like object:
+    ref.child(path) / ref.key / ref.path
+    ref.get(shallow=False)
+    ref.set(value) / ref.update({path: value, ...}) / ref.push(value) / ref.delete()
+    ref.order_by_key().start_at(k).end_at(k).limit_to_first(n).limit_to_last(n).get()
+
+`FirebaseStorage` hands out real `firebase_admin.db.Reference` objects.
+`LocalStorage` keeps the whole tree in memory (optionally loaded from a JSON
+export such as udaansathi_real_hierarchy.json) and mirrors the Realtime
+Database semantics the routes rely on: multi-path updates, None/{} deleting a
+node, empty parents being pruned and chronologically sortable push keys.
+
+Select the backend with STORAGE_BACKEND=firebase|local (default: firebase) and
+point LOCAL_DATA_PATH at the JSON file to load for the local backend.
+"""
+
+import json
+import os
+import random
+import threading
+import time
+
+PUSH_CHARS = "-0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ_abcdefghijklmnopqrstuvwxyz"
+
+_push_lock = threading.Lock()
+_last_push_time = 0
+_last_rand_chars = [0] * 12
+
+
+def generate_push_key() -> str:
+    """
+    Generate a 20-character Firebase-style push key. Keys sort in creation
+    order, so they can be generated locally and written with a multi-path
+    update exactly like the keys `push()` would have created.
+    """
+    global _last_push_time
+    with _push_lock:
+        now = int(time.time() * 1000)
+        duplicate_time = now == _last_push_time
+        _last_push_time = now
+
+        time_chars = []
+        for _ in range(8):
+            time_chars.append(PUSH_CHARS[now % 64])
+            now //= 64
+        key = "".join(reversed(time_chars))
+
+        if not duplicate_time:
+            for i in range(12):
+                _last_rand_chars[i] = random.randrange(64)
+        else:
+            # Same millisecond: increment the random part so ordering is kept
+            i = 11
+            while i >= 0 and _last_rand_chars[i] == 63:
+                _last_rand_chars[i] = 0
+                i -= 1
+            if i >= 0:
+                _last_rand_chars[i] += 1
+
+        return key + "".join(PUSH_CHARS[c] for c in _last_rand_chars)
+
+
+def _split(path: str) -> list:
+    return [p for p in (path or "").split("/") if p]
+
+
+def clone_tree(value):
+    """Fast copy for JSON-shaped data (dicts, lists and scalars)."""
+    if isinstance(value, dict):
+        return {k: clone_tree(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [clone_tree(v) for v in value]
+    return value
+
+
+def _normalize(value):
+    """Drop None / empty children the way the Realtime Database does on write."""
+    if isinstance(value, dict):
+        out = {}
+        for k, v in value.items():
+            v = _normalize(v)
+            if v is not None:
+                out[str(k)] = v
+        return out or None
+    if isinstance(value, list):
+        out = {str(i): v for i, v in enumerate(_normalize(v) for v in value) if v is not None}
+        return out or None
+    return value
+
+
+class Storage:
+    """Interface every backend implements."""
+
+    name = "base"
+
+    def reference(self, path: str = "/"):
+        raise NotImplementedError
+
+
+class FirebaseStorage(Storage):
+    """Realtime Database via firebase_admin (the app must be initialized first)."""
+
+    name = "firebase"
+
+    def reference(self, path: str = "/"):
+        from firebase_admin import db
+        return db.reference(path)
+
+
+class LocalStorage(Storage):
+    """In-memory tree with Realtime Database semantics, safe to share across threads."""
+
+    name = "local"
+
+    def __init__(self, data=None, source_path: str = None):
+        self.source_path = source_path
+        self._lock = threading.RLock()
+        if data is None and source_path and os.path.exists(source_path):
+            with open(source_path, "r") as f:
+                data = json.load(f)
+        self._root = _normalize(data) or {}
+
+    @classmethod
+    def from_file(cls, path: str):
+        return cls(source_path=path)
+
+    def reference(self, path: str = "/"):
+        return LocalReference(self, _split(path))
+
+    def save(self, path: str = None):
+        """Write the current tree back to disk (defaults to the file it was loaded from)."""
+        target = path or self.source_path
+        if not target:
+            raise ValueError("No path to save the local database to")
+        with self._lock:
+            with open(target, "w") as f:
+                json.dump(self._root, f, indent=2)
+
+    # --- tree primitives (callers hold no lock) ---
+
+    def _read(self, parts):
+        with self._lock:
+            node = self._root
+            for p in parts:
+                if not isinstance(node, dict) or p not in node:
+                    return None
+                node = node[p]
+            return node
+
+    def _write(self, parts, value):
+        with self._lock:
+            self._write_locked(parts, _normalize(clone_tree(value)))
+
+    def _write_locked(self, parts, value):
+        if not parts:
+            self._root = value if isinstance(value, dict) else {}
+            return
+        if value is None:
+            # Delete and prune parents that became empty
+            trail = []
+            node = self._root
+            for p in parts[:-1]:
+                if not isinstance(node, dict) or p not in node:
+                    return
+                trail.append((node, p))
+                node = node[p]
+            if isinstance(node, dict):
+                node.pop(parts[-1], None)
+            while trail and not node:
+                parent, key = trail.pop()
+                parent.pop(key, None)
+                node = parent
+            return
+        node = self._root
+        for p in parts[:-1]:
+            child = node.get(p)
+            if not isinstance(child, dict):
+                child = {}
+                node[p] = child
+            node = child
+        node[parts[-1]] = value
+
+    def _update(self, parts, updates: dict):
+        with self._lock:
+            for key, value in updates.items():
+                self._write_locked(parts + _split(key), _normalize(clone_tree(value)))
+
+
+class LocalReference:
+    """Subset of firebase_admin.db.Reference backed by a LocalStorage tree."""
+
+    def __init__(self, storage: LocalStorage, parts: list):
+        self._storage = storage
+        self._parts = parts
+
+    @property
+    def key(self):
+        return self._parts[-1] if self._parts else None
+
+    @property
+    def path(self):
+        return "/" + "/".join(self._parts)
+
+    @property
+    def parent(self):
+        if not self._parts:
+            return None
+        return LocalReference(self._storage, self._parts[:-1])
+
+    def child(self, path: str):
+        if not path:
+            raise ValueError("Child path must be a non-empty string")
+        return LocalReference(self._storage, self._parts + _split(path))
+
+    def get(self, etag=False, shallow=False):
+        if etag:
+            raise ValueError("etag reads are not supported by the local backend")
+        with self._storage._lock:
+            node = self._storage._read(self._parts)
+            if shallow and isinstance(node, dict):
+                return {k: (True if isinstance(v, dict) else v) for k, v in node.items()}
+            return clone_tree(node)
+
+    def set(self, value):
+        self._storage._write(self._parts, value)
+
+    def update(self, value: dict):
+        if not value or not isinstance(value, dict):
+            raise ValueError("Value argument must be a non-empty dictionary")
+        if None in value.keys():
+            raise ValueError("Dictionary must not contain None keys")
+        self._storage._update(self._parts, value)
+
+    def push(self, value=""):
+        ref = self.child(generate_push_key())
+        ref.set(value)
+        return ref
+
+    def delete(self):
+        self._storage._write(self._parts, None)
+
+    def order_by_key(self):
+        return LocalQuery(self)
+
+
+def _key_order(key: str):
+    """Realtime Database key order: integer-like keys numerically first, then strings."""
+    try:
+        return (0, int(key), "")
+    except (TypeError, ValueError):
+        return (1, 0, key)
+
+
+class LocalQuery:
+    """order_by_key() queries with start_at / end_at / limit_to_first / limit_to_last."""
+
+    def __init__(self, ref: LocalReference):
+        self._ref = ref
+        self._start = None
+        self._end = None
+        self._first = None
+        self._last = None
+
+    def start_at(self, key):
+        self._start = str(key)
+        return self
+
+    def end_at(self, key):
+        self._end = str(key)
+        return self
+
+    def limit_to_first(self, limit: int):
+        self._first = limit
+        return self
+
+    def limit_to_last(self, limit: int):
+        self._last = limit
+        return self
+
+    def get(self):
+        with self._ref._storage._lock:
+            node = self._ref._storage._read(self._ref._parts)
+            if not isinstance(node, dict):
+                return {}
+            keys = sorted(node, key=_key_order)
+            if self._start is not None:
+                keys = [k for k in keys if _key_order(k) >= _key_order(self._start)]
+            if self._end is not None:
+                keys = [k for k in keys if _key_order(k) <= _key_order(self._end)]
+            if self._first is not None:
+                keys = keys[:self._first]
+            if self._last is not None:
+                keys = keys[-self._last:] if self._last else []
+            return {k: clone_tree(node[k]) for k in keys}
+
+
+def item_size(path: str, value) -> int:
+    """Bytes one (path, value) pair adds to a multi-path update, as chunk_updates counts them."""
+    return len(path) + len(json.dumps(value, default=str))
+
+
+def chunk_updates(items, max_paths: int, max_bytes: int):
+    """
+    Group (path, value) pairs into multi-path update dicts of at most
+    `max_paths` paths and roughly `max_bytes` of JSON each. Yields
+    (chunk, size_in_bytes); works on any iterable, so callers can stream.
+    """
+    current, size = {}, 0
+    for path, value in items:
+        added = item_size(path, value)
+        if current and (len(current) >= max_paths or size + added > max_bytes):
+            yield current, size
+            current, size = {}, 0
+        current[path] = value
+        size += added
+    if current:
+        yield current, size
+
+
+class WriteBatch:
+    """
+    Collects writes under one root and commits them as multi-path update()
+    calls: one request when the batch is small, a few size-bounded chunks
+    when it is not. Push keys are generated locally, so N notification
+    pushes plus N flag updates cost one round trip instead of 2N.
+
+    Paths in one batch must not be ancestors of each other (the Realtime
+    Database rejects such updates); a later write to the same path wins.
+    """
+
+    def __init__(self, root, max_paths: int = None, max_bytes: int = None):
+        self.root = root
+        self.max_paths = max_paths or int(os.environ.get("WRITE_BATCH_MAX_PATHS", 1000))
+        self.max_bytes = max_bytes or int(os.environ.get("WRITE_BATCH_MAX_BYTES", 4 * 1024 * 1024))
+        self._updates = {}
+        self._on_commit = []
+
+    def __len__(self):
+        return len(self._updates)
+
+    def set(self, path: str, value):
+        self._updates["/".join(_split(path))] = value
+
+    def delete(self, path: str):
+        self.set(path, None)
+
+    def update(self, updates: dict):
+        for path, value in (updates or {}).items():
+            self.set(path, value)
+
+    def push(self, path: str, value) -> str:
+        key = generate_push_key()
+        self.set(f"{path}/{key}", value)
+        return key
+
+    def after_commit(self, callback):
+        """Run `callback()` once the pending writes are committed (e.g. to publish them)."""
+        self._on_commit.append(callback)
+
+    def merge(self, other: "WriteBatch"):
+        """Move the pending writes and after_commit callbacks of `other` into this batch."""
+        self._updates.update(other._updates)
+        self._on_commit.extend(other._on_commit)
+        other._updates, other._on_commit = {}, []
+
+    def size(self) -> int:
+        """Bytes of the pending writes, counted the way chunks() bounds them by max_bytes."""
+        return sum(item_size(path, value) for path, value in self._updates.items())
+
+    def chunks(self) -> list:
+        """Split the pending writes into update dicts within max_paths / max_bytes."""
+        return [chunk for chunk, _ in chunk_updates(self._updates.items(), self.max_paths, self.max_bytes)]
+
+    def commit(self) -> int:
+        """Write everything (in insertion order) and return the number of requests made."""
+        chunks = self.chunks()
+        for chunk in chunks:
+            self.root.update(chunk)
+        self._updates = {}
+        callbacks, self._on_commit = self._on_commit, []
+        for callback in callbacks:
+            callback()
+        return len(chunks)
+
+
+_storage = None
+_storage_lock = threading.Lock()
+
+
+def create_storage(backend: str = None) -> Storage:
+    """Build a backend from STORAGE_BACKEND / LOCAL_DATA_PATH (or the explicit name)."""
+    backend = (backend or os.environ.get("STORAGE_BACKEND") or "firebase").strip().lower()
+    if backend == "local":
+        default_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "udaansathi_real_hierarchy.json")
+        return LocalStorage.from_file(os.environ.get("LOCAL_DATA_PATH") or default_path)
+    if backend == "firebase":
+        return FirebaseStorage()
+    raise ValueError(f"Unknown STORAGE_BACKEND '{backend}' (expected 'firebase' or 'local')")
+
+
+def get_storage() -> Storage:
+    """Process-wide storage backend, created on first use."""
+    global _storage
+    if _storage is None:
+        with _storage_lock:
+            if _storage is None:
+                _storage = create_storage()
+    return _storage
+
+
+def set_storage(storage: Storage):
+    """Swap the process-wide backend (used by profiling scripts and local runs)."""
+    global _storage
+    with _storage_lock:
+        _storage = storage
@@ -0,0 +1,101 @@
+"""
+Streaming JSON responses for large list endpoints.
+
+List handlers build their items with a generator and hand it to
+`stream_list`, which picks the wire format from the request's Accept header:
+
+    Accept: application/x-ndjson            -> one JSON item per line
+    Accept: application/json; stream=array  -> the usual JSON document, written
+                                               item by item as it is produced
+    anything else                           -> None (handler falls back to jsonify)
+
+The streamed array keeps the exact envelope the endpoint normally returns
+(e.g. {"ok": true, "data": [...]}) so clients parse it unchanged. Items are
+serialized one at a time and flushed every STREAM_CHUNK_BYTES (default 16 KB),
+so neither the item list nor the full JSON body is ever held in memory and the
+first bytes leave before the last item is built.
+"""
+
+import json
+import os
+
+from flask import Response, request
+
+NDJSON_MIMETYPE = "application/x-ndjson"
+JSON_MIMETYPE = "application/json"
+
+STREAM_CHUNK_BYTES = int(os.environ.get("STREAM_CHUNK_BYTES", 16 * 1024))
+
+
+def stream_format():
+    """'ndjson', 'array' or None, from the Accept header (NDJSON wins when both are listed)."""
+    accept = request.headers.get("Accept", "")
+    if NDJSON_MIMETYPE in accept:
+        return "ndjson"
+    for item in accept.split(","):
+        mimetype, _, params = item.partition(";")
+        if mimetype.strip() == JSON_MIMETYPE and "stream=array" in params.replace(" ", ""):
+            return "array"
+    return None
+
+
+def _dumps(item) -> str:
+    # Same separators as Flask's compact jsonify output, non-ASCII kept as-is
+    return json.dumps(item, ensure_ascii=False, separators=(",", ":"), default=str)
+
+
+def _buffered(pieces, chunk_bytes: int):
+    """Join small string pieces into ~chunk_bytes UTF-8 chunks."""
+    buf, size = [], 0
+    for piece in pieces:
+        buf.append(piece)
+        size += len(piece)
+        if size >= chunk_bytes:
+            yield "".join(buf).encode("utf-8")
+            buf, size = [], 0
+    if buf:
+        yield "".join(buf).encode("utf-8")
+
+
+def ndjson_lines(items):
+    for item in items:
+        yield _dumps(item) + "\n"
+
+
+def json_array_pieces(items, envelope: dict = None, key: str = "data"):
+    """
+    Pieces of `envelope` with `items` written as a JSON array under `key`
+    (or a bare array when no envelope is given).
+    """
+    if envelope is None:
+        head, tail = "[", "]"
+    else:
+        rest = _dumps({k: v for k, v in envelope.items() if k != key})[1:-1]
+        head = "{" + (rest + "," if rest else "") + _dumps(key) + ":["
+        tail = "]}"
+    yield head
+    first = True
+    for item in items:
+        yield _dumps(item) if first else "," + _dumps(item)
+        first = False
+    yield tail
+
+
+def stream_list(items, envelope: dict = None, key: str = "data", fmt: str = None,
+                status: int = 200, chunk_bytes: int = None):
+    """
+    Streaming Response for `items` in the format the client asked for, or None
+    if it did not opt in. `envelope` is the dict the endpoint would normally
+    return with the list under `key`; leave it out for bare-list endpoints.
+    """
+    fmt = fmt or stream_format()
+    if fmt is None:
+        return None
+    if fmt == "ndjson":
+        pieces, mimetype = ndjson_lines(items), NDJSON_MIMETYPE
+    else:
+        pieces, mimetype = json_array_pieces(items, envelope, key), JSON_MIMETYPE
+    body = _buffered(pieces, chunk_bytes or STREAM_CHUNK_BYTES)
+    res = Response(body, status=status, mimetype=mimetype)
+    res.headers["X-Accel-Buffering"] = "no"
+    return res
@@ -0,0 +1,48 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ["STORAGE_BACKEND"] = "local"
+os.environ["LOCAL_DATA_PATH"] = os.path.join(os.path.dirname(os.path.abspath(__file__)), "missing.json")
+
+import app as backend  # noqa: E402
+
+
+@pytest.fixture
+def cold(monkeypatch):
+    """The app as a worker sees it before its first live read; returns the refresher starts."""
+    started = []
+    monkeypatch.setattr(backend.flight_snapshot, "start_refresher", lambda root_factory: started.append(root_factory))
+    monkeypatch.setattr(backend.time, "sleep", lambda seconds: None)
+    backend.live_ready.clear()
+    yield started
+    backend.live_ready.set()
+
+
+def test_warm_up_retries_until_the_database_answers(cold, monkeypatch):
+    attempts = []
+
+    class Flaky:
+        def get(self, shallow=False):
+            attempts.append(shallow)
+            if len(attempts) < 3:
+                raise ConnectionError("database unreachable")
+            return {}
+
+    monkeypatch.setattr(backend, "safe_ref", lambda path: Flaky())
+    backend.warm_up_live_connection()
+
+    assert len(attempts) == 3
+    assert backend.live_ready.is_set()
+    assert len(cold) == 1
+
+
+def test_first_live_read_in_a_request_ends_the_snapshot(cold):
+    backend.live_get("cache_versions")
+    backend.live_get("cache_versions")
+
+    assert backend.live_ready.is_set()
+    assert backend.snapshot_read(lambda snap: "snapshot") is None
+    assert len(cold) == 1
@@ -0,0 +1,46 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from connections import RouteGraph, parse_after  # noqa: E402
+from storage import LocalStorage  # noqa: E402
+
+
+def flight(dep, arr, date=None):
+    summary = {"dep_time": dep, "arrival_time": arr}
+    if date:
+        summary["dep_date"] = date
+    return summary
+
+
+def graph(route_index: dict) -> RouteGraph:
+    g = RouteGraph(refresh_every=0, min_connection=45, max_layover=24 * 60)
+    g.refresh(LocalStorage({"route_index": route_index}).reference("/"))
+    return g
+
+
+def flight_ids(itineraries):
+    return [[leg[2] for leg in itinerary] for itinerary in itineraries]
+
+
+def test_two_stop_skips_options_that_loop_back_to_the_source():
+    # Best via BBB is back through AAA onto tomorrow's AD1; the next best goes through CCC
+    g = graph({
+        "AAA": {"BBB": {"AB1": flight("08:00", "09:00")}, "DDD": {"AD1": flight("07:00", "08:00")}},
+        "BBB": {"AAA": {"BA1": flight("10:00", "11:00")}, "CCC": {"BC1": flight("10:00", "11:00")}},
+        "CCC": {"DDD": {"CD1": flight("12:30", "09:00")}},
+    })
+    found = flight_ids(g.search("AAA", "DDD", after=parse_after("07:30")))
+    assert found == [["AB1", "BC1", "CD1"]]
+
+
+def test_time_only_after_searches_daily_flights_and_dated_after_searches_dated_ones():
+    g = graph({
+        "AAA": {"DDD": {
+            "DAILY": flight("19:00", "21:00"),
+            "DATED": flight("19:30", "21:30", date="2026-01-10"),
+        }},
+    })
+    assert flight_ids(g.search("AAA", "DDD", after=parse_after("18:30"))) == [["DAILY"]]
+    assert flight_ids(g.search("AAA", "DDD", after=parse_after("2026-01-10T18:30"))) == [["DATED"]]
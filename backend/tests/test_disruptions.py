@@ -0,0 +1,120 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ["STORAGE_BACKEND"] = "local"
+os.environ["LOCAL_DATA_PATH"] = os.path.join(os.path.dirname(os.path.abspath(__file__)), "missing.json")
+
+import app as backend  # noqa: E402
+from manifests import SPLIT_FLAG, flight_writes, passenger_path, read_passengers  # noqa: E402
+from outbox import EmailJob  # noqa: E402
+from storage import LocalStorage, WriteBatch  # noqa: E402
+
+
+def passengers(*pnrs):
+    return {pnr: {"name": f"Passenger {pnr}", "email": f"{pnr.lower()}@example.com"} for pnr in pnrs}
+
+
+def flight(pax):
+    return {"destination": "DXB", "dep_time": "09:00", "arrival_time": "11:00", "status": "On Time", "passengers": pax}
+
+
+def database(flights: dict, split: bool = False):
+    root = LocalStorage({}).reference("/")
+    batch = WriteBatch(root)
+    for f_id, data in flights.items():
+        if split:
+            batch.update(flight_writes("BOM", f_id, data))
+        else:
+            batch.set(backend.flight_path("BOM", f_id), data)
+    batch.commit()
+    return root
+
+
+def delay(root, f_id):
+    """The /delay-flight write, returning the email job callback it registers."""
+    data = root.child(backend.flight_path("BOM", f_id)).get()
+    pax = read_passengers(root, "BOM", f_id, data)
+    batch = WriteBatch(root)
+    backend.plan_delay(batch, "BOM", f_id, data, pax, {"dep_time": "10:00", "status": "Delayed", "delay": "1h"})
+    backend.commit_flight_write(batch, "BOM")
+    paths = {pnr: passenger_path("BOM", f_id, data, pnr) for pnr in pax}
+    return backend.mark_notified_on_complete(root, "BOM", paths)
+
+
+def cancel(root, f_id):
+    data = root.child(backend.flight_path("BOM", f_id)).get()
+    full = backend.with_passengers(data, read_passengers(root, "BOM", f_id, data))
+    batch = WriteBatch(root)
+    backend.plan_cancellation(batch, "BOM", f_id, full, "Weather")
+    backend.commit_flight_write(batch, "BOM")
+
+
+def sent(*pnrs):
+    job = EmailJob("delay", len(pnrs))
+    job.sent_tags.extend(pnrs)
+    return job
+
+
+def test_delay_emails_finishing_after_a_cancel_do_not_resurrect_the_flight():
+    for split in (False, True):
+        root = database({"EK189": flight(passengers("P1", "P2")), "EK500": flight(passengers("P3"))}, split)
+        on_complete = delay(root, "EK189")
+        cancel(root, "EK189")
+        on_complete(sent("P1", "P2"))
+
+        assert "EK189" not in (root.child("airports/BOM/flights").get() or {})
+        assert "EK189" not in (root.child("manifests/BOM").get() or {})
+        assert root.child("cancelled_flights/EK189").get()["status"] == "CANCELLED"
+
+
+def test_delay_emails_flag_the_passengers_that_are_still_booked():
+    for split in (False, True):
+        root = database({"EK189": flight(passengers("P1", "P2"))}, split)
+        on_complete = delay(root, "EK189")
+        # P2 is dropped from the flight while the emails are going out
+        data = root.child(backend.flight_path("BOM", "EK189")).get()
+        root.child(passenger_path("BOM", "EK189", data, "P2")).delete()
+        on_complete(sent("P1", "P2"))
+
+        pax = read_passengers(root, "BOM", "EK189", root.child(backend.flight_path("BOM", "EK189")).get())
+        assert pax["P1"]["notification_sent"] is True
+        assert "P2" not in pax
+        assert bool(data.get(SPLIT_FLAG)) == split
+
+
+class RecordingRoot:
+    """Database root that records every multi-path update it receives."""
+
+    def __init__(self, root):
+        self.root = root
+        self.updates = []
+
+    def child(self, path):
+        return self.root.child(path)
+
+    def update(self, values):
+        self.updates.append(dict(values))
+        self.root.update(values)
+
+
+def test_bulk_cancel_never_splits_a_flight_across_updates(monkeypatch):
+    monkeypatch.setattr(backend.email_outbox, "submit", lambda *args, **kwargs: EmailJob(args[0], len(args[1])))
+    # Passenger counts vary so the flights' sizes do not line up with the limit
+    flights = {f"EK{n}": flight(passengers(*(f"Q{n}X{i}" for i in range(n)))) for n in (2, 9, 4, 12, 1, 7)}
+    # The largest flight (12 passengers) is 40 paths plus the cache_versions token
+    for max_paths in range(41, 100, 6):
+        monkeypatch.setenv("WRITE_BATCH_MAX_PATHS", str(max_paths))
+        root = RecordingRoot(database(flights))
+        pax = {f_id: data["passengers"] for f_id, data in flights.items()}
+        nodes = {f_id: {k: v for k, v in data.items() if k != "passengers"} for f_id, data in flights.items()}
+        summary = list(backend.run_disruption(root, "BOM", "cancel", nodes, pax, None, "Weather"))[-1]
+
+        assert summary["ok"] and sorted(summary["flights"]) == sorted(flights)
+        assert summary["updates"] == len(root.updates)
+        assert all(len(update) <= max_paths for update in root.updates)
+        for f_id, data in flights.items():
+            marks = [f"/{f_id}/"] + [f"/{pnr}/" for pnr in data["passengers"]]
+            touched = [i for i, update in enumerate(root.updates) if any(m in path + "/" for path in update for m in marks)]
+            assert len(touched) == 1, (max_paths, f_id, touched)
+        assert not root.child("airports/BOM/flights").get()
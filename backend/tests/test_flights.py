@@ -0,0 +1,27 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ["STORAGE_BACKEND"] = "local"
+os.environ["LOCAL_DATA_PATH"] = os.path.join(os.path.dirname(os.path.abspath(__file__)), "missing.json")
+
+import app as backend  # noqa: E402
+
+
+def test_airport_without_flights_answers_in_the_requested_format_with_etag():
+    backend.get_database().child("cache_versions/SYD").set("-token")
+    client = backend.app.test_client()
+
+    plain = client.get("/flights?airport=SYD&view=summary")
+    ndjson = client.get("/flights?airport=SYD&view=summary", headers={"Accept": "application/x-ndjson"})
+
+    assert plain.get_json() == {"ok": True, "data": []}
+    assert ndjson.mimetype == "application/x-ndjson"
+    assert ndjson.get_data(as_text=True) == ""
+    for res in (plain, ndjson):
+        assert res.status_code == 200
+        assert "Accept" in res.vary
+    assert plain.headers["ETag"] != ndjson.headers["ETag"]
+
+    again = client.get("/flights?airport=SYD&view=summary", headers={"If-None-Match": plain.headers["ETag"]})
+    assert again.status_code == 304
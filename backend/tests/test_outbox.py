@@ -0,0 +1,54 @@
+import os
+import sys
+import threading
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import outbox  # noqa: E402
+from outbox import EmailOutbox  # noqa: E402
+
+
+class FlakyResend:
+    """Stands in for the resend module; the send numbered `fail_on` raises once."""
+
+    def __init__(self, fail_on: int):
+        self.sent = []
+        self.calls = 0
+        self.fail_on = fail_on
+        self.Emails = SimpleNamespace(send=self._send)
+
+    def _send(self, params):
+        self.calls += 1
+        if self.calls == self.fail_on:
+            raise RuntimeError("503 from Resend")
+        self.sent.append(params["to"])
+
+
+def run(messages, client, monkeypatch, **kwargs):
+    monkeypatch.setattr(outbox, "resend_client", lambda: client)
+    done = threading.Event()
+    box = EmailOutbox(workers=1, batch_size=10, use_batch=False, backoff=0, **kwargs)
+    job = box.submit("delay", messages, on_complete=lambda job: done.set())
+    assert done.wait(5)
+    return job
+
+
+def test_per_message_retry_only_resends_undelivered_messages(monkeypatch):
+    client = FlakyResend(fail_on=3)
+    messages = [{"to": f"p{i}@example.com", "tag": f"P{i}"} for i in range(4)]
+    job = run(messages, client, monkeypatch)
+
+    assert client.sent == ["p0@example.com", "p1@example.com", "p2@example.com", "p3@example.com"]
+    assert (job.sent, job.failed, job.status) == (4, 0, "completed")
+    assert job.sent_tags == ["P0", "P1", "P2", "P3"]
+
+
+def test_exhausted_retries_count_what_already_went_out(monkeypatch):
+    client = FlakyResend(fail_on=2)
+    messages = [{"to": f"p{i}@example.com", "tag": f"P{i}"} for i in range(3)]
+    job = run(messages, client, monkeypatch, max_attempts=1)
+
+    assert client.sent == ["p0@example.com"]
+    assert (job.sent, job.failed, job.status) == (1, 2, "partial")
+    assert job.sent_tags == ["P0"]
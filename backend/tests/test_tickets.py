@@ -0,0 +1,18 @@
+import io
+import os
+import sys
+import zipfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import tickets  # noqa: E402
+from tickets import POOL_MIN_TICKETS, TicketCache, render_ticket_pdf, stream_tickets_zip  # noqa: E402
+
+
+def test_zip_export_renders_misses_in_a_spawned_pool():
+    bookings = [{"pnr": f"PNR{i:03d}", "name": f"Passenger {i}", "flight_id": "EK189"} for i in range(POOL_MIN_TICKETS)]
+    archive = zipfile.ZipFile(io.BytesIO(b"".join(stream_tickets_zip(bookings, TicketCache()))))
+
+    assert tickets._pool._mp_context.get_start_method() == "spawn"
+    assert archive.namelist() == [f"ticket_{b['pnr']}.pdf" for b in bookings]
+    assert archive.read("ticket_PNR003.pdf") == render_ticket_pdf(bookings[3])
@@ -0,0 +1,172 @@
+"""
+E-ticket PDF rendering, caching and bulk export.
+
+`render_ticket_pdf` draws one booking exactly like the original
+/bookings/<pnr>/ticket handler. PDFs are cached in memory under a hash of the
+booking fields (plus TICKET_LAYOUT_VERSION), so a ticket is only re-rendered
+when something printed on it changes. The cache is an LRU bounded by total
+bytes (TICKET_CACHE_MAX_BYTES, default 32 MB).
+
+`stream_tickets_zip` yields a ZIP archive of many tickets chunk by chunk,
+rendering cache misses in a process pool (TICKET_PDF_WORKERS, default: CPU
+count) so large manifests don't hold the GIL of the serving worker.
+
+The pool starts its processes with "spawn", not the Linux default "fork".
+A forked child would inherit the serving worker as it is at that moment:
+under gevent workers (gunicorn.conf.py) that means the gevent hub and
+monkey-patched threading, and elsewhere locks held by the outbox, listener
+or snapshot threads. A spawned child starts a fresh interpreter that
+imports only this module (and reportlab), so it is safe to create the pool
+lazily from any request. Under gevent, the executor's manager thread is a
+greenlet and waiting on a future yields to other requests.
+"""
+
+import hashlib
+import io
+import json
+import multiprocessing
+import os
+import threading
+import zipfile
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+# Bump when the drawing code changes so cached PDFs are not reused
+TICKET_LAYOUT_VERSION = 1
+
+# Below this many misses, rendering in-process beats pool round trips
+POOL_MIN_TICKETS = 8
+
+
+def render_ticket_pdf(booking: dict) -> bytes:
+    """Render one e-ticket. Module-level so it can run in a worker process."""
+    from reportlab.pdfgen import canvas
+
+    buffer = io.BytesIO()
+    # invariant=1 keeps the output byte-identical for identical bookings
+    p = canvas.Canvas(buffer, invariant=1)
+    p.setFont("Helvetica-Bold", 18)
+    p.drawString(100, 800, "UDAAN SATHI E-TICKET")
+    p.setFont("Helvetica", 12)
+
+    y = 750
+    for key in sorted(booking):
+        p.drawString(100, y, f"{key.upper()}: {booking[key]}")
+        y -= 25
+
+    p.showPage()
+    p.save()
+    return buffer.getvalue()
+
+
+def ticket_key(booking: dict) -> str:
+    """Content address of a ticket: hash of every printed field and the layout version."""
+    payload = json.dumps([TICKET_LAYOUT_VERSION, booking], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class TicketCache:
+    """Thread-safe LRU of rendered PDFs, bounded by total size in bytes."""
+
+    def __init__(self, max_bytes: int = None):
+        self.max_bytes = max_bytes or int(os.environ.get("TICKET_CACHE_MAX_BYTES", 32 * 1024 * 1024))
+        self._items = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str):
+        with self._lock:
+            pdf = self._items.get(key)
+            if pdf is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return pdf
+
+    def put(self, key: str, pdf: bytes):
+        if len(pdf) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self._size -= len(old)
+            self._items[key] = pdf
+            self._size += len(pdf)
+            while self._size > self.max_bytes:
+                _, evicted = self._items.popitem(last=False)
+                self._size -= len(evicted)
+
+    def get_or_render(self, booking: dict) -> bytes:
+        key = ticket_key(booking)
+        pdf = self.get(key)
+        if pdf is None:
+            pdf = render_ticket_pdf(booking)
+            self.put(key, pdf)
+        return pdf
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._items), "bytes": self._size, "max_bytes": self.max_bytes,
+                    "hits": self.hits, "misses": self.misses}
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                workers = int(os.environ.get("TICKET_PDF_WORKERS", 0)) or os.cpu_count() or 2
+                _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+
+class _ZipSink(io.RawIOBase):
+    """Write-only, non-seekable sink that hands finished ZIP bytes to a generator."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self._chunks.append(bytes(b))
+        return len(b)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def stream_tickets_zip(bookings: list, cache: TicketCache):
+    """
+    Yield a ZIP of ticket_<PNR>.pdf files, one entry at a time. Cached PDFs are
+    reused; misses are rendered in the process pool (in-process when few).
+    """
+    keys = [ticket_key(b) for b in bookings]
+    cached = [cache.get(k) for k in keys]
+    missing = [i for i, pdf in enumerate(cached) if pdf is None]
+
+    futures = {}
+    if len(missing) >= POOL_MIN_TICKETS:
+        pool = _get_pool()
+        futures = {i: pool.submit(render_ticket_pdf, bookings[i]) for i in missing}
+
+    sink = _ZipSink()
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for i, booking in enumerate(bookings):
+            pdf = cached[i]
+            if pdf is None:
+                pdf = futures[i].result() if i in futures else render_ticket_pdf(booking)
+                cache.put(keys[i], pdf)
+            archive.writestr(f"ticket_{booking.get('pnr', i)}.pdf", pdf)
+            yield sink.drain()
+    yield sink.drain()
@@ -1,25 +1,64 @@
-import React, { useEffect, useState } from 'react';
+import React, { useEffect, useRef, useState } from 'react';
 
 export default function NotificationSystem({ pnr }: { pnr: string }) {
   const [notifications, setNotifications] = useState<any[]>([]);
+  // Key of the newest notification received; later polls only ask for newer ones
+  const cursor = useRef<string | null>(null);
 
   useEffect(() => {
+    cursor.current = null;
+    setNotifications([]);
+
     const checkAlerts = async () => {
       try {
         // Calling your Flask backend
-        const response = await fetch(`${import.meta.env.VITE_BACKEND_URL}/notifications/${pnr}`);
+        const since = cursor.current ? `?since=${encodeURIComponent(cursor.current)}` : "";
+        const response = await fetch(`${import.meta.env.VITE_BACKEND_URL}/notifications/${pnr}${since}`);
         const result = await response.json();
         if (result.ok) {
-          setNotifications(result.data);
+          if (result.data.length > 0) {
+            setNotifications((prev) => [...prev, ...result.data]);
+          }
+          cursor.current = result.next_cursor ?? cursor.current;
         }
       } catch (error) {
         console.error("Error fetching alerts:", error);
       }
     };
 
-    checkAlerts();
-    const interval = setInterval(checkAlerts, 10000); // Check every 10 seconds
-    return () => clearInterval(interval);
+    // Catch up once, then let the server push new alerts over SSE when it
+    // offers the stream (EventSource re-dials with Last-Event-ID); otherwise poll
+    let stream: EventSource | null = null;
+    let interval: ReturnType<typeof setInterval> | null = null;
+    let closed = false;
+    const startPolling = () => {
+      if (!closed && !interval) interval = setInterval(checkAlerts, 10000); // Check every 10 seconds
+    };
+    checkAlerts().then(() => {
+      if (closed) return;
+      if (typeof EventSource === "undefined") {
+        startPolling();
+        return;
+      }
+      const since = cursor.current ? `?since=${encodeURIComponent(cursor.current)}` : "";
+      stream = new EventSource(`${import.meta.env.VITE_BACKEND_URL}/notifications/${pnr}/stream${since}`);
+      stream.addEventListener("notification", (event) => {
+        const note = JSON.parse((event as MessageEvent).data);
+        cursor.current = note.id;
+        setNotifications((prev) => (prev.some((n) => n.id === note.id) ? prev : [...prev, note]));
+      });
+      // Fell too far behind: fetch the gap through the regular endpoint
+      stream.addEventListener("reset", () => checkAlerts());
+      // Streaming disabled (404) or full (503): EventSource gives up, so poll instead
+      stream.onerror = () => {
+        if (stream?.readyState === EventSource.CLOSED) startPolling();
+      };
+    });
+    return () => {
+      closed = true;
+      stream?.close();
+      if (interval) clearInterval(interval);
+    };
   }, [pnr]);
 
   if (notifications.length === 0) return null;
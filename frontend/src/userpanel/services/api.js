@@ -47,8 +47,9 @@ async function apiFetch(path, options = {}) {
  * This ensures the admin only sees data for the selected terminal.
  */
 export async function getFlights(airportCode = "") {
-  // Construct query string: e.g., /flights?airport=DEL
-  const path = airportCode ? `/flights?airport=${airportCode}` : "/flights";
+  // Construct query string: e.g., /flights?airport=DEL&view=summary
+  // (summary view returns passenger_count instead of the full passenger map)
+  const path = airportCode ? `/flights?airport=${airportCode}&view=summary` : "/flights";
   return apiFetch(path);
 }
 